@@ -0,0 +1,69 @@
+"""
+Synthetic graphs for the benchmarks. Every generator is deterministic for a given size and seed.
+"""
+
+import random
+from typing import Callable, Dict
+
+from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+from streamlit_flow.state import StreamlitFlowState
+
+COLUMN_TYPES = ['Integer', 'Text', 'Decimal', 'Date', 'Boolean']
+
+
+def _node(i:int, content:str, columns:list=None) -> StreamlitFlowNode:
+    data = {'content': content}
+    if columns is not None:
+        data['columns'] = columns
+    return StreamlitFlowNode(f"node-{i}", ((i % 100) * 300, (i // 100) * 150), data, 'default', 'right', 'left', style={})
+
+
+def _edge(i:int, source:int, target:int, **kwargs) -> StreamlitFlowEdge:
+    return StreamlitFlowEdge(f"edge-{i}", f"node-{source}", f"node-{target}", **kwargs)
+
+
+def chain(size:int, seed:int=0) -> StreamlitFlowState:
+    """
+    size nodes in a line, each linked to the next one.
+    """
+    nodes = [_node(i, f"Step {i}") for i in range(size)]
+    edges = [_edge(i, i, i + 1) for i in range(size - 1)]
+    return StreamlitFlowState(nodes, edges)
+
+
+def tree(size:int, seed:int=0, branching:int=3) -> StreamlitFlowState:
+    """
+    size nodes in a tree where each node has up to branching children.
+    """
+    nodes = [_node(i, f"**Node {i}**\n\nLevel content") for i in range(size)]
+    edges = [_edge(i - 1, (i - 1) // branching, i) for i in range(1, size)]
+    return StreamlitFlowState(nodes, edges)
+
+
+def er_schema(size:int, seed:int=0, columns:int=12) -> StreamlitFlowState:
+    """
+    size tables shaped like a semantic model: many columns each, and about 1.5 relationships per table
+    towards earlier tables, labelled like the ones semantic_model.py creates.
+    """
+    rng = random.Random(seed)
+    nodes = []
+    for i in range(size):
+        table_columns = [{'column_name': f"Column{j}", 'type': rng.choice(COLUMN_TYPES)} for j in range(columns)]
+        table_columns[0]['isPrimaryKey'] = True
+        nodes.append(_node(i, f"**Table{i}**", table_columns))
+
+    edges = []
+    for i in range(1, size):
+        for target in rng.sample(range(i), min(i, 1 + (rng.random() < 0.5))):
+            edges.append(_edge(len(edges), i, target, sourceHandle=f"node-{i}-Column1-source",
+                               targetHandle=f"node-{target}-Column0-target", label='N:1',
+                               marker_start={'type': 'arrowclosed'},
+                               data={'relationship_type': 'ManyToOne', 'from_table': f"Table{i}", 'to_table': f"Table{target}"}))
+    return StreamlitFlowState(nodes, edges)
+
+
+GENERATORS: Dict[str, Callable[[int], StreamlitFlowState]] = {
+    'chain': chain,
+    'tree': tree,
+    'er_schema': er_schema,
+}
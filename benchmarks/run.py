@@ -0,0 +1,205 @@
+"""
+Micro-benchmarks of the pure Python hot paths of streamlit_flow: element serialization and reconstruction,
+state serialization, and the sync round trips of streamlit_flow() with the component function stubbed out.
+
+Run from the repository root, and compare the JSON output between releases:
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --sizes 100 1000 --generators er_schema --benchmarks node_asdict sync_single_move
+
+Each benchmark reports its best time over a few repeats, the throughput in elements per second, and the
+peak memory it allocated, measured in a separate run under tracemalloc so that tracing does not skew the timings.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import types
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streamlit_flow
+from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+from streamlit_flow.layouts import ManualLayout
+from streamlit_flow.state import StreamlitFlowState
+
+from generators import GENERATORS
+
+SIZES = [100, 1000, 10000, 100000]
+KEY = 'benchmark_flow'
+
+
+class StubFrontend:
+
+    """
+    Stands in for the component function and the browser. Like the frontend, it applies the patch it
+    receives and answers with its graph: all of it the first time, then only what moved. Its answer is
+    also stored as the component value in the stubbed session state, as Streamlit does.
+    """
+
+    def __init__(self, session_state:dict) -> None:
+        self.session_state = session_state
+        self.version = 0
+        self.applied = None
+        self.synced = False
+        self.moved = []
+
+    def __call__(self, sync=None, frontendVersion=None, key=None, **kwargs) -> dict:
+        if sync is None and self.synced and not self.moved:
+            return self.session_state.get(key)
+
+        self.version += 1
+        if sync is not None:
+            self.applied = sync['id']
+        message = {
+            'version': self.version,
+            'baseVersion': frontendVersion,
+            'ack': self.applied,
+            'full': not self.synced,
+            'nodes': sync['nodes'] if sync is not None and not self.synced else self.moved,
+            'edges': sync['edges'] if sync is not None and not self.synced else [],
+            'removedNodes': [],
+            'removedEdges': [],
+            'selectedId': None,
+            'timestamp': self.version,
+        }
+        self.synced = True
+        self.moved = []
+        self.session_state[key] = message
+        return message
+
+
+def stub_streamlit() -> StubFrontend:
+    session_state = {}
+    frontend = StubFrontend(session_state)
+    streamlit_flow.st = types.SimpleNamespace(session_state=session_state)
+    streamlit_flow._st_flow_func = frontend
+    return frontend
+
+
+def render(state:StreamlitFlowState) -> StreamlitFlowState:
+    return streamlit_flow.streamlit_flow(KEY, state, layout=ManualLayout(), layout_cache=None)
+
+
+# Each benchmark takes a freshly generated state, and returns the function to measure and the number of elements it processes
+
+def node_asdict(state):
+    return lambda: [node.asdict() for node in state.nodes], len(state.nodes)
+
+def node_from_dict(state):
+    dicts = [node.asdict() for node in state.nodes]
+    return lambda: [StreamlitFlowNode.from_dict(node) for node in dicts], len(dicts)
+
+def edge_asdict(state):
+    return lambda: [edge.asdict() for edge in state.edges], len(state.edges)
+
+def edge_from_dict(state):
+    dicts = [edge.asdict() for edge in state.edges]
+    return lambda: [StreamlitFlowEdge.from_dict(edge) for edge in dicts], len(dicts)
+
+def state_asdict(state):
+    return state.asdict, len(state.nodes) + len(state.edges)
+
+def sync_initial_render(state):
+    # First render of a session: the whole graph goes to the frontend and comes back
+    def run():
+        stub_streamlit()
+        render(state)
+    return run, len(state.nodes) + len(state.edges)
+
+def sync_rerun_unchanged(state):
+    # A rerun where nothing changed on either side
+    stub_streamlit()
+    render(state)
+    return lambda: render(state), len(state.nodes) + len(state.edges)
+
+def sync_single_move(state):
+    # The user dragged one node, and Python sends nothing back
+    frontend = stub_streamlit()
+    render(state)
+    node = state.nodes[len(state.nodes) // 2].asdict()
+    def run():
+        node['position'] = {'x': node['position']['x'] + 1, 'y': node['position']['y']}
+        frontend.moved = [node]
+        render(state)
+    return run, 1
+
+BENCHMARKS: Dict[str, Callable[[StreamlitFlowState], Tuple[Callable[[], any], int]]] = {
+    'node_asdict': node_asdict,
+    'node_from_dict': node_from_dict,
+    'edge_asdict': edge_asdict,
+    'edge_from_dict': edge_from_dict,
+    'state_asdict': state_asdict,
+    'sync_initial_render': sync_initial_render,
+    'sync_rerun_unchanged': sync_rerun_unchanged,
+    'sync_single_move': sync_single_move,
+}
+
+
+def measure(benchmark:Callable, generator:Callable, size:int, min_time:float, max_repeats:int) -> Dict[str, any]:
+    state = generator(size)
+    run, elements = benchmark(state)
+
+    times = []
+    while len(times) < max_repeats and (sum(times) < min_time or len(times) < 1):
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+
+    # Peak memory on a fresh setup, so that earlier repeats do not count
+    run, _ = benchmark(generator(size))
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {
+        'elements': elements,
+        'repeats': len(times),
+        'best_seconds': best,
+        'mean_seconds': sum(times) / len(times),
+        'elements_per_second': elements / best if best > 0 else None,
+        'peak_bytes': peak,
+    }
+
+
+def main(argv:List[str]=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES, help="Graph sizes, in nodes.")
+    parser.add_argument('--generators', nargs='+', choices=list(GENERATORS), default=list(GENERATORS))
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS), default=list(BENCHMARKS))
+    parser.add_argument('--min-time', type=float, default=0.5, help="Repeat each benchmark for at least this many seconds.")
+    parser.add_argument('--max-repeats', type=int, default=20)
+    parser.add_argument('--output', help="Write the results to this JSON file instead of stdout.")
+    args = parser.parse_args(argv)
+
+    results = []
+    for generator_name in args.generators:
+        for size in args.sizes:
+            for benchmark_name in args.benchmarks:
+                result = measure(BENCHMARKS[benchmark_name], GENERATORS[generator_name], size, args.min_time, args.max_repeats)
+                results.append({'generator': generator_name, 'size': size, 'benchmark': benchmark_name, **result})
+                print(f"{generator_name:>10} {size:>7} {benchmark_name:<22} {result['best_seconds'] * 1000:10.2f} ms "
+                      f"{result['peak_bytes'] / 2**20:9.1f} MiB", file=sys.stderr)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,8 @@ import streamlit as st
 from streamlit_flow import streamlit_flow
 from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
 from streamlit_flow.state import StreamlitFlowState
-from streamlit_flow.layouts import TreeLayout
+from streamlit_flow.layouts import TreeLayout, ManualLayout
+from streamlit_flow.schema import import_schema, validate_schema
 import random
 import json
 import os
@@ -18,92 +19,25 @@ import streamlit as st
 from streamlit_flow import streamlit_flow
 from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
 from streamlit_flow.state import StreamlitFlowState
-from streamlit_flow.layouts import TreeLayout
+from streamlit_flow.layouts import TreeLayout, ManualLayout
 import random
 from uuid import uuid4
 
-def create_node_from_schema(table_name, columns, position):
-    content = f"**{table_name}**"
-    return StreamlitFlowNode(
-        str(f"st-flow-node_{uuid4()}"),
-        position,
-        {
-            'content': content,
-            'columns': columns,
-            'id': str(f"st-flow-node_{uuid4()}")
-        },
-        'default',
-        'right',
-        'left',
-        deletable=True,
-        handles=[
-            {
-                'id': f"{table_name}-{col['column_name']}-source",
-                'type': 'source',
-                'position': 'right'
-            } for col in columns
-        ] + [
-            {
-                'id': f"{table_name}-{col['column_name']}-target",
-                'type': 'target',
-                'position': 'left'
-            } for col in columns
-        ]
-    )
-
-def validate_json_structure(json_data):
+@st.cache_data
+def load_example_schema():
     with open('example_json_structure.json', 'r') as f:
-        example_structure = json.load(f)
-    
-    if not isinstance(json_data, dict):
-        return False
-    
-    # Check for required top-level keys
-    if set(json_data.keys()) != set(example_structure.keys()):
-        return False
-    
-    # Validate tables
-    if not isinstance(json_data.get('tables'), list):
-        return False
-    
-    for table in json_data['tables']:
-        if not isinstance(table, dict) or set(table.keys()) != {'table_name', 'columns'}:
-            return False
-        if not isinstance(table['columns'], list):
-            return False
-        for column in table['columns']:
-            if not isinstance(column, dict) or not set(column.keys()).issubset({'column_name', 'type', 'isPrimaryKey', 'isForeignKey', 'references', 'calculatedColumn', 'formula'}):
-                return False
-    
-    # Validate relationships
-    if not isinstance(json_data.get('relationships'), list):
-        return False
-    
-    for relationship in json_data['relationships']:
-        if not isinstance(relationship, dict) or set(relationship.keys()) != {'from_table', 'from_column', 'to_table', 'to_column', 'relationship_type'}:
-            return False
-    
-    return True
-
-def get_edge_style(relationship_type):
-    if relationship_type == 'OneToOne':
-        return {'label': '1:1', 'markerEnd': {'type': 'arrow'}, 'markerStart': {'type': 'arrow'}}
-    elif relationship_type == 'OneToMany':
-        return {'label': '1:N', 'markerEnd': {'type': 'arrowclosed'}}
-    elif relationship_type == 'ManyToOne':
-        return {'label': 'N:1', 'markerStart': {'type': 'arrowclosed'}}
-    elif relationship_type == 'ManyToMany':
-        return {'label': 'N:N', 'markerEnd': {'type': 'arrowclosed'}, 'markerStart': {'type': 'arrowclosed'}}
-    else:
-        return {}
-
-def on_edge_create(new_edge, nodes, edges):
-    source_node = next((node for node in nodes if node.id == new_edge.source), None)
-    target_node = next((node for node in nodes if node.id == new_edge.target), None)
+        return f.read()
+
+def on_edge_create(new_edge, state):
+    source_node = state.get_node(new_edge.source)
+    target_node = state.get_node(new_edge.target)
     
     if source_node and target_node:
-        source_column = new_edge.source_handle.split('-')[-2] if new_edge.source_handle else 'Unknown'
-        target_column = new_edge.target_handle.split('-')[-2] if new_edge.target_handle else 'Unknown'
+        # Edges connected on the canvas keep the handles as sent by React Flow
+        source_handle = new_edge.kwargs.get('sourceHandle')
+        target_handle = new_edge.kwargs.get('targetHandle')
+        source_column = source_handle.split('-')[-2] if source_handle else 'Unknown'
+        target_column = target_handle.split('-')[-2] if target_handle else 'Unknown'
         
         new_edge.data = {
             'relationship_type': 'OneToMany',  # Default type, can be changed later
@@ -116,27 +50,6 @@ def on_edge_create(new_edge, nodes, edges):
     
     return new_edge
 
-def update_edge_data(edge, nodes):
-    source_node = next((node for node in nodes if node.id == edge.source), None)
-    target_node = next((node for node in nodes if node.id == edge.target), None)
-    
-    if source_node and target_node:
-        # Parse the edge ID to extract column names
-        edge_parts = edge.id.split('_')
-        source_column = edge_parts[-3] if len(edge_parts) > 3 else 'Unknown'
-        target_column = edge_parts[-2] if len(edge_parts) > 2 else 'Unknown'
-        
-        edge.data = {
-            'relationship_type': 'OneToMany',  # Default type, can be changed later
-            'from_table': source_node.data['content'].strip('*'),
-            'from_column': source_column,
-            'to_table': target_node.data['content'].strip('*'),
-            'to_column': target_column,
-            'label': f'1:N'  # Default label, can be changed later
-        }
-    
-    return edge
-
 def parse_handle_id(handle_id):
     parts = handle_id.split('-')
     if len(parts) >= 3:
@@ -163,6 +76,9 @@ if 'validation_result' not in st.session_state:
 if 'validated_schema' not in st.session_state:
     st.session_state.validated_schema = None
 
+if 'import_timings' not in st.session_state:
+    st.session_state.import_timings = None
+
 with st.sidebar:
     st.title("Power BI Model Simulator")
     
@@ -184,15 +100,13 @@ with st.sidebar:
     
     with col1:
         with st.popover("Example JSON"):
-            with open('example_json_structure.json', 'r') as f:
-                example_json = f.read()
-            st.code(example_json, language="json")
+            st.code(load_example_schema(), language="json")
     
     with col2:
         if st.button("Validate JSON"):
             try:
                 schema = json.loads(schema_json)
-                if validate_json_structure(schema):
+                if not validate_schema(schema):
                     st.session_state.validation_result = "success"
                     st.session_state.validated_schema = schema
                 else:
@@ -206,36 +120,9 @@ with st.sidebar:
     if st.session_state.validation_result == "success":
         st.success("Valid JSON structure!")
         if st.button("Import Structure to Canvas"):
-            for table in st.session_state.validated_schema["tables"]:
-                new_node = create_node_from_schema(table["table_name"], table["columns"], (len(st.session_state.curr_state.nodes) * 200, 0))
-                st.session_state.curr_state.nodes.append(new_node)
-            
-            # Create edges for relationships
-            for relationship in st.session_state.validated_schema["relationships"]:
-                from_node = next((node for node in st.session_state.curr_state.nodes if node.data['content'] == f"**{relationship['from_table']}**"), None)
-                to_node = next((node for node in st.session_state.curr_state.nodes if node.data['content'] == f"**{relationship['to_table']}**"), None)
-                
-                if from_node and to_node:
-                    edge_style = get_edge_style(relationship['relationship_type'])
-                    edge = StreamlitFlowEdge(
-                        id=f"edge_{uuid4()}",
-                        source=from_node.id,
-                        target=to_node.id,
-                        source_handle=f"{from_node.id}-{relationship['from_column']}-source",
-                        target_handle=f"{to_node.id}-{relationship['to_column']}-target",
-                        data={
-                            'label': edge_style.get('label', relationship['relationship_type']),
-                            'relationship_type': relationship['relationship_type'],
-                            'from_table': relationship['from_table'],
-                            'from_column': relationship['from_column'],
-                            'to_table': relationship['to_table'],
-                            'to_column': relationship['to_column']
-                        },
-                        animated=False,
-                        **edge_style
-                    )
-                    st.session_state.curr_state.edges.append(edge)
-            
+            # Validates, builds the tables and binds the relationships in one pass, see streamlit_flow/schema.py
+            result = import_schema(st.session_state.validated_schema, st.session_state.curr_state, layout=TreeLayout(direction='right'))
+            st.session_state.import_timings = result.timings
             st.success("Schema added to canvas successfully!")
             st.session_state.validation_result = None
             st.session_state.validated_schema = None
@@ -243,6 +130,18 @@ with st.sidebar:
     elif st.session_state.validation_result == "error":
         st.error("Invalid JSON structure. Please check and follow the example structure provided.")
 
+    # Large schemas are read from the file as a stream, either one JSON document or one table or relationship per line
+    schema_file = st.file_uploader("Or upload a schema file (JSON or NDJSON)", type=['json', 'ndjson'])
+    if schema_file is not None and st.button("Import File to Canvas"):
+        result = import_schema(schema_file, st.session_state.curr_state, layout=TreeLayout(direction='right'))
+        if result.ok:
+            st.session_state.import_timings = result.timings
+            st.rerun()
+        st.error(f"Invalid schema file: {'; '.join(result.errors[:5])}")
+
+    if st.session_state.import_timings:
+        st.caption("Last import: " + ", ".join(f"{stage} {seconds * 1000:.1f} ms" for stage, seconds in st.session_state.import_timings.items()))
+
 # Keep the button to add tables
 if st.button("Add Table"):
     new_node = StreamlitFlowNode(
@@ -258,11 +157,14 @@ if st.button("Add Table"):
         deletable=True
     )
     st.session_state.curr_state.nodes.append(new_node)
+    # Put the table in free space next to the model, without moving the tables already there
+    TreeLayout(direction='right').compute(st.session_state.curr_state, node_ids=[new_node.id])
     st.rerun()
 
 st.session_state.curr_state = streamlit_flow('example_flow', 
                                 st.session_state.curr_state, 
-                                layout=TreeLayout(direction='right'), 
+                                # Tables are laid out in Python when imported or added, keep them where they are
+                                layout=ManualLayout(), 
                                 fit_view=True, 
                                 height=500, 
                                 enable_node_menu=True,
@@ -273,20 +175,16 @@ st.session_state.curr_state = streamlit_flow('example_flow',
                                 show_minimap=True, 
                                 hide_watermark=True, 
                                 allow_new_edges=True,
-                                min_zoom=0.1)
-
-# Update edge data for any new edges
-for edge in st.session_state.curr_state.edges:
-    if not hasattr(edge, 'data') or not edge.data:
-        edge = update_edge_data(edge, st.session_state.curr_state.nodes)
+                                min_zoom=0.1,
+                                on_edge_create=on_edge_create)
 
 # Display information about the selected element
 st.subheader("Current Selected Element")
 selected_id = st.session_state.curr_state.selected_id
 
 if selected_id:
-    selected_node = next((node for node in st.session_state.curr_state.nodes if node.id == selected_id), None)
-    selected_edge = next((edge for edge in st.session_state.curr_state.edges if edge.id == selected_id), None)
+    selected_node = st.session_state.curr_state.get_node(selected_id)
+    selected_edge = st.session_state.curr_state.get_edge(selected_id)
 
     if selected_node:
         st.write(f"Table: {selected_node.data['content']}")
@@ -1,13 +1,29 @@
+import json
 import os
+import time
+from typing import Callable, Literal, Optional, Tuple
+
+import streamlit as st
 import streamlit.components.v1 as components
 
 
+from .changes import FlowChanges
 from .elements import StreamlitFlowNode, StreamlitFlowEdge
+from .groups import layout_group
+from .history import FlowHistory
 from .layouts import Layout, ManualLayout
+from .layout_cache import LayoutCache
+from .metrics import FlowMetrics
+from .shared import SharedGraph
 from .state import StreamlitFlowState
+from .sync import SyncRecord
+from .wire import columnar_patch, frame_bytes
 
 _RELEASE = False
 
+# Viewport assumed until the frontend reports its own: the initial one of React Flow, on a wide canvas
+_DEFAULT_VIEWPORT = {'x': 0, 'y': 0, 'zoom': 1, 'width': 1200}
+
 if not _RELEASE:
     _st_flow_func = components.declare_component(
         "streamlit_flow",
@@ -40,7 +56,24 @@ def streamlit_flow(key: str,
                    enable_pane_menu: bool = False,
                    enable_node_menu: bool = False,
                    enable_edge_menu: bool = False,
-                   hide_watermark: bool = False):
+                   hide_watermark: bool = False,
+                   layout_cache: LayoutCache = LayoutCache(),
+                   profile: bool = False,
+                   on_metrics: Optional[Callable[[FlowMetrics], None]] = None,
+                   return_mode: Literal['patch', 'events'] = 'patch',
+                   update_policy: Literal['immediate', 'debounced', 'on_commit'] = 'immediate',
+                   update_window_ms: int = 300,
+                   lazy_loading: bool = False,
+                   viewport_margin: float = 0.5,
+                   group_layout: Optional[Layout] = None,
+                   history: Optional[FlowHistory] = None,
+                   aggregate_edges: bool = False,
+                   wire_format: Literal['json', 'columnar'] = 'json',
+                   on_node_move: Optional[Callable[[StreamlitFlowNode, StreamlitFlowState], None]] = None,
+                   on_node_delete: Optional[Callable[[StreamlitFlowNode, StreamlitFlowState], None]] = None,
+                   on_edge_create: Optional[Callable[[StreamlitFlowEdge, StreamlitFlowState], None]] = None,
+                   on_edge_delete: Optional[Callable[[StreamlitFlowEdge, StreamlitFlowState], None]] = None,
+                   on_selection_change: Optional[Callable[[Optional[str], StreamlitFlowState], None]] = None):
     """
     The main function to render the flowchart component in Streamlit.
     
@@ -65,12 +98,82 @@ def streamlit_flow(key: str,
     - **enable_node_menu** : bool : Whether to enable the node menu.
     - **enable_edge_menu** : bool : Whether to enable the edge menu.
     - **hide_watermark** : bool : Whether to hide the watermark.
+    - **layout_cache** : LayoutCache? : Where layouts computed by the frontend are kept for reuse. Defaults to an in-memory cache shared by all sessions. Pass LayoutCache(directory=...) to keep layouts across server restarts, or None to disable caching.
+    - **profile** : bool : Whether to record where the time of the round trip goes, in Python and in the frontend. The result is set as state.metrics, see FlowMetrics.
+    - **on_metrics** : Callable[[FlowMetrics], None]? : Called with the metrics of every profiled call, eg. to forward them to logging.
+    - **return_mode** : str : How the frontend reports changes. 'patch' sends the changed nodes and edges whole. 'events' sends typed events (node_moved, node_selected, edge_created, node_deleted...) with only the affected ids and fields, applied to the state in place, and interactions that change nothing (eg. clicking the pane again) do not rerun the script.
+    - **update_policy** : str : When interactions are sent to Streamlit, each send causing a rerun. 'immediate' sends every interaction right away. 'debounced' waits until no interaction happened for update_window_ms, then sends all of them as one message. 'on_commit' holds them until the user clicks the "Apply changes" button shown over the canvas. Updates from Python are acknowledged right away in every policy, which also sends the interactions held until then.
+    - **update_window_ms** : int : The quiet time the debounced policy waits for, in milliseconds.
+    - **lazy_loading** : bool : Whether to only send the nodes around the viewport, with the edges touching them. The frontend reports its viewport, and asks for the nodes of the new region when the user pans or zooms out of the loaded one. Requires the positions to be computed in Python, ie. ManualLayout, after Layout.compute if needed. The last viewport is set as state.viewport.
+    - **viewport_margin** : float : With lazy_loading, how much of the graph beyond the viewport is loaded, as a fraction of the viewport size on each side.
+    - **group_layout** : Layout? : Lays out the contents of a group when it is expanded, only them, with this layout computed in Python (see StreamlitFlowState.expand). The contents keep their positions if None. Collapsed groups are always sent without their contents, see StreamlitFlowNode.
+    - **history** : FlowHistory? : Records the changes of the state, from the frontend or the script, as undo steps on every call, and undoes or redoes them on Ctrl+Z and Ctrl+Y in the canvas. Keep it in st.session_state with the state.
+    - **aggregate_edges** : bool : Whether to draw the edges going from the same node to the same node (eg. column-level relationships between two tables) as one edge, labelled with their count and carrying their ids. Clicking it shows the edges, double clicking one of them bundles them again. Only the bundle is sent to the frontend while it is not expanded.
+    - **wire_format** : str : How nodes are sent to the frontend. 'json' sends them as dicts. 'columnar' sends their positions, types, flags and contents as typed columns of an Arrow table, with the other attributes only where they differ from the defaults, which the frontend decodes straight into React Flow nodes. Several times smaller for nodes with little data, see wire.py.
+    - **on_node_move** : Callable[[StreamlitFlowNode, StreamlitFlowState], None]? : Called with each node the user moved, and the state, when the message of the frontend is applied. Only the elements the message names are compared with what they were, see FlowChanges.
+    - **on_node_delete** : Callable[[StreamlitFlowNode, StreamlitFlowState], None]? : Called with each node the user deleted, as it was, and the state.
+    - **on_edge_create** : Callable[[StreamlitFlowEdge, StreamlitFlowState], None]? : Called with each edge the user created, and the state. The edge can be modified in place, eg. to fill in its data, and is sent back to the frontend.
+    - **on_edge_delete** : Callable[[StreamlitFlowEdge, StreamlitFlowState], None]? : Called with each edge the user deleted, as it was, and the state.
+    - **on_selection_change** : Callable[[Optional[str], StreamlitFlowState], None]? : Called with the id of the element selected (None when the selection was cleared), and the state, when it changed.
+
+    Returns the state given, updated in place with the changes from the frontend. Copy it before the call to keep the previous graph.
     """
-    nodes = [node.asdict() for node in state.nodes]
-    edges = [edge.asdict() for edge in state.edges]
+    assert return_mode in ['patch', 'events'], f"return_mode must be one of ['patch', 'events']. Got {return_mode}"
+    assert update_policy in ['immediate', 'debounced', 'on_commit'], f"update_policy must be one of ['immediate', 'debounced', 'on_commit']. Got {update_policy}"
+    assert viewport_margin >= 0, f"viewport_margin must be positive. Got {viewport_margin}"
+    assert wire_format in ['json', 'columnar'], f"wire_format must be one of ['json', 'columnar']. Got {wire_format}"
+
+    metrics = FlowMetrics(run=state.metrics.run + 1 if state.metrics else 1) if profile else None
+    start = time.perf_counter()
+
+    # Only the elements that changed since the frontend last acknowledged are sent, see sync.py
+    sync_key = f"_streamlit_flow_sync_{key}"
+    if sync_key not in st.session_state:
+        st.session_state[sync_key] = SyncRecord()
+    sync_record = st.session_state[sync_key]
+
+    layout_options = layout.__to_dict__()
+    if layout_options.get('fixed', False):
+        layout_cache = None
+    # The frontend cannot lay out a graph it only holds part of
+    assert not lazy_loading or layout_options.get('fixed', False), "lazy_loading requires the positions computed in Python, use ManualLayout"
+
+    # Apply the latest frontend message before diffing, so that the patch is based on the version the frontend holds
+    message = st.session_state.get(key)
+    callbacks = {'on_node_move': on_node_move, 'on_node_delete': on_node_delete, 'on_edge_create': on_edge_create,
+                 'on_edge_delete': on_edge_delete, 'on_selection_change': on_selection_change}
+    received = _receive(sync_record, state, message, layout_cache, layout_options, metrics)
+    if received:
+        _call_change_callbacks(sync_record.changes, state, **callbacks)
+    if history is not None:
+        # Also records the changes the script made since the previous call
+        _apply_history(history, state, message if received else None)
+    if group_layout is not None:
+        _layout_expanded_groups(sync_record, state, group_layout)
+    build_start = time.perf_counter()
+    window = _viewport_window(state.viewport, height, viewport_margin) if lazy_loading else None
+    patch = sync_record.build_patch(state, window, aggregate_edges)
+    if metrics is not None and patch is not None:
+        metrics.patch_nodes = len(patch['nodes'])
+        metrics.patch_edges = len(patch['edges'])
+    # The nodes then go as an Arrow table beside the rest of the patch, see wire.py
+    patch_nodes = None
+    if wire_format == 'columnar' and patch is not None:
+        patch, patch_nodes = columnar_patch(patch)
+    if metrics is not None:
+        metrics.build_patch_ms = (time.perf_counter() - build_start) * 1000
+        if patch is not None:
+            metrics.patch_bytes = len(json.dumps(patch, default=str)) + (frame_bytes(patch_nodes) if patch_nodes is not None else 0)
 
-    component_value = _st_flow_func(nodes=nodes,
-                                    edges=edges,
+    # The frontend lays the graph out once it has received all of it, so offer it the cached layout then
+    cached_layout = None
+    if layout_cache is not None and patch is not None and patch['full']:
+        cached_layout = layout_cache.get(LayoutCache.key(state, layout_options))
+
+    component_value = _st_flow_func(sync=patch,
+                                    syncNodes=patch_nodes,
+                                    frontendVersion=sync_record.frontend_version,
+                                    requestFull=sync_record.request_full,
                                     height=height,
                                     showControls=show_controls,
                                     fitView=fit_view,
@@ -79,7 +182,8 @@ def streamlit_flow(key: str,
                                     animateNewEdges=animate_new_edges,
                                     allowNewEdges=allow_new_edges,
                                     allowColumnConnections=allow_column_connections,
-                                    layoutOptions=layout.__to_dict__(),
+                                    layoutOptions=layout_options,
+                                    cachedLayout=cached_layout,
                                     getNodeOnClick=get_node_on_click,
                                     getEdgeOnClick=get_edge_on_click,
                                     panOnDrag=pan_on_drag,
@@ -89,18 +193,97 @@ def streamlit_flow(key: str,
                                     enablePaneMenu=enable_pane_menu,
                                     enableEdgeMenu=enable_edge_menu,
                                     hideWatermark=hide_watermark,
+                                    profile=profile,
+                                    returnMode=return_mode,
+                                    updatePolicy=update_policy,
+                                    updateWindowMs=update_window_ms,
+                                    lazyLoading=lazy_loading,
+                                    loadedWindow=list(window) if window is not None else None,
+                                    historyKeys=history is not None,
+                                    aggregateEdges=aggregate_edges,
                                     key=key,
-                                    timestamp=state.timestamp,
                                     component='streamlit_flow')
 
-    if component_value is None:
-        return state
+    # The component keeps returning its last value on every rerun; messages already applied above are ignored
+    if _receive(sync_record, state, component_value, layout_cache, layout_options, metrics):
+        _call_change_callbacks(sync_record.changes, state, **callbacks)
+        if history is not None:
+            _apply_history(history, state, component_value)
 
-    new_state = StreamlitFlowState(
-        nodes=[StreamlitFlowNode.from_dict(node) for node in component_value['nodes']],
-        edges=[StreamlitFlowEdge.from_dict(edge) for edge in component_value['edges']],
-        selected_id=component_value['selectedId'],
-        timestamp=component_value['timestamp']
-    )
+    if metrics is not None:
+        metrics.total_ms = (time.perf_counter() - start) * 1000
+        state.metrics = metrics
+        if on_metrics is not None:
+            on_metrics(metrics)
+
+    return state
+
+
+def _layout_expanded_groups(sync_record:SyncRecord, state:StreamlitFlowState, group_layout:Layout) -> None:
+
+    # Groups collapsed in the last patch and expanded since, in the frontend or in Python
+    for group_id in sync_record.collapsed_groups:
+        group = state.get_node(group_id)
+        if group is not None and not group.collapsed:
+            layout_group(state, group_id, group_layout)
+
+
+def _call_change_callbacks(changes:FlowChanges, state:StreamlitFlowState, on_node_move, on_node_delete, on_edge_create, on_edge_delete, on_selection_change) -> None:
+
+    # Elements still in the state are handed out with edit_node / edit_edge, as callbacks may modify them
+    if on_node_move is not None and changes.moved_nodes:
+        for node in state.edit_nodes(changes.moved_nodes):
+            on_node_move(node, state)
+    if on_node_delete is not None:
+        for node in changes.deleted_nodes:
+            on_node_delete(node, state)
+    if on_edge_create is not None:
+        for edge_id in changes.created_edges:
+            if state.get_edge(edge_id) is not None:
+                on_edge_create(state.edit_edge(edge_id), state)
+    if on_edge_delete is not None:
+        for edge in changes.deleted_edges:
+            on_edge_delete(edge, state)
+    if on_selection_change is not None and changes.selection_changed:
+        on_selection_change(state.selected_id, state)
+
+
+def _apply_history(history:FlowHistory, state:StreamlitFlowState, message:dict) -> None:
+
+    # Changes the message carries are recorded first, so that an undo sent with them reverts them
+    action = message.get('historyAction') if message is not None else None
+    if action == 'undo':
+        history.undo(state)
+    elif action == 'redo':
+        history.redo(state)
+    else:
+        history.record(state)
+
+
+def _viewport_window(viewport:Optional[dict], height:int, margin:float) -> Tuple[float, float, float, float]:
+
+    # The region of the canvas under the viewport, grown by the margin on each side
+    viewport = viewport or {**_DEFAULT_VIEWPORT, 'height': height}
+    zoom = viewport['zoom']
+    width, height = viewport['width'] / zoom, viewport['height'] / zoom
+    x0, y0 = -viewport['x'] / zoom, -viewport['y'] / zoom
+    return (x0 - width * margin, y0 - height * margin, x0 + width * (1 + margin), y0 + height * (1 + margin))
+
+
+def _receive(sync_record:SyncRecord, state:StreamlitFlowState, message:dict, layout_cache:LayoutCache, layout_options:dict, metrics:FlowMetrics) -> bool:
+
+    start = time.perf_counter()
+    received = sync_record.receive(state, message)
+    if received and layout_cache is not None and message.get('layout'):
+        # The layout was computed on the graph the message carries, which the state now holds
+        layout_cache.put(LayoutCache.key(state, layout_options), message['layout'])
 
-    return new_state
+    if metrics is not None:
+        metrics.receive_ms += (time.perf_counter() - start) * 1000
+        if received:
+            metrics.received_nodes = len(message.get('nodes', []))
+            metrics.received_edges = len(message.get('edges', []))
+            metrics.frontend = message.get('metrics')
+            if message.get('sentAt') is not None:
+                metrics.transport_ms = time.time() * 1000 - message['sentAt']
+    return received
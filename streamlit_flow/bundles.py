@@ -0,0 +1,59 @@
+import math
+from typing import List, Set, Tuple
+
+from .elements import StreamlitFlowEdge
+from .groups import is_summary_edge, pair_edge_id
+
+# Bundle edges only exist in the frontend, their ids tell them apart from the edges of the state
+BUNDLE_EDGE_PREFIX = 'st-flow-bundle_'
+
+
+def is_bundle_edge(edge_id:str) -> bool:
+    return edge_id.startswith(BUNDLE_EDGE_PREFIX)
+
+
+def bundle_id(source:str, target:str) -> str:
+    return pair_edge_id(BUNDLE_EDGE_PREFIX, source, target)
+
+
+def bundle_edge(source:str, target:str, edges:List[StreamlitFlowEdge]) -> StreamlitFlowEdge:
+    """
+    The edge drawn in place of parallel edges, labelled with their count and thicker the more there are.
+    Its data holds the ids of the edges ('edgeIds'). Clicking it in the frontend expands it.
+    """
+    return StreamlitFlowEdge(bundle_id(source, target),
+                             source,
+                             target,
+                             label=f"{len(edges)} edges",
+                             marker_end=edges[0].marker_end,
+                             style={'strokeWidth': min(1 + math.log2(len(edges)), 6)},
+                             data={'bundle': True, 'count': len(edges), 'edgeIds': [edge.id for edge in edges]})
+
+
+def bundle_edges(edges:List[StreamlitFlowEdge], expanded:Set[str]) -> Tuple[List[StreamlitFlowEdge], int]:
+    """
+    Merge the edges that go from the same node to the same node (parallel edges, eg. column-level links between
+    two tables) into one bundle edge each, except for the bundles the frontend expanded.
+
+    Arguments
+    - **edges** : List[StreamlitFlowEdge] : The edges to draw.
+    - **expanded** : Set[str] : The ids of the bundles to draw as their edges.
+
+    Returns the edges to draw and the number of bundles among them.
+    """
+    pairs = {}
+    drawn = []
+    for edge in edges:
+        if is_summary_edge(edge.id):
+            drawn.append(edge)
+        else:
+            pairs.setdefault((edge.source, edge.target), []).append(edge)
+
+    bundles = 0
+    for (source, target), parallel_edges in pairs.items():
+        if len(parallel_edges) < 2 or bundle_id(source, target) in expanded:
+            drawn.extend(parallel_edges)
+        else:
+            drawn.append(bundle_edge(source, target, parallel_edges))
+            bundles += 1
+    return drawn, bundles
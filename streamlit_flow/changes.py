@@ -0,0 +1,119 @@
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .elements import StreamlitFlowNode, StreamlitFlowEdge
+from .state import StreamlitFlowState
+
+
+@dataclass
+class FlowChanges:
+    """
+    What a message from the frontend changed in the state, found by comparing the elements it names before and
+    after applying it (an id-keyed diff, whose cost depends on the message rather than on the graph). Drives the
+    callbacks of streamlit_flow().
+
+    - **moved_nodes** : List[str] : Ids of the nodes whose position changed. Empty for the messages that carry the whole graph (first render, layouts computed in the frontend).
+    - **created_nodes** : List[str] : Ids of the nodes added.
+    - **created_edges** : List[str] : Ids of the edges added, eg. connected on the canvas.
+    - **deleted_nodes** : List[StreamlitFlowNode] : The nodes removed, as they were.
+    - **deleted_edges** : List[StreamlitFlowEdge] : The edges removed, as they were.
+    - **selection_changed** : bool : Whether state.selected_id changed.
+    """
+
+    moved_nodes: List[str] = field(default_factory=list)
+    created_nodes: List[str] = field(default_factory=list)
+    created_edges: List[str] = field(default_factory=list)
+    deleted_nodes: List[StreamlitFlowNode] = field(default_factory=list)
+    deleted_edges: List[StreamlitFlowEdge] = field(default_factory=list)
+    selection_changed: bool = False
+
+    def __bool__(self) -> bool:
+        return bool(self.moved_nodes or self.created_nodes or self.created_edges or self.deleted_nodes or
+                    self.deleted_edges or self.selection_changed)
+
+
+class MessageDiff:
+    """
+    The elements a message names, as they are in the state before it is applied.
+
+    Arguments
+    - **state** : StreamlitFlowState : The state the message is about to be applied to.
+    - **message** : Dict[str, any] : The message, in the patch or events format.
+    - **replace** : bool : Whether the message replaces the whole graph, so that the elements it does not hold are removed.
+    """
+
+    def __init__(self, state:StreamlitFlowState, message:Dict[str, any], replace:bool) -> None:
+        node_ids, edge_ids, removed_node_ids, removed_edge_ids = _named_ids(message)
+        if replace:
+            named_nodes, named_edges = set(node_ids), set(edge_ids)
+            removed_node_ids = [node.id for node in state.nodes if node.id not in named_nodes]
+            removed_edge_ids = [edge.id for edge in state.edges if edge.id not in named_edges]
+
+        self.track_moves = not message.get('full', False)
+        self.node_ids = node_ids
+        self.edge_ids = edge_ids
+        self.positions = {}
+        self.existing_edges = set()
+        for node_id in node_ids:
+            node = state.get_node(node_id)
+            if node is not None:
+                self.positions[node_id] = (node.position.get('x'), node.position.get('y'))
+        for edge_id in edge_ids:
+            if state.get_edge(edge_id) is not None:
+                self.existing_edges.add(edge_id)
+        self.removed_nodes = _existing(state.get_node, removed_node_ids)
+        self.removed_edges = _existing(state.get_edge, removed_edge_ids)
+        self.selected_id = state.selected_id
+
+    def changes(self, state:StreamlitFlowState) -> FlowChanges:
+        """
+        Compare with the state once the message is applied.
+        """
+        changes = FlowChanges(selection_changed=state.selected_id != self.selected_id)
+        for node_id in _unique(self.node_ids):
+            node = state.get_node(node_id)
+            if node is None:
+                continue
+            if node_id not in self.positions:
+                changes.created_nodes.append(node_id)
+            elif self.track_moves and (node.position.get('x'), node.position.get('y')) != self.positions[node_id]:
+                changes.moved_nodes.append(node_id)
+        changes.created_edges = [edge_id for edge_id in _unique(self.edge_ids)
+                                 if edge_id not in self.existing_edges and state.get_edge(edge_id) is not None]
+        changes.deleted_nodes = [node for node_id, node in self.removed_nodes.items() if state.get_node(node_id) is None]
+        changes.deleted_edges = [edge for edge_id, edge in self.removed_edges.items() if state.get_edge(edge_id) is None]
+        return changes
+
+
+def _named_ids(message:Dict[str, any]):
+
+    if 'events' not in message:
+        return ([node['id'] for node in message.get('nodes', [])], [edge['id'] for edge in message.get('edges', [])],
+                message.get('removedNodes', []), message.get('removedEdges', []))
+
+    ids = {'node': ([], []), 'edge': ([], [])}
+    for event in message['events']:
+        kind, _, action = event['type'].partition('_')
+        if kind not in ids:
+            continue
+        if action == 'created':
+            ids[kind][0].append(event[kind]['id'])
+        elif action == 'deleted':
+            ids[kind][1].append(event['id'])
+        elif action in ('moved', 'updated'):
+            ids[kind][0].append(event['id'])
+    return ids['node'][0], ids['edge'][0], ids['node'][1], ids['edge'][1]
+
+
+def _existing(get, element_ids:List[str]) -> Dict[str, any]:
+
+    elements = {}
+    for element_id in element_ids:
+        element = get(element_id)
+        if element is not None:
+            elements[element_id] = element
+    return elements
+
+
+def _unique(element_ids:List[str]) -> List[str]:
+    return list(dict.fromkeys(element_ids))
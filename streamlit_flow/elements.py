@@ -1,8 +1,51 @@
-from typing import Dict, Tuple, Union, Type, TypeVar, Literal
+import hashlib
+import json
+from typing import Dict, Optional, Tuple, Union, Type, TypeVar, Literal
 
 T_StreamlitFlowNode = TypeVar('T_StreamlitFlowNode', bound='StreamlitFlowNode')
 T_StreamlitFlowEdge = TypeVar('T_StreamlitFlowEdge', bound='StreamlitFlowEdge')
 
+# Keys handled explicitly by from_dict, plus the ones React Flow computes at runtime (measured size, absolute position)
+_NODE_KNOWN_KEYS = frozenset(['id', 'position', 'data', 'type', 'sourcePosition', 'targetPosition', 'hidden', 'selected', 'dragging', 'draggable', 'selectable', 'connectable', 'resizing', 'deletable', 'width', 'height', 'zIndex', 'focusable', 'style', 'positionAbsolute'])
+_EDGE_KNOWN_KEYS = frozenset(['id', 'source', 'target', 'type', 'markerStart', 'markerEnd', 'hidden', 'animated', 'selected', 'deletable', 'focusable', 'zIndex', 'label', 'labelStyle', 'labelShowBg', 'labelBgStyle', 'style', 'data'])
+
+# Frontend keys whose attribute has another name
+_NODE_ATTRIBUTES = {'sourcePosition': 'source_position', 'targetPosition': 'target_position', 'zIndex': 'z_index'}
+_EDGE_ATTRIBUTES = {'markerStart': 'marker_start', 'markerEnd': 'marker_end', 'zIndex': 'z_index', 'labelStyle': 'label_style',
+                    'labelShowBg': 'label_show_bg', 'labelBgStyle': 'label_bg_style'}
+
+
+def fingerprint(element_dict:Dict[str, any]) -> str:
+    """
+    Stable content hash of a serialized node or edge.
+    """
+    encoded = json.dumps(element_dict, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return hashlib.blake2b(encoded, digest_size=8).hexdigest()
+
+def _kwargs_getattr(element:any, name:str) -> any:
+    # Extra attributes passed as kwargs (eg. sourceHandle) are readable as attributes
+    if not name.startswith('__'):
+        try:
+            return object.__getattribute__(element, 'kwargs')[name]
+        except (AttributeError, KeyError):
+            pass
+    raise AttributeError(f"'{type(element).__name__}' object has no attribute '{name}'")
+
+def _update_from_dict(element:any, fields:Dict[str, any], known_keys:frozenset, attributes:Dict[str, str]) -> None:
+    for key, value in fields.items():
+        if key == 'id':
+            continue
+        if key not in known_keys:
+            if value is None:
+                element.kwargs.pop(key, None)
+            else:
+                element.kwargs[key] = value
+        elif key in attributes:
+            setattr(element, attributes[key], value)
+        elif hasattr(type(element), key):
+            # Slots of the element classes, or properties of the store views
+            setattr(element, key, value)
+
 class StreamlitFlowNode:
 
     """
@@ -11,8 +54,8 @@ class StreamlitFlowNode:
     Arguments
     - **id** : str : Unique identifier for the node
     - **pos** : Tuple[float, float] : Position of the node in the canvas
-    - **data** : Dict[str, any] : Arbitrary data to save in the node. Use {'content': 'Node content'} to set the content of the node
-    - **node_type** : str : Type of the node. One of ['default', 'input', 'output']
+    - **data** : Dict[str, any] : Arbitrary data to save in the node. Use {'content': 'Node content'} to set the content of the node, rendered as markdown. The markdown plugins ('gfm', 'code', 'html', 'math') are picked from the content, or set with {'plugins': [...]}
+    - **node_type** : str : Type of the node. One of ['default', 'input', 'output', 'group']
     - **source_position** : str : Position of the source anchor. One of ['top', 'bottom', 'left', 'right']
     - **target_position** : str : Position of the target anchor. One of ['top', 'bottom', 'left', 'right']
     - **hidden** : bool : Whether the node is hidden
@@ -26,13 +69,28 @@ class StreamlitFlowNode:
     - **z_index** : float : Z-index of the node
     - **focusable** : bool : Whether the node is focusable
     - **style** : Dict[str, any] : CSS style of the node
+
+    Nodes are slotted to keep per-session memory low on large graphs. Extra keyword arguments are
+    kept in `kwargs`, sent to the frontend as is and readable as attributes.
+
+    Groups are nodes of type 'group'. A node is put in a group with parentNode='<group id>' (readable as
+    `parent_node`), and its position is then relative to the group. A group whose data has 'collapsed': True
+    (see `collapsed`) is drawn alone: its contents are not sent to the frontend, and the edges between its
+    contents and the rest of the graph are drawn as one summary edge per pair of endpoints (see groups.py).
+
+    Nodes with columns (data['columns']) show up to `column_budget` of them at once (data['columnBudget'], 20 if
+    unset), in a list that scrolls, with a search box. Only the columns shown, and the ones connected to an edge,
+    have connection handles.
     """
 
+    __slots__ = ('id', 'position', 'data', 'type', 'source_position', 'target_position', 'hidden', 'selected', 'dragging',
+                 'draggable', 'selectable', 'connectable', 'resizing', 'deletable', 'z_index', 'focusable', 'style', 'kwargs')
+
     def __init__(self,
                     id:str,
                     pos: Tuple[float, float],
                     data:Dict[str, any],
-                    node_type:Literal['default', 'input', 'output'] = 'default',
+                    node_type:Literal['default', 'input', 'output', 'group'] = 'default',
                     source_position:Literal['bottom', 'top', 'left', 'right'] = 'bottom',
                     target_position:Literal['bottom', 'top', 'left', 'right'] = 'top',
                     hidden:bool=False,
@@ -77,13 +135,54 @@ class StreamlitFlowNode:
             content = self.data.pop('label')
             self.data['content'] = content
 
-        self.columns = data.get('columns', [])  # Add this line
         self.__validate__()
 
+    __getattr__ = _kwargs_getattr
+
+    @property
+    def columns(self) -> list:
+        return self.data.get('columns', [])
+
+    @columns.setter
+    def columns(self, columns:list) -> None:
+        self.data['columns'] = columns
+
+    @property
+    def column_budget(self) -> Optional[int]:
+        return self.data.get('columnBudget')
+
+    @column_budget.setter
+    def column_budget(self, budget:Optional[int]) -> None:
+        if budget is None:
+            self.data.pop('columnBudget', None)
+        else:
+            assert budget > 0, f"column_budget must be positive. Got {budget}"
+            self.data['columnBudget'] = budget
+
+    @property
+    def collapsed(self) -> bool:
+        return bool(self.data.get('collapsed', False))
+
+    @collapsed.setter
+    def collapsed(self, collapsed:bool) -> None:
+        self.data['collapsed'] = collapsed
+
+    @property
+    def parent_node(self) -> Optional[str]:
+        return self.kwargs.get('parentNode')
+
+    @parent_node.setter
+    def parent_node(self, parent_id:Optional[str]) -> None:
+        if parent_id is None:
+            self.kwargs.pop('parentNode', None)
+        else:
+            self.kwargs['parentNode'] = parent_id
+
     @classmethod
     def from_dict(cls: Type[T_StreamlitFlowNode], node_dict:Dict[str, any]) -> T_StreamlitFlowNode:
 
-        # other_attributes_dict = {key: value for key, value in node_dict.items() if key not in ['id', 'position', 'data', 'type', 'sourcePosition', 'targetPosition', 'hidden', 'selected', 'dragging', 'draggable', 'selectable', 'connectable', 'resizing', 'deletable', 'width', 'height', 'zIndex', 'focusable', 'style']}
+        # Keep attributes we do not model explicitly (handles, parentNode, ...) so that patches round trip losslessly
+        other_attributes_dict = {key: value for key, value in node_dict.items() if key not in _NODE_KNOWN_KEYS}
 
         # Update the data dictionary to include columns
         data = node_dict.get('data', {})
@@ -106,11 +205,23 @@ class StreamlitFlowNode:
                     deletable=node_dict.get('deletable', False),
                     z_index=node_dict.get('zIndex', 0),
                     focusable=node_dict.get('focusable', True),
-                    style=node_dict.get('style', {}))
+                    style=node_dict.get('style', {}),
+                    **other_attributes_dict)
 
+    def update_from_dict(self, fields:Dict[str, any]) -> None:
+        """
+        Update the node in place from some of its fields, in the format of from_dict (eg. {'position': {'x': 0, 'y': 0}}).
+        """
+        _update_from_dict(self, fields, _NODE_KNOWN_KEYS, _NODE_ATTRIBUTES)
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the content of the node: equal for nodes that serialize the same, across sessions and processes.
+        """
+        return fingerprint(self.asdict())
 
     def __validate__(self):
-        assert self.type in ['default', 'input', 'output'], f"Node type must be one of ['default', 'input', 'output']. Got {self.type}"
+        assert self.type in ['default', 'input', 'output', 'group'], f"Node type must be one of ['default', 'input', 'output', 'group']. Got {self.type}"
         assert self.source_position in ['top', 'bottom', 'left', 'right'], f"Source position must be one of ['top', 'bottom', 'left', 'right']. Got {self.source_position}"
         assert self.target_position in ['top', 'bottom', 'left', 'right'], f"Target position must be one of ['top', 'bottom', 'left', 'right']. Got {self.target_position}"
 
@@ -165,8 +276,14 @@ class StreamlitFlowEdge:
     - **label_show_bg** : bool : Whether to show background for the label
     - **label_bg_style** : Dict[str, any] : CSS style of the label background
     - **style** : Dict[str, any] : CSS style of the edge
+    - **data** : Dict[str, any] : Arbitrary data to save in the edge
+
+    Edges are slotted like nodes, extra keyword arguments are kept in `kwargs`.
     """
 
+    __slots__ = ('id', 'source', 'target', 'type', 'marker_start', 'marker_end', 'hidden', 'animated', 'selected', 'deletable',
+                 'focusable', 'z_index', 'label', 'label_style', 'label_show_bg', 'label_bg_style', 'style', 'data', 'kwargs')
+
     def __init__(self,
                     id:str,
                     source:str,
@@ -185,6 +302,7 @@ class StreamlitFlowEdge:
                     label_show_bg:bool=False,
                     label_bg_style:Dict[str, any]={},
                     style:Dict[str, any]={},
+                    data:Dict[str, any]=None,
                     **kwargs) -> None:
 
         self.id = id
@@ -204,14 +322,18 @@ class StreamlitFlowEdge:
         self.label_show_bg = label_show_bg
         self.label_bg_style = label_bg_style
         self.style = style
+        self.data = data
         self.kwargs = kwargs
 
         self.__validate__()
 
+    __getattr__ = _kwargs_getattr
+
     @classmethod
     def from_dict(cls: Type[T_StreamlitFlowEdge], edge_dict:Dict[str, any]) -> T_StreamlitFlowEdge:
 
-        # other_attributes_dict = {key: value for key, value in edge_dict.items() if key not in ['id', 'source', 'target', 'type', 'hidden', 'animated', 'selected', 'deletable', 'focusable', 'zIndex', 'label', 'labelStyle', 'labelShowBg', 'labelBgStyle', 'style']}
+        # Keep attributes we do not model explicitly (sourceHandle, targetHandle, data, ...)
+        other_attributes_dict = {key: value for key, value in edge_dict.items() if key not in _EDGE_KNOWN_KEYS}
         return cls( id=edge_dict.get('id', ''),
                     source=edge_dict.get('source', ''),
                     target=edge_dict.get('target', ''),
@@ -228,8 +350,21 @@ class StreamlitFlowEdge:
                     label_style=edge_dict.get('labelStyle', {}),
                     label_show_bg=edge_dict.get('labelShowBg', False),
                     label_bg_style=edge_dict.get('labelBgStyle', {}),
-                    style=edge_dict.get('style', {}))
-
+                    style=edge_dict.get('style', {}),
+                    data=edge_dict.get('data'),
+                    **other_attributes_dict)
+
+    def update_from_dict(self, fields:Dict[str, any]) -> None:
+        """
+        Update the edge in place from some of its fields, in the format of from_dict (eg. {'label': '1:N'}).
+        """
+        _update_from_dict(self, fields, _EDGE_KNOWN_KEYS, _EDGE_ATTRIBUTES)
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the content of the edge: equal for edges that serialize the same, across sessions and processes.
+        """
+        return fingerprint(self.asdict())
 
     def __validate__(self) -> None:
         assert self.type in ['default', 'straight', 'step', "smoothstep", "simplebezier"], f"Edge type must be one of ['default', 'straight', 'step', 'smoothstep', 'simplebezier']. Got {self.type}"
@@ -255,6 +390,8 @@ class StreamlitFlowEdge:
             "labelBgStyle": self.label_bg_style,
             "style": self.style
         }
+        if self.data is not None:
+            edge_dict["data"] = self.data
 
         edge_dict.update(self.kwargs)
         return edge_dict
@@ -0,0 +1,322 @@
+import inspect
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .store import (NodeStore, NodeView, EdgeStore, EdgeView, _NODE_TYPES, _HANDLE_POSITIONS, _EDGE_TYPES,
+                    _NODE_FLAGS, _EDGE_FLAGS, _DEFAULT_NODE_STYLE, _EMPTY)
+
+# Attributes read from the frames, under these column names unless remapped with column_map
+NODE_COLUMNS = ['id', 'x', 'y', 'type', 'source_position', 'target_position', *_NODE_FLAGS, 'z_index', 'style', 'data', 'kwargs']
+EDGE_COLUMNS = ['id', 'source', 'target', 'type', 'marker_start', 'marker_end', *_EDGE_FLAGS, 'z_index', 'label',
+                'label_style', 'label_bg_style', 'style', 'data', 'kwargs']
+
+
+def _defaults(add:callable, type_argument:str) -> Dict[str, any]:
+    # The defaults of the frames are the ones of NodeStore.add and EdgeStore.add
+    defaults = {name: parameter.default for name, parameter in inspect.signature(add).parameters.items()
+                if parameter.default is not inspect.Parameter.empty}
+    defaults['type'] = defaults.pop(type_argument)
+    return defaults
+
+_NODE_DEFAULTS = _defaults(NodeStore.add, 'node_type')
+_EDGE_DEFAULTS = _defaults(EdgeStore.add, 'edge_type')
+
+
+def _invalid_rows(valid:np.ndarray, index:pd.Index) -> List[any]:
+    return index[~valid][:5].tolist()
+
+
+def _typed_array(typecode:str, values:np.ndarray) -> array:
+    column = array(typecode)
+    column.frombytes(np.ascontiguousarray(values, dtype=np.dtype(typecode)).tobytes())
+    return column
+
+
+class _FrameReader:
+
+    """
+    Reads the attribute columns of a frame, validating each column at once.
+    """
+
+    def __init__(self, frame:pd.DataFrame, name:str, columns:List[str], column_map:Dict[str, str]) -> None:
+        unknown = set(column_map) - set(columns)
+        assert not unknown, f"column_map of {name} has unknown attributes {sorted(unknown)}. Expected some of {columns}"
+
+        self.frame = frame
+        self.name = name
+        self.columns = {attribute: column_map.get(attribute, attribute) for attribute in columns}
+        self.columns = {attribute: column for attribute, column in self.columns.items() if column in frame.columns}
+        # Columns that are not attributes go to the data of the elements
+        self.extra_columns = [column for column in frame.columns if column not in self.columns.values()]
+
+    def has(self, attribute:str) -> bool:
+        return attribute in self.columns
+
+    def _column(self, attribute:str) -> pd.Series:
+        return self.frame[self.columns[attribute]]
+
+    def _check(self, attribute:str, valid:np.ndarray, expected:str) -> None:
+        assert valid.all(), f"{self.name} column {self.columns[attribute]} must be {expected}. Got invalid values at rows {_invalid_rows(valid, self.frame.index)}"
+
+    def ids(self, attribute:str) -> pd.Series:
+        values = self._column(attribute)
+        self._check(attribute, values.notna().to_numpy(), "set for every row")
+        # Plain object strings, whose lookups are faster than with the string dtypes of pandas
+        return values.astype(str).astype(object).reset_index(drop=True)
+
+    def numbers(self, attribute:str, default:float) -> np.ndarray:
+        if not self.has(attribute):
+            return np.full(len(self.frame), default, dtype=np.float64)
+        values = pd.to_numeric(self._column(attribute), errors='coerce')
+        self._check(attribute, values.notna().to_numpy(), "numeric")
+        return values.to_numpy(dtype=np.float64)
+
+    def codes(self, attribute:str, categories:List[str], default:str) -> np.ndarray:
+        if not self.has(attribute):
+            return np.full(len(self.frame), categories.index(default), dtype=np.uint8)
+        codes = pd.Categorical(self._column(attribute), categories=categories).codes
+        self._check(attribute, codes >= 0, f"one of {categories}")
+        return codes.astype(np.uint8)
+
+    def flags(self, names:List[str], defaults:Dict[str, bool], dtype:type) -> np.ndarray:
+        flags = np.zeros(len(self.frame), dtype=dtype)
+        for bit, name in enumerate(names):
+            if self.has(name):
+                values = self._column(name)
+                self._check(name, values.isin([True, False]).to_numpy(), "boolean")
+                flags |= values.to_numpy(dtype=bool).astype(dtype) << bit
+            elif defaults[name]:
+                flags |= 1 << bit
+        return flags
+
+    def strings(self, attribute:str, default:str) -> List[str]:
+        if not self.has(attribute):
+            return [default] * len(self.frame)
+        return self._column(attribute).fillna(default).astype(str).tolist()
+
+    def dicts(self, attribute:str) -> List[Optional[dict]]:
+        # Missing values (None, NaN) are returned as None, dicts as copies that the frame does not share
+        if not self.has(attribute):
+            return [None] * len(self.frame)
+        values = self._column(attribute).tolist()
+        valid = np.fromiter((value is None or value != value or isinstance(value, dict) for value in values), dtype=bool, count=len(values))
+        self._check(attribute, valid, "dicts")
+        return [dict(value) if isinstance(value, dict) else None for value in values]
+
+    def data(self) -> Optional[List[dict]]:
+        """
+        The data column merged with the extra columns, or None when there is neither.
+        """
+        data = self.dicts('data') if self.has('data') else None
+        if not self.extra_columns:
+            return data
+
+        extras = self.frame[self.extra_columns].astype(object)
+        records = extras.where(extras.notna(), None).to_dict('records')
+        if data is None:
+            return records
+        return [{**values, **record} if values else record for values, record in zip(data, records)]
+
+
+def nodes_from_frame(frame:pd.DataFrame, column_map:Dict[str, str]=None) -> NodeStore:
+    """
+    Build a NodeStore from a frame with one node per row. See StreamlitFlowState.from_frames.
+    """
+    reader = _FrameReader(frame, 'nodes', NODE_COLUMNS, column_map or {})
+    assert reader.has('id'), f"nodes must have a column {(column_map or {}).get('id', 'id')} with the ids"
+
+    ids = reader.ids('id')
+    duplicated = ids.duplicated(keep=False).to_numpy()
+    assert not duplicated.any(), f"node ids must be unique. Got duplicates at rows {_invalid_rows(~duplicated, frame.index)}"
+
+    data = reader.data()
+    if data is None:
+        data = [{} for _ in range(len(frame))]
+    else:
+        data = [values if values is not None else {} for values in data]
+
+    styles = reader.dicts('style')
+    for style in styles:
+        if style is not None:
+            style.setdefault('width', 'auto')
+            style.setdefault('height', 'auto')
+
+    store = NodeStore()
+    store.ids = ids.tolist()
+    store.x = _typed_array('d', reader.numbers('x', 0))
+    store.y = _typed_array('d', reader.numbers('y', 0))
+    store.z_index = _typed_array('d', reader.numbers('z_index', _NODE_DEFAULTS['z_index']))
+    store.flags = _typed_array('H', reader.flags(_NODE_FLAGS, _NODE_DEFAULTS, np.uint16))
+    store.types = _typed_array('B', reader.codes('type', _NODE_TYPES, _NODE_DEFAULTS['type']))
+    store.source_positions = _typed_array('B', reader.codes('source_position', _HANDLE_POSITIONS, _NODE_DEFAULTS['source_position']))
+    store.target_positions = _typed_array('B', reader.codes('target_position', _HANDLE_POSITIONS, _NODE_DEFAULTS['target_position']))
+    store.data = data
+    store.styles = styles
+    store.kwargs = [kwargs or None for kwargs in reader.dicts('kwargs')]
+    return store
+
+
+def edges_from_frame(frame:pd.DataFrame, node_ids:List[str], column_map:Dict[str, str]=None) -> EdgeStore:
+    """
+    Build an EdgeStore from a frame with one edge per row, between the nodes with the given ids.
+    See StreamlitFlowState.from_frames.
+    """
+    reader = _FrameReader(frame, 'edges', EDGE_COLUMNS, column_map or {})
+    for attribute in ('source', 'target'):
+        assert reader.has(attribute), f"edges must have a column {(column_map or {}).get(attribute, attribute)} with the {attribute} node ids"
+
+    sources = reader.ids('source')
+    targets = reader.ids('target')
+    known = pd.Index(node_ids, dtype=object)
+    for attribute, values in (('source', sources), ('target', targets)):
+        reader._check(attribute, values.isin(known).to_numpy(), "ids of nodes")
+
+    if reader.has('id'):
+        ids = reader.ids('id')
+    else:
+        # Like the ids of the edges connected in the frontend, numbered when there are parallel edges
+        ids = 'st-flow-edge_' + sources + '-' + targets
+        repeats = ids.groupby(ids).cumcount()
+        ids = ids.where(repeats == 0, ids + '_' + repeats.astype(str))
+    duplicated = ids.duplicated(keep=False).to_numpy()
+    assert not duplicated.any(), f"edge ids must be unique. Got duplicates at rows {_invalid_rows(~duplicated, frame.index)}"
+
+    store = EdgeStore()
+    store.ids = ids.tolist()
+    store.sources = sources.tolist()
+    store.targets = targets.tolist()
+    store.z_index = _typed_array('d', reader.numbers('z_index', _EDGE_DEFAULTS['z_index']))
+    store.flags = _typed_array('B', reader.flags(_EDGE_FLAGS, _EDGE_DEFAULTS, np.uint8))
+    store.types = _typed_array('B', reader.codes('type', _EDGE_TYPES, _EDGE_DEFAULTS['type']))
+    store.labels = reader.strings('label', _EDGE_DEFAULTS['label'])
+    store.marker_starts = reader.dicts('marker_start')
+    store.marker_ends = reader.dicts('marker_end')
+    store.label_styles = reader.dicts('label_style')
+    store.label_bg_styles = reader.dicts('label_bg_style')
+    store.styles = reader.dicts('style')
+    store.data = reader.data() or [None] * len(frame)
+    store.kwargs = [kwargs or None for kwargs in reader.dicts('kwargs')]
+    return store
+
+
+def _shared_store(elements:list, view_class:type) -> Optional[any]:
+    # The store all the elements are views of, if there is one
+    if not elements or type(elements[0]) is not view_class:
+        return None
+    store = elements[0]._store
+    if all(type(element) is view_class and element._store is store for element in elements):
+        return store
+    return None
+
+
+def _flag_columns(flags:np.ndarray, names:List[str]) -> Dict[str, np.ndarray]:
+    return {name: ((flags >> bit) & 1).astype(bool) for bit, name in enumerate(names)}
+
+
+def nodes_to_frame(nodes:list) -> pd.DataFrame:
+    """
+    Frame of nodes with the columns NODE_COLUMNS, read column-wise when the nodes are views of one NodeStore.
+    """
+    store = _shared_store(nodes, NodeView)
+    if store is not None:
+        rows = np.fromiter((node._row for node in nodes), dtype=np.intp, count=len(nodes))
+        take = lambda values: [values[row] for row in rows]
+        # Rows without their own dict hold None, see store._RowDict
+        take_dicts = lambda values, default: [dict(default) if value is None else value for value in take(values)]
+        columns = {
+            'id': take(store.ids),
+            'x': np.frombuffer(store.x, dtype=np.float64)[rows],
+            'y': np.frombuffer(store.y, dtype=np.float64)[rows],
+            'type': pd.Categorical.from_codes(np.frombuffer(store.types, dtype=np.uint8)[rows], _NODE_TYPES),
+            'source_position': pd.Categorical.from_codes(np.frombuffer(store.source_positions, dtype=np.uint8)[rows], _HANDLE_POSITIONS),
+            'target_position': pd.Categorical.from_codes(np.frombuffer(store.target_positions, dtype=np.uint8)[rows], _HANDLE_POSITIONS),
+            **_flag_columns(np.frombuffer(store.flags, dtype=np.uint16)[rows], _NODE_FLAGS),
+            'z_index': np.frombuffer(store.z_index, dtype=np.float64)[rows],
+            'style': take_dicts(store.styles, _DEFAULT_NODE_STYLE),
+            'data': take(store.data),
+            'kwargs': take_dicts(store.kwargs, _EMPTY),
+        }
+    else:
+        columns = {
+            'id': [node.id for node in nodes],
+            'x': np.array([node.position['x'] for node in nodes], dtype=np.float64),
+            'y': np.array([node.position['y'] for node in nodes], dtype=np.float64),
+            'type': pd.Categorical([node.type for node in nodes], categories=_NODE_TYPES),
+            'source_position': pd.Categorical([node.source_position for node in nodes], categories=_HANDLE_POSITIONS),
+            'target_position': pd.Categorical([node.target_position for node in nodes], categories=_HANDLE_POSITIONS),
+            **{name: np.array([getattr(node, name) for node in nodes], dtype=bool) for name in _NODE_FLAGS},
+            'z_index': np.array([node.z_index for node in nodes], dtype=np.float64),
+            'style': [node.style for node in nodes],
+            'data': [node.data for node in nodes],
+            'kwargs': [node.kwargs for node in nodes],
+        }
+    return pd.DataFrame(columns, columns=NODE_COLUMNS)
+
+
+def edges_to_frame(edges:list) -> pd.DataFrame:
+    """
+    Frame of edges with the columns EDGE_COLUMNS, read column-wise when the edges are views of one EdgeStore.
+    """
+    store = _shared_store(edges, EdgeView)
+    if store is not None:
+        rows = np.fromiter((edge._row for edge in edges), dtype=np.intp, count=len(edges))
+        take = lambda values: [values[row] for row in rows]
+        take_dicts = lambda values: [{} if value is None else value for value in take(values)]
+        columns = {
+            'id': take(store.ids),
+            'source': take(store.sources),
+            'target': take(store.targets),
+            'type': pd.Categorical.from_codes(np.frombuffer(store.types, dtype=np.uint8)[rows], _EDGE_TYPES),
+            'marker_start': take_dicts(store.marker_starts),
+            'marker_end': take_dicts(store.marker_ends),
+            **_flag_columns(np.frombuffer(store.flags, dtype=np.uint8)[rows], _EDGE_FLAGS),
+            'z_index': np.frombuffer(store.z_index, dtype=np.float64)[rows],
+            'label': take(store.labels),
+            'label_style': take_dicts(store.label_styles),
+            'label_bg_style': take_dicts(store.label_bg_styles),
+            'style': take_dicts(store.styles),
+            'data': take(store.data),
+            'kwargs': take_dicts(store.kwargs),
+        }
+    else:
+        columns = {
+            'id': [edge.id for edge in edges],
+            'source': [edge.source for edge in edges],
+            'target': [edge.target for edge in edges],
+            'type': pd.Categorical([edge.type for edge in edges], categories=_EDGE_TYPES),
+            'marker_start': [edge.marker_start for edge in edges],
+            'marker_end': [edge.marker_end for edge in edges],
+            **{name: np.array([getattr(edge, name) for edge in edges], dtype=bool) for name in _EDGE_FLAGS},
+            'z_index': np.array([edge.z_index for edge in edges], dtype=np.float64),
+            'label': [edge.label for edge in edges],
+            'label_style': [edge.label_style for edge in edges],
+            'label_bg_style': [edge.label_bg_style for edge in edges],
+            'style': [edge.style for edge in edges],
+            'data': [edge.data for edge in edges],
+            'kwargs': [edge.kwargs for edge in edges],
+        }
+    return pd.DataFrame(columns, columns=EDGE_COLUMNS)
+
+
+def stores_from_frames(nodes:any, edges:any=None, column_map:Dict[str, Dict[str, str]]=None) -> Tuple[NodeStore, EdgeStore]:
+    """
+    Build the stores of the nodes and edges of StreamlitFlowState.from_frames.
+    """
+    column_map = column_map or {}
+    unknown = set(column_map) - {'nodes', 'edges'}
+    assert not unknown, f"column_map must only have the keys 'nodes' and 'edges'. Got {sorted(unknown)}"
+
+    # Anything a DataFrame can be built from, eg. a dict of NumPy arrays or a structured array
+    if not isinstance(nodes, pd.DataFrame):
+        nodes = pd.DataFrame(nodes)
+    node_store = nodes_from_frame(nodes, column_map.get('nodes'))
+
+    if edges is None:
+        return node_store, EdgeStore()
+    if not isinstance(edges, pd.DataFrame):
+        edges = pd.DataFrame(edges)
+    edge_store = edges_from_frame(edges, node_store.ids, column_map.get('edges'))
+    return node_store, edge_store
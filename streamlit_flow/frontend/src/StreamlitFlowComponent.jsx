@@ -13,7 +13,9 @@ import ReactFlow, {
     ReactFlowProvider,
     useNodesInitialized,
     useReactFlow,
+    Panel,
 } from 'reactflow';
+import Button from "react-bootstrap/esm/Button";
 
 import 'reactflow/dist/style.css';
 import 'bootstrap/dist/css/bootstrap.css';
@@ -21,25 +23,50 @@ import "bootstrap-icons/font/bootstrap-icons.css";
 
 import './style.css';
 
-import MarkdownNode from "./components/MarkdownNode";
+import MarkdownNode, { ConnectedHandlesContext } from "./components/MarkdownNode";
+import GroupNode, { GroupToggleContext } from "./components/GroupNode";
 import PaneConextMenu from "./components/PaneContextMenu";
 import NodeContextMenu from "./components/NodeContextMenu";
 import EdgeContextMenu from "./components/EdgeContextMenu";
 
-import createElkGraphLayout from "./layouts/ElkLayout";
+import createElkGraphLayout, { LayoutCancelledError } from "./layouts/ElkLayout";
+import { layoutFingerprint, getCachedLayout, setCachedLayout, layoutPositions, applyLayoutPositions } from "./layouts/LayoutCache";
+import { indexById, sameValue, diffElements, diffEvents, applyElementPatch, reconcileElements, decodePatch } from "./sync";
 
 const StreamlitFlowComponent = (props) => {
 
     const nodeTypes = useMemo(() => ({ 
         input: MarkdownNode, 
         output: MarkdownNode, 
-        default: MarkdownNode
+        default: MarkdownNode,
+        group: GroupNode
     }), [])
     
+    // Decoded once per patch rather than on every rerun: patch ids are hashes of their content
+    const syncPatch = useMemo(() => decodePatch(props.args.sync, props.args.syncNodes), [props.args.sync?.id]);
+    const initialSync = syncPatch?.full ? syncPatch : null;
+
     const [viewFitAfterLayout, setViewFitAfterLayout] = useState(null);
-    const [nodes, setNodes, onNodesChange] = useNodesState(props.args.nodes);
-    const [edges, setEdges, onEdgesChange] = useEdgesState(props.args.edges);
-    const [lastUpdateTimestamp, setLastUpdateTimestamp] = useState((new Date()).getTime());
+    const [nodes, setNodes, onNodesChange] = useNodesState(initialSync ? initialSync.nodes : []);
+    const [edges, setEdges, onEdgesChange] = useEdgesState(initialSync ? initialSync.edges : []);
+
+    // Delta sync bookkeeping, see sync.js
+    const versionRef = useRef(0);
+    const confirmedVersionRef = useRef(null);
+    const appliedPatchRef = useRef(null);
+    const syncedRef = useRef(false);
+    const ackedRef = useRef({nodes: new Map(), edges: new Map()});
+    const snapshotsRef = useRef(new Map());
+    const expandedBundlesRef = useRef(new Set());
+    const lastSentRef = useRef({ack: undefined, selectedId: undefined});
+
+    // Interactions waiting to be sent under the debounced and on_commit update policies
+    const pendingReturnRef = useRef(null);
+    const flushTimerRef = useRef(null);
+    const [hasPendingChanges, setHasPendingChanges] = useState(false);
+
+    // Profiling, reported with every message when the profile argument is set
+    const profileRef = useRef({layoutMs: null, renderMs: null, receivedBytes: null, renderStart: null});
 
     const [layoutCalculated, setLayoutCalculated] = useState(false);
 
@@ -55,22 +82,243 @@ const StreamlitFlowComponent = (props) => {
 
     // Helper Functions
     const handleLayout = () => {
-        createElkGraphLayout(getNodes(), getEdges(), props.args.layoutOptions)
-            .then(({nodes, edges}) => {
-                setNodes(nodes);
-                setEdges(edges);
-                setViewFitAfterLayout(false);
-                handleDataReturnToStreamlit(nodes, edges, null);
-                setLayoutCalculated(true);
+        // Positions were computed in Python, nothing to lay out here
+        if (props.args.layoutOptions.fixed) {
+            setViewFitAfterLayout(false);
+            setLayoutCalculated(true);
+            return;
+        }
+
+        const currentNodes = getNodes();
+        const currentEdges = getEdges();
+        const fingerprint = layoutFingerprint(currentNodes, currentEdges, props.args.layoutOptions);
+        const cachedLayout = props.args.cachedLayout;
+        const cachedByStreamlit = cachedLayout?.fingerprint === fingerprint;
+
+        const finishLayout = (nodes, edges, durationMs) => {
+            profileRef.current.layoutMs = durationMs ?? 0;
+            setNodes(nodes);
+            setEdges(edges);
+            setViewFitAfterLayout(false);
+            // Hand the layout to Python for its cache, unless that is where it came from
+            const layout = cachedByStreamlit ? null : {fingerprint: fingerprint, positions: layoutPositions(nodes), durationMs: durationMs};
+            handleDataReturnToStreamlit(nodes, edges, null, layout);
+            setLayoutCalculated(true);
+        }
+
+        const positions = getCachedLayout(fingerprint) ?? (cachedByStreamlit ? cachedLayout.positions : null);
+        if (positions) {
+            setCachedLayout(fingerprint, positions);
+            finishLayout(applyLayoutPositions(currentNodes, positions), currentEdges, null);
+            return;
+        }
+
+        createElkGraphLayout(currentNodes, currentEdges, props.args.layoutOptions)
+            .then(({nodes, edges, durationMs}) => {
+                setCachedLayout(fingerprint, layoutPositions(nodes));
+                finishLayout(nodes, edges, durationMs);
             })
-            .catch(err => console.log(err));
+            .catch(err => {
+                // A newer layout took over, it will finish the job
+                if (!(err instanceof LayoutCancelledError))
+                    console.log(err);
+            });
+    }
+
+    const nextVersion = () => {
+        // Time based, so that versions keep increasing across remounts of the component
+        versionRef.current = Math.max((new Date()).getTime(), versionRef.current + 1);
+        return versionRef.current;
+    }
+
+    // Pan, zoom and size of the canvas, reported to Python for lazy loading
+    const currentViewport = () => {
+        const {x, y, zoom} = reactFlowInstance.getViewport();
+        const pane = ref.current?.getBoundingClientRect() ?? {width: window.innerWidth, height: props.args.height};
+        return {x, y, zoom, width: pane.width, height: pane.height};
+    }
+
+    const handleDataReturnToStreamlit = (_nodes, _edges, selectedId, layout = null, viewChanged = false, historyAction = null) => {
+
+        // Messages diff the whole graph, so this one also carries any interaction still waiting to be sent
+        if (pendingReturnRef.current) {
+            clearTimeout(flushTimerRef.current);
+            pendingReturnRef.current = null;
+            setHasPendingChanges(false);
+        }
+
+        const full = !syncedRef.current;
+        const pendingSnapshots = [...snapshotsRef.current.values()];
+        const eventMode = props.args.returnMode === 'events' && !full;
+
+        let changes;
+        if (eventMode) {
+            const events = [
+                ...diffEvents('edge', ackedRef.current.edges, _edges, pendingSnapshots.map(s => s.edges)),
+                ...diffEvents('node', ackedRef.current.nodes, _nodes, pendingSnapshots.map(s => s.nodes))
+            ];
+            const selectionChanged = selectedId !== lastSentRef.current.selectedId;
+            if (selectionChanged)
+                events.push(selectedId == null ? {type: 'selection_cleared'} : {type: _nodes.some(n => n.id === selectedId) ? 'node_selected' : 'edge_selected', id: selectedId});
+
+            // Nothing Python does not know yet, so no need for a rerun
+            if (events.length === 0 && appliedPatchRef.current === lastSentRef.current.ack && !layout && !viewChanged && !historyAction)
+                return;
+            changes = {'events': events};
+        }
+        else {
+            const nodeDiff = full ? {upserted: _nodes, removed: []} : diffElements(ackedRef.current.nodes, _nodes, pendingSnapshots.map(s => s.nodes));
+            const edgeDiff = full ? {upserted: _edges, removed: []} : diffElements(ackedRef.current.edges, _edges, pendingSnapshots.map(s => s.edges));
+            changes = {
+                'nodes': nodeDiff.upserted,
+                'edges': edgeDiff.upserted,
+                'removedNodes': nodeDiff.removed,
+                'removedEdges': edgeDiff.removed,
+            };
+        }
+
+        const version = nextVersion();
+        snapshotsRef.current.set(version, {nodes: indexById(_nodes), edges: indexById(_edges)});
+        syncedRef.current = true;
+        lastSentRef.current = {ack: appliedPatchRef.current, selectedId: selectedId};
+
+        const message = {
+            'version': version,
+            'baseVersion': confirmedVersionRef.current,
+            'ack': appliedPatchRef.current,
+            'full': full,
+            ...changes,
+            'selectedId': selectedId,
+            'layout': layout,
+            'timestamp': version
+        };
+
+        // Tells Python that we only hold the window of the graph around the viewport
+        if (props.args.lazyLoading)
+            message.viewport = currentViewport();
+
+        // Tells Python which bundles of parallel edges to send as their edges
+        if (props.args.aggregateEdges)
+            message.expandedBundles = [...expandedBundlesRef.current];
+
+        // Undo and redo are done by Python, which sends the resulting graph back as a patch
+        if (historyAction)
+            message.historyAction = historyAction;
+
+        if (props.args.profile) {
+            const {layoutMs, renderMs, receivedBytes} = profileRef.current;
+            message.metrics = {layoutMs, renderMs, receivedBytes, sentBytes: JSON.stringify(message).length};
+            message.sentAt = Date.now();
+        }
+
+        Streamlit.setComponentValue(message);
+    }
+
+    const flushDataReturn = () => {
+        const pending = pendingReturnRef.current;
+        if (pending)
+            handleDataReturnToStreamlit(getNodes(), getEdges(), pending.selectedId);
+    }
+
+    // Interactions go through the update policy. Only the latest selection is kept, the graph is read when sending.
+    const queueDataReturnToStreamlit = (_nodes, _edges, selectedId) => {
+        if (props.args.updatePolicy === 'debounced') {
+            pendingReturnRef.current = {selectedId};
+            clearTimeout(flushTimerRef.current);
+            flushTimerRef.current = setTimeout(flushDataReturn, props.args.updateWindowMs);
+        }
+        else if (props.args.updatePolicy === 'on_commit') {
+            pendingReturnRef.current = {selectedId};
+            setHasPendingChanges(true);
+        }
+        else
+            handleDataReturnToStreamlit(_nodes, _edges, selectedId);
+    }
+
+    // Lazy loading: once the viewport leaves the region Python loaded, ask for the graph around it
+    const handleMoveEnd = (event, viewport) => {
+        const loaded = props.args.loadedWindow;
+        if (!loaded)
+            return;
+        const {width, height} = currentViewport();
+        const x0 = -viewport.x / viewport.zoom;
+        const y0 = -viewport.y / viewport.zoom;
+        const x1 = x0 + width / viewport.zoom;
+        const y1 = y0 + height / viewport.zoom;
+        if (x0 >= loaded[0] && y0 >= loaded[1] && x1 <= loaded[2] && y1 <= loaded[3])
+            return;
+        handleDataReturnToStreamlit(getNodes(), getEdges(), lastSentRef.current.selectedId ?? null, null, true);
+    }
+
+    // Python sends or hides the contents of the group in return
+    const toggleGroup = (groupId) => {
+        const updatedNodes = getNodes().map(n => n.id === groupId ? {...n, data: {...n.data, collapsed: !n.data.collapsed}} : n);
+        setNodes(updatedNodes);
+        handleDataReturnToStreamlit(updatedNodes, getEdges(), lastSentRef.current.selectedId ?? null);
+    }
+    // Stable for the context, so that toggling a group does not render every group again
+    const toggleGroupRef = useRef(toggleGroup);
+    toggleGroupRef.current = toggleGroup;
+    const groupToggle = useCallback((groupId) => toggleGroupRef.current(groupId), []);
+
+    // Handles with edges, which table nodes keep when their column is out of view. The set only changes
+    // when connections do, not when edges are selected or restyled, so that table nodes are not rendered again.
+    const connectedHandlesKey = useMemo(() => edges.flatMap(edge => [edge.sourceHandle, edge.targetHandle]).filter(Boolean).join('\n'), [edges]);
+    const connectedHandles = useMemo(() => new Set(connectedHandlesKey ? connectedHandlesKey.split('\n') : []), [connectedHandlesKey]);
+
+    // Ctrl+Z undoes, Ctrl+Y and Ctrl+Shift+Z redo (Cmd on macOS), unless typing in a field
+    const handleHistoryKey = (event) => {
+        if (!(event.ctrlKey || event.metaKey) || event.target.closest?.('input, textarea, [contenteditable="true"]'))
+            return;
+        const key = event.key.toLowerCase();
+        const action = key === 'z' ? (event.shiftKey ? 'redo' : 'undo') : (key === 'y' ? 'redo' : null);
+        if (!action)
+            return;
+        event.preventDefault();
+        handleDataReturnToStreamlit(getNodes(), getEdges(), lastSentRef.current.selectedId ?? null, null, false, action);
+    }
+    const handleHistoryKeyRef = useRef(handleHistoryKey);
+    handleHistoryKeyRef.current = handleHistoryKey;
+
+    const requestResync = () => {
+        Streamlit.setComponentValue({'version': nextVersion(), 'resync': true, 'selectedId': null, 'timestamp': versionRef.current});
     }
 
-    const handleDataReturnToStreamlit = (_nodes, _edges, selectedId) => {
+    const applyPatchFromStreamlit = (patch) => {
+        if (props.args.profile) {
+            profileRef.current.renderStart = performance.now();
+            profileRef.current.receivedBytes = JSON.stringify(patch).length;
+        }
+
+        const evictedNodes = patch.evictedNodes ?? [];
+        const evictedEdges = patch.evictedEdges ?? [];
+        const patchedNodes = patch.full ? reconcileElements(getNodes(), patch.nodes) : applyElementPatch(getNodes(), patch.nodes, [...patch.removedNodes, ...evictedNodes]);
+        const patchedEdges = patch.full ? reconcileElements(getEdges(), patch.edges) : applyElementPatch(getEdges(), patch.edges, [...patch.removedEdges, ...evictedEdges]);
 
-        const timestamp = (new Date()).getTime();
-        setLastUpdateTimestamp(timestamp);
-        Streamlit.setComponentValue({'nodes': _nodes, 'edges': _edges, 'selectedId': selectedId, 'timestamp': timestamp});
+        if (patch.full) {
+            ackedRef.current = {nodes: indexById(patchedNodes), edges: indexById(patchedEdges)};
+            snapshotsRef.current.clear();
+        }
+        else {
+            // Python already holds what it sent us, which is the element on the canvas when it was kept
+            const heldNodes = patch.nodes.length ? indexById(patchedNodes) : null;
+            const heldEdges = patch.edges.length ? indexById(patchedEdges) : null;
+            patch.nodes.forEach(node => ackedRef.current.nodes.set(node.id, heldNodes.get(node.id) ?? node));
+            patch.edges.forEach(edge => ackedRef.current.edges.set(edge.id, heldEdges.get(edge.id) ?? edge));
+            patch.removedNodes.forEach(id => ackedRef.current.nodes.delete(id));
+            patch.removedEdges.forEach(id => ackedRef.current.edges.delete(id));
+            // Evicted elements left the loaded window, not the graph: forget them without reporting them removed
+            for (const held of [ackedRef.current, ...snapshotsRef.current.values()]) {
+                evictedNodes.forEach(id => held.nodes.delete(id));
+                evictedEdges.forEach(id => held.edges.delete(id));
+            }
+        }
+
+        setNodes(patchedNodes);
+        setEdges(patchedEdges);
+        appliedPatchRef.current = patch.id;
+        syncedRef.current = true;
+        handleDataReturnToStreamlit(patchedNodes, patchedEdges, null);
     }
 
     const calculateMenuPosition = (event) => {
@@ -91,6 +339,24 @@ const StreamlitFlowComponent = (props) => {
 
     useEffect(() => Streamlit.setFrameHeight());
 
+    useEffect(() => () => clearTimeout(flushTimerRef.current), []);
+
+    useEffect(() => {
+        if (!props.args.historyKeys)
+            return;
+        const listener = (event) => handleHistoryKeyRef.current(event);
+        document.addEventListener('keydown', listener);
+        return () => document.removeEventListener('keydown', listener);
+    }, [props.args.historyKeys]);
+
+    // End of the render of a patch from Python, for profiling
+    useEffect(() => {
+        if (profileRef.current.renderStart !== null) {
+            profileRef.current.renderMs = performance.now() - profileRef.current.renderStart;
+            profileRef.current.renderStart = null;
+        }
+    }, [nodes, edges]);
+
     // Layout calculation
     useEffect(() => {
         if(nodesInitialized && !layoutCalculated)
@@ -99,18 +365,43 @@ const StreamlitFlowComponent = (props) => {
 
 
 
-    // Update elements if streamlit sends new arguments - check by comparing timestamp recency
+    // Apply patches sent by streamlit. A patch applies only on top of the version it was computed against;
+    // if we sent something newer, Python will diff again once it has seen it.
     useEffect(() => {
-        console.log(edges);
-        if (lastUpdateTimestamp === props.args.timestamp)
-        {
-            setNodes(props.args.nodes);
-            setEdges(props.args.edges);
-            setLastUpdateTimestamp((new Date()).getTime());
-            handleDataReturnToStreamlit(props.args.nodes, props.args.edges, null);
+        const confirmedVersion = props.args.frontendVersion;
+        if (confirmedVersion != null && snapshotsRef.current.has(confirmedVersion)) {
+            ackedRef.current = snapshotsRef.current.get(confirmedVersion);
+            for (const version of [...snapshotsRef.current.keys()])
+                if (version <= confirmedVersion)
+                    snapshotsRef.current.delete(version);
+            confirmedVersionRef.current = confirmedVersion;
+        }
+
+        if (props.args.requestFull) {
+            syncedRef.current = false;
+            handleDataReturnToStreamlit(getNodes(), getEdges(), null);
+            return;
+        }
+
+        const patch = syncPatch;
+        if (!patch) {
+            // Remounted while Python believes we already hold the graph
+            if (!syncedRef.current)
+                requestResync();
+            return;
         }
+        if (patch.id === appliedPatchRef.current)
+            return;
+
+        if (patch.full && (!syncedRef.current || patch.baseVersion === versionRef.current))
+            applyPatchFromStreamlit(patch);
+        else if (!syncedRef.current || patch.baseVersion == null || patch.baseVersion > versionRef.current)
+            // We were remounted or Python lost track of us, versions disagree
+            requestResync();
+        else if (patch.baseVersion === versionRef.current)
+            applyPatchFromStreamlit(patch);
 
-    }, [props.args.nodes, props.args.edges]);
+    }, [syncPatch, props.args.sync, props.args.frontendVersion, props.args.requestFull]);
 
     // Auto zoom callback
     useEffect(() => {
@@ -121,10 +412,13 @@ const StreamlitFlowComponent = (props) => {
         }
     }, [viewFitAfterLayout, props.args.fitView]);
 
-    // Theme callback
+    // Theme callback, only the edges whose label style differs are replaced
     useEffect(() => {
-        console.log("Theme changed");
-        setEdges(edges.map(edge => ({...edge, labelStyle:{'fill': props.theme.base === "dark" ? 'white' : 'black'}})))
+        const labelStyle = {'fill': props.theme.base === "dark" ? 'white' : 'black'};
+        setEdges(currentEdges => {
+            const themedEdges = currentEdges.map(edge => sameValue(edge.labelStyle, labelStyle) ? edge : {...edge, labelStyle: labelStyle});
+            return themedEdges.some((edge, i) => edge !== currentEdges[i]) ? themedEdges : currentEdges;
+        });
     }, [props.theme.base])
 
     // Context Menu Callbacks
@@ -172,19 +466,34 @@ const StreamlitFlowComponent = (props) => {
 
     const handlePaneClick = (event) => {
         clearMenus();
-        handleDataReturnToStreamlit(nodes, edges, null);
+        queueDataReturnToStreamlit(nodes, edges, null);
     }
 
     const handleNodeClick = (event, node) => {
         clearMenus();
         if (props.args.getNodeOnClick)
-            handleDataReturnToStreamlit(nodes, edges, node.id);
+            queueDataReturnToStreamlit(nodes, edges, node.id);
     }
 
     const handleEdgeClick = (event, edge) => {
         clearMenus();
+        // Python sends the edges of the bundle in its place
+        if (edge.data?.bundle) {
+            expandedBundlesRef.current.add(edge.id);
+            handleDataReturnToStreamlit(getNodes(), getEdges(), lastSentRef.current.selectedId ?? null, null, true);
+            return;
+        }
         if (props.args.getEdgeOnClick)
-            handleDataReturnToStreamlit(nodes, edges, edge.id);
+            queueDataReturnToStreamlit(nodes, edges, edge.id);
+    }
+
+    // Double clicking an edge of an expanded bundle bundles its edges again
+    const handleEdgeDoubleClick = (event, edge) => {
+        // Same id as bundle_id in bundles.py
+        const bundleId = `st-flow-bundle_${JSON.stringify([edge.source, edge.target])}`;
+        if (!expandedBundlesRef.current.delete(bundleId))
+            return;
+        handleDataReturnToStreamlit(getNodes(), getEdges(), lastSentRef.current.selectedId ?? null, null, true);
     }
 
 
@@ -194,9 +503,9 @@ const StreamlitFlowComponent = (props) => {
             const newEdgeId = `st-flow-edge_${params.source}-${params.target}_${params.sourceHandle}-${params.targetHandle}`; 
             const newEdges = addEdge({...params, animated: props.args["animateNewEdges"], labelShowBg: false, id: newEdgeId}, edges);
             setEdges(newEdges);
-            handleDataReturnToStreamlit(nodes, newEdges, newEdgeId);
+            queueDataReturnToStreamlit(nodes, newEdges, newEdgeId);
         }
-    }, [edges, nodes, props.args, handleDataReturnToStreamlit]);
+    }, [edges, nodes, props.args, queueDataReturnToStreamlit]);
 
     const handleNodeDragStop = (event, node) => {
         const updatedNodes = nodes.map(n => {
@@ -204,11 +513,13 @@ const StreamlitFlowComponent = (props) => {
                 return node;
             return n;
         });
-        handleDataReturnToStreamlit(updatedNodes, edges, null);
+        queueDataReturnToStreamlit(updatedNodes, edges, null);
     }
 
     return (
         <div style={{height: props.args.height}}>
+            <GroupToggleContext.Provider value={groupToggle}>
+            <ConnectedHandlesContext.Provider value={connectedHandles}>
             <ReactFlow
                 nodeTypes={nodeTypes}
                 ref={ref}
@@ -222,8 +533,10 @@ const StreamlitFlowComponent = (props) => {
                 style={props.args.style}
                 onNodeClick={handleNodeClick}
                 onEdgeClick={handleEdgeClick}
+                onEdgeDoubleClick={props.args.aggregateEdges ? handleEdgeDoubleClick : undefined}
                 onNodeDragStart={clearMenus}
                 onPaneClick={handlePaneClick}
+                onMoveEnd={props.args.lazyLoading ? handleMoveEnd : undefined}
                 onPaneContextMenu={props.args.enablePaneMenu ? handlePaneContextMenu : (event) => {}}
                 onNodeContextMenu={props.args.enableNodeMenu ? handleNodeContextMenu : (event, node) => {}}
                 onEdgeContextMenu={props.args.enableEdgeMenu ? handleEdgeContextMenu : (event, edge) => {}}
@@ -240,7 +553,7 @@ const StreamlitFlowComponent = (props) => {
                                             nodes={nodes} 
                                             edges={edges} 
                                             setNodes={setNodes} 
-                                            handleDataReturnToStreamlit={handleDataReturnToStreamlit}
+                                            handleDataReturnToStreamlit={queueDataReturnToStreamlit}
                                             setLayoutCalculated={setLayoutCalculated}
                                             theme={props.theme}
                                             />
@@ -252,7 +565,7 @@ const StreamlitFlowComponent = (props) => {
                                             edges={edges}
                                             setNodes={setNodes}
                                             setEdges={setEdges}
-                                            handleDataReturnToStreamlit={handleDataReturnToStreamlit}
+                                            handleDataReturnToStreamlit={queueDataReturnToStreamlit}
                                             theme={props.theme} 
                                             />
                     }
@@ -262,11 +575,19 @@ const StreamlitFlowComponent = (props) => {
                                             nodes={nodes}
                                             edges={edges}
                                             setEdges={setEdges}
-                                            handleDataReturnToStreamlit={handleDataReturnToStreamlit} 
+                                            handleDataReturnToStreamlit={queueDataReturnToStreamlit} 
                                             theme={props.theme}/>}
+                    {hasPendingChanges && <Panel position="top-right">
+                                            <Button variant="primary" size="sm" onClick={flushDataReturn}>
+                                                <i className="bi bi-cloud-upload"></i> Apply changes
+                                            </Button>
+                                        </Panel>
+                    }
                     {props.args["showControls"] && <Controls/>}
                     {props.args["showMiniMap"] && <MiniMap pannable zoomable/>}
                 </ReactFlow>
+            </ConnectedHandlesContext.Provider>
+            </GroupToggleContext.Provider>
         </div>
     );
 }
@@ -0,0 +1,30 @@
+import React, { memo, createContext, useContext } from 'react';
+import { Handle, Position } from 'reactflow';
+import { MarkdownContent, sameNodeProps } from './MarkdownNode';
+
+// Provided by the component, toggles a group and sends the change to Streamlit
+const GroupToggleContext = createContext(() => {});
+
+const GroupNode = ({ id, data, sourcePosition, targetPosition }) => {
+    const toggleGroup = useContext(GroupToggleContext);
+    const collapsed = !!data.collapsed;
+
+    // Expanded groups are sized to their contents by Python, collapsed ones to their header
+    const size = !collapsed && data.groupSize ? {width: data.groupSize.width, height: data.groupSize.height} : {};
+
+    return (
+        <div className={collapsed ? "group-node collapsed" : "group-node"} style={size}>
+            <Handle type="target" position={targetPosition ?? Position.Top} />
+            <Handle type="source" position={sourcePosition ?? Position.Bottom} />
+            <div className="group-header">
+                <button className="group-toggle nodrag" onClick={() => toggleGroup(id)} title={collapsed ? "Expand" : "Collapse"}>
+                    <i className={collapsed ? "bi bi-plus-square" : "bi bi-dash-square"}></i>
+                </button>
+                <MarkdownContent content={data.content} plugins={data.plugins} />
+            </div>
+        </div>
+    );
+};
+
+export { GroupToggleContext };
+export default memo(GroupNode, sameNodeProps);
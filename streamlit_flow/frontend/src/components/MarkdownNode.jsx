@@ -1,48 +1,143 @@
-import React from 'react';
-import { Handle, Position } from 'reactflow';
-import Markdown from 'react-markdown'
-import rehypeHighlight from 'rehype-highlight';
-import remarkGfm from 'remark-gfm'
-import rehypeRaw from 'rehype-raw';
-import rehypeKatex from 'rehype-katex';
-import remarkMath from 'remark-math';
-import 'katex/dist/katex.min.css';
-import 'highlight.js/styles/github.css';
+import React, { memo, createContext, useContext, useEffect, useMemo, useRef, useState } from 'react';
+import { Handle, Position, useUpdateNodeInternals } from 'reactflow';
+import { pluginsFor, loadPlugins, missingPlugins, renderMarkdown } from './markdown';
 
+// Columns shown at once before the list scrolls, and the height of a row, matching layout_engine.py
+const DEFAULT_COLUMN_BUDGET = 20;
+const COLUMN_ROW_HEIGHT = 36;
 
+// Provided by the component: the ids of the handles edges are connected to, which must exist for the edges to be drawn
+const ConnectedHandlesContext = createContext(new Set());
+
+const MarkdownContent = memo(({ content, plugins }) => {
+    const names = pluginsFor(content ?? '', plugins);
+    const missingKey = missingPlugins(names).join(',');
+
+    // Render with what is loaded, and again once the plugins this content needs have arrived
+    const [, setLoaded] = useState(0);
+    useEffect(() => {
+        if (!missingKey)
+            return;
+        let active = true;
+        loadPlugins(missingKey.split(','))
+            .then(() => active && setLoaded(count => count + 1))
+            .catch(err => console.log(err));
+        return () => { active = false; };
+    }, [missingKey]);
+
+    return renderMarkdown(content, names);
+});
+
+const columnHandles = (handlePrefix, column, style) => (
+    <>
+        <Handle
+            type="source"
+            position={Position.Right}
+            id={`${handlePrefix}-${column.column_name}-source`}
+            className="handle handle-right"
+            style={style}
+        />
+        <Handle
+            type="target"
+            position={Position.Left}
+            id={`${handlePrefix}-${column.column_name}-target`}
+            className="handle handle-left"
+            style={style}
+        />
+    </>
+);
+
+// Only the rows in view are rendered, with their handles. Connected columns out of view keep their handles,
+// pinned to the top or bottom of the list, so that their edges point at where they are.
+const ColumnList = ({ nodeId, handlePrefix, columns, budget }) => {
+    const connectedHandles = useContext(ConnectedHandlesContext);
+    const updateNodeInternals = useUpdateNodeInternals();
+    const viewportRef = useRef(null);
+    const [scrollTop, setScrollTop] = useState(0);
+    const [query, setQuery] = useState('');
+
+    const scrolling = columns.length > budget;
+    const matches = useMemo(() => {
+        const indexed = columns.map((column, index) => ({column, index}));
+        const text = query.trim().toLowerCase();
+        return text ? indexed.filter(({column}) => `${column.column_name}`.toLowerCase().includes(text)) : indexed;
+    }, [columns, query]);
+
+    const first = scrolling ? Math.min(Math.floor(scrollTop / COLUMN_ROW_HEIGHT), Math.max(matches.length - budget, 0)) : 0;
+    const shown = scrolling ? matches.slice(first, first + budget + 1) : matches;
+    const shownIndexes = new Set(shown.map(({index}) => index));
+    const firstShown = shown.length ? shown[0].index : columns.length;
+
+    const hidden = columns
+        .map((column, index) => ({column, index}))
+        .filter(({column, index}) => !shownIndexes.has(index) && (
+            connectedHandles.has(`${handlePrefix}-${column.column_name}-source`) ||
+            connectedHandles.has(`${handlePrefix}-${column.column_name}-target`)));
+
+    // React Flow measures handles when told to, and they moved
+    const shownKey = shown.map(({index}) => index).join(',');
+    useEffect(() => updateNodeInternals(nodeId), [nodeId, shownKey, hidden.length]);
+
+    const jumpTo = (text) => {
+        setQuery(text);
+        setScrollTop(0);
+        if (viewportRef.current)
+            viewportRef.current.scrollTop = 0;
+    }
 
-const MarkdownNode = ({ data }) => {
     return (
-        <div className="markdown-node">
-            <Markdown rehypePlugins={[rehypeHighlight, rehypeRaw, rehypeKatex]} remarkPlugins={[remarkGfm, remarkMath]}>
-                {data.content}
-            </Markdown>
-            {data.columns && data.columns.length > 0 && (
-                <div className="columns-list">
-                    <h6>Columns:</h6>
-                    <ul>
-                        {data.columns.map((column, index) => (
-                            <li key={index} className="column-item">
+        <div className="columns-list">
+            <h6>Columns{scrolling ? ` (${columns.length})` : ''}:</h6>
+            {scrolling && <input className="column-search nodrag"
+                                 type="search"
+                                 placeholder="Find a column"
+                                 value={query}
+                                 onChange={(event) => jumpTo(event.target.value)}/>}
+            <div className="columns-viewport">
+                {hidden.map(({column, index}) => (
+                    <div key={`pinned-${index}`} className={index < firstShown ? "pinned-handles top" : "pinned-handles bottom"}>
+                        {columnHandles(handlePrefix, column, {})}
+                    </div>
+                ))}
+                <div ref={viewportRef}
+                     className={scrolling ? "columns-scroll nowheel" : ""}
+                     style={scrolling ? {height: budget * COLUMN_ROW_HEIGHT} : {}}
+                     onScroll={(event) => setScrollTop(event.currentTarget.scrollTop)}>
+                    <ul style={scrolling ? {height: matches.length * COLUMN_ROW_HEIGHT, position: 'relative'} : {}}>
+                        {shown.map(({column, index}, i) => (
+                            <li key={index}
+                                className="column-item"
+                                style={scrolling ? {position: 'absolute', top: (first + i) * COLUMN_ROW_HEIGHT, left: 0, right: 0} : {}}>
                                 <span className="column-content">{column.column_name} ({column.type})</span>
-                                <Handle
-                                    type="source"
-                                    position={Position.Right}
-                                    id={`${data.id}-${column.column_name}-source`}
-                                    className="handle handle-right"
-                                />
-                                <Handle
-                                    type="target"
-                                    position={Position.Left}
-                                    id={`${data.id}-${column.column_name}-target`}
-                                    className="handle handle-left"
-                                />
+                                {columnHandles(handlePrefix, column)}
                             </li>
                         ))}
                     </ul>
                 </div>
+            </div>
+        </div>
+    );
+}
+
+const MarkdownNode = ({ id, data, sourcePosition, targetPosition }) => {
+    return (
+        <div className="markdown-node">
+            {/* Invisible anchors for the edges that are not connected to a column, eg. summary edges of collapsed groups */}
+            <Handle type="target" position={targetPosition ?? Position.Top} />
+            <Handle type="source" position={sourcePosition ?? Position.Bottom} />
+            <MarkdownContent content={data.content} plugins={data.plugins} />
+            {data.columns && data.columns.length > 0 && (
+                <ColumnList nodeId={id}
+                            handlePrefix={data.id}
+                            columns={data.columns}
+                            budget={data.columnBudget ?? DEFAULT_COLUMN_BUDGET}/>
             )}
         </div>
     );
 };
 
-export default MarkdownNode;
+// Only the data and handle positions are rendered, so moving or dragging a node does not render it again
+const sameNodeProps = (prev, next) => prev.data === next.data && prev.sourcePosition === next.sourcePosition && prev.targetPosition === next.targetPosition;
+
+export { MarkdownContent, ConnectedHandlesContext, sameNodeProps };
+export default memo(MarkdownNode, sameNodeProps);
@@ -0,0 +1,92 @@
+// Markdown rendering for the nodes: plugins load on demand and rendered content is cached
+
+import React from 'react';
+import Markdown from 'react-markdown';
+
+// Each plugin set brings remark and rehype plugins, loaded in a separate chunk the first time a node uses it.
+// When a node does not list its plugins in data.plugins, they are picked by looking for their syntax in the content.
+const PLUGINS = {
+    gfm: {
+        detect: /\||~~|\[[ xX]\]|https?:\/\/|www\.|[\w.+-]@[\w-]+\.\w/i,
+        load: async () => ({remark: [(await import('remark-gfm')).default], rehype: []})
+    },
+    code: {
+        detect: /```|~~~|<code|\n {4}|^ {4}/,
+        load: async () => {
+            const [rehypeHighlight] = await Promise.all([import('rehype-highlight'), import('highlight.js/styles/github.css')]);
+            return {remark: [], rehype: [rehypeHighlight.default]};
+        }
+    },
+    html: {
+        detect: /<[a-zA-Z!/]/,
+        load: async () => ({remark: [], rehype: [(await import('rehype-raw')).default]})
+    },
+    math: {
+        detect: /\$/,
+        load: async () => {
+            const [remarkMath, rehypeKatex] = await Promise.all([import('remark-math'), import('rehype-katex'), import('katex/dist/katex.min.css')]);
+            return {remark: [remarkMath.default], rehype: [rehypeKatex.default]};
+        }
+    }
+};
+
+const PLUGIN_NAMES = Object.keys(PLUGINS);
+
+const loadedPlugins = new Map();
+const loadingPlugins = new Map();
+
+const pluginsFor = (content, plugins) => {
+    if (Array.isArray(plugins))
+        return PLUGIN_NAMES.filter(name => plugins.includes(name));
+    return PLUGIN_NAMES.filter(name => PLUGINS[name].detect.test(content));
+}
+
+// Resolves once every plugin in names is loaded
+const loadPlugins = (names) => Promise.all(names.map(name => {
+    if (!loadingPlugins.has(name))
+        loadingPlugins.set(name, PLUGINS[name].load().then(plugin => loadedPlugins.set(name, plugin)));
+    return loadingPlugins.get(name);
+}));
+
+const missingPlugins = (names) => names.filter(name => !loadedPlugins.has(name));
+
+// Rendered markdown by plugins and content, in least recently used order. Rendered elements are
+// immutable, so nodes with the same content share them.
+const MAX_CACHED_RENDERS = 2000;
+const renderCache = new Map();
+
+// Nothing that markdown would turn into anything but a paragraph: one line, no markup characters,
+// no entities, not a numbered list item, and no URL or email that remark-gfm would turn into a link
+const MARKUP = /[*_`#[\]<>$|~\\!\-+=&@\n\r]|^\s|^\d+[.)]|:\/\/|www\./i;
+
+const renderMarkdown = (content, names) => {
+    const text = content ?? '';
+    const available = names.filter(name => loadedPlugins.has(name));
+    const key = `${available.join(',')}\u0000${text}`;
+
+    let rendered = renderCache.get(key);
+    if (rendered) {
+        renderCache.delete(key);
+        renderCache.set(key, rendered);
+        return rendered;
+    }
+
+    if (!MARKUP.test(text))
+        rendered = text ? <p>{text.trimEnd()}</p> : null;
+    else {
+        const plugins = available.map(name => loadedPlugins.get(name));
+        // react-markdown renders synchronously without hooks, so its output can be computed once and reused
+        rendered = Markdown({
+            children: text,
+            remarkPlugins: plugins.flatMap(plugin => plugin.remark),
+            rehypePlugins: plugins.flatMap(plugin => plugin.rehype)
+        });
+    }
+
+    renderCache.set(key, rendered);
+    if (renderCache.size > MAX_CACHED_RENDERS)
+        renderCache.delete(renderCache.keys().next().value);
+    return rendered;
+}
+
+export { pluginsFor, loadPlugins, missingPlugins, renderMarkdown };
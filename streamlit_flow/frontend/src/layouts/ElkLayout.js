@@ -1,32 +1,98 @@
 import Elk from 'elkjs/lib/elk.bundled.js';
 
+class LayoutCancelledError extends Error {
+    constructor() {
+        super('Layout superseded by a newer request');
+        this.name = 'LayoutCancelledError';
+    }
+}
 
-const createElkGraphLayout = async (graphNodes, graphEdges, options) => {
+// The worker is created on first use and reused by every layout. A request still in flight when a new
+// one arrives is cancelled by terminating the worker, since ELK cannot be interrupted.
+let worker = null;
+let inFlight = null;
+let lastRequestId = 0;
 
-    const elk = new Elk({
-        defaultLayoutOptions: options.elkOptions
-    })
+const spawnWorker = () => {
+    const w = new Worker(new URL('./elk.worker.js', import.meta.url));
+    w.onmessage = ({data}) => {
+        if (!inFlight || data.requestId !== inFlight.requestId)
+            return;
+        const {resolve, reject} = inFlight;
+        inFlight = null;
+        if (data.error)
+            reject(new Error(data.error));
+        else
+            resolve({layout: data.layout, durationMs: data.durationMs});
+    };
+    w.onerror = (err) => {
+        if (inFlight) {
+            inFlight.reject(err);
+            inFlight = null;
+        }
+    };
+    return w;
+}
+
+const layoutInWorker = (graph, layoutOptions) => {
+    if (inFlight) {
+        worker.terminate();
+        worker = null;
+        inFlight.reject(new LayoutCancelledError());
+        inFlight = null;
+    }
+    if (!worker)
+        worker = spawnWorker();
+
+    const requestId = ++lastRequestId;
+    return new Promise((resolve, reject) => {
+        inFlight = {requestId, resolve, reject};
+        worker.postMessage({requestId, graph, layoutOptions});
+    });
+}
+
+// Fallback for environments without workers, on the UI thread
+let mainThreadElk = null;
+
+const layoutOnMainThread = async (graph, layoutOptions) => {
+    if (!mainThreadElk)
+        mainThreadElk = new Elk();
+    const start = performance.now();
+    const layout = await mainThreadElk.layout(graph, {layoutOptions});
+    return {layout, durationMs: performance.now() - start};
+}
+
+const createElkGraphLayout = async (graphNodes, graphEdges, options) => {
 
     const nodes = [...graphNodes]
     const edges = [...graphEdges]
 
+    // Only what ELK reads, so that posting the graph to the worker stays cheap
+    const graph = {
+        id: 'root',
+        children: nodes.map(({id, width, height}) => ({id, width, height})),
+        edges: edges.map(({id, source, target}) => ({id, source, target}))
+    }
+
+    const {layout, durationMs} = typeof Worker !== 'undefined'
+        ? await layoutInWorker(graph, options.elkOptions)
+        : await layoutOnMainThread(graph, options.elkOptions);
 
-    const newGraph = await elk.layout({
-    id: 'root',
-    children: nodes,
-    edges: edges
-    })
+    const layoutNodes = new Map(layout.children.map(n => [n.id, n]))
 
+    // Return new node objects instead of mutating the ones React Flow holds, so that changes are detectable
     return {nodes: nodes.map(node => {
-        const n = newGraph.children.find(n => n.id === node.id)
-        if (n?.x && n?.y && n?.width && n?.height) {
-            node.position = {
+        const n = layoutNodes.get(node.id)
+        // ELK places nodes at 0 too, only missing coordinates keep the node where it is
+        if (n?.x != null && n?.y != null && n?.width && n?.height) {
+            return {...node, position: {
             x: n.x - n.width / 2,
             y: n.y - n.height / 2
-            }
+            }}
         }
         return node
-    }), edges}
+    }), edges, durationMs}
 }
 
-export default createElkGraphLayout;
\ No newline at end of file
+export { LayoutCancelledError };
+export default createElkGraphLayout;
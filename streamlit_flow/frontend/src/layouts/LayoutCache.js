@@ -0,0 +1,52 @@
+// In-memory tier of the layout cache (see streamlit_flow/layout_cache.py for the server tiers)
+
+const MAX_ENTRIES = 32;
+
+// Layouts by fingerprint, in least recently used order
+const entries = new Map();
+
+// 53 bit string hash (cyrb53), enough to tell graphs apart without keeping the whole key around
+const hashString = (str) => {
+    let h1 = 0xdeadbeef, h2 = 0x41c6ce57;
+    for (let i = 0; i < str.length; i++) {
+        const ch = str.charCodeAt(i);
+        h1 = Math.imul(h1 ^ ch, 2654435761);
+        h2 = Math.imul(h2 ^ ch, 1597334677);
+    }
+    h1 = Math.imul(h1 ^ (h1 >>> 16), 2246822507) ^ Math.imul(h2 ^ (h2 >>> 13), 3266489909);
+    h2 = Math.imul(h2 ^ (h2 >>> 16), 2246822507) ^ Math.imul(h1 ^ (h1 >>> 13), 3266489909);
+    return (4294967296 * (2097151 & h2) + (h1 >>> 0)).toString(36);
+}
+
+// Everything the layout depends on: node ids and measured sizes, edges and layout options
+const layoutFingerprint = (nodes, edges, options) => {
+    const nodeKeys = nodes.map(node => `${node.id}\u0000${node.width}\u0000${node.height}`).sort();
+    const edgeKeys = edges.map(edge => `${edge.source}\u0000${edge.target}`).sort();
+    return hashString(JSON.stringify([options.elkOptions, nodeKeys, edgeKeys]));
+}
+
+const getCachedLayout = (fingerprint) => {
+    const positions = entries.get(fingerprint);
+    if (positions) {
+        entries.delete(fingerprint);
+        entries.set(fingerprint, positions);
+    }
+    return positions;
+}
+
+const setCachedLayout = (fingerprint, positions) => {
+    entries.delete(fingerprint);
+    entries.set(fingerprint, positions);
+    while (entries.size > MAX_ENTRIES)
+        entries.delete(entries.keys().next().value);
+}
+
+// Positions by node id, as [x, y]
+const layoutPositions = (nodes) => Object.fromEntries(nodes.map(node => [node.id, [node.position.x, node.position.y]]));
+
+const applyLayoutPositions = (nodes, positions) => nodes.map(node => {
+    const position = positions[node.id];
+    return position ? {...node, position: {x: position[0], y: position[1]}} : node;
+});
+
+export { layoutFingerprint, getCachedLayout, setCachedLayout, layoutPositions, applyLayoutPositions };
@@ -0,0 +1,16 @@
+/* eslint-disable no-restricted-globals */
+// Runs ELK off the UI thread. One ELK instance lives as long as the worker, see ElkLayout.js
+
+import Elk from 'elkjs/lib/elk.bundled.js';
+
+const elk = new Elk();
+
+// Assigned after the import, so it replaces the handler the bundled ELK installs when loaded in a worker
+self.onmessage = ({data}) => {
+    const {requestId, graph, layoutOptions} = data;
+    const start = performance.now();
+
+    elk.layout(graph, {layoutOptions})
+        .then(layout => self.postMessage({requestId, layout, durationMs: performance.now() - start}))
+        .catch(err => self.postMessage({requestId, error: String(err)}));
+}
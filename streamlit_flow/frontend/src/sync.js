@@ -0,0 +1,174 @@
+// Helpers for the delta sync protocol with Python (see streamlit_flow/sync.py)
+
+// Keys React Flow computes at runtime, which Python does not keep
+const RUNTIME_KEYS = new Set(['width', 'height', 'positionAbsolute']);
+
+const indexById = (elements) => new Map(elements.map(el => [el.id, el]));
+
+const sameElement = (a, b) => {
+    if (a === b)
+        return true;
+    if (!a || !b)
+        return false;
+
+    const keys = new Set([...Object.keys(a), ...Object.keys(b)]);
+    for (const key of keys) {
+        if (RUNTIME_KEYS.has(key))
+            continue;
+        if (key === 'position') {
+            if (a.position?.x !== b.position?.x || a.position?.y !== b.position?.y)
+                return false;
+        }
+        else if (a[key] !== b[key])
+            return false;
+    }
+    return true;
+}
+
+// Structural equality of JSON values
+const sameValue = (a, b) => {
+    if (a === b)
+        return true;
+    if (typeof a !== 'object' || typeof b !== 'object' || a === null || b === null || Array.isArray(a) !== Array.isArray(b))
+        return false;
+    const keys = Object.keys(a);
+    if (keys.length !== Object.keys(b).length)
+        return false;
+    return keys.every(key => Object.prototype.hasOwnProperty.call(b, key) && sameValue(a[key], b[key]));
+}
+
+// Whether an element sent by Python has the content of the one on the canvas, which then keeps its identity.
+// React Flow only renders again the nodes and edges whose object changed.
+const sameContent = (held, incoming) => {
+    for (const key of new Set([...Object.keys(held), ...Object.keys(incoming)]))
+        if (!RUNTIME_KEYS.has(key) && !sameValue(held[key], incoming[key]))
+            return false;
+    return true;
+}
+
+// Cumulative diff of the current elements against the ones Python acknowledged.
+// Ids sent in messages Python has not confirmed yet are also checked, so removals are never missed.
+const diffElements = (acked, current, pendingSnapshots) => {
+    const upserted = [];
+    const currentIds = new Set();
+    for (const el of current) {
+        currentIds.add(el.id);
+        if (!sameElement(acked.get(el.id), el))
+            upserted.push(el);
+    }
+
+    const removed = new Set();
+    for (const snapshot of [acked, ...pendingSnapshots])
+        for (const id of snapshot.keys())
+            if (!currentIds.has(id))
+                removed.add(id);
+
+    return {upserted, removed: [...removed]};
+}
+
+// Fields of an element that differ from its acknowledged version, null for the ones it lost
+const changedFields = (before, after) => {
+    const changes = {};
+    for (const key of new Set([...Object.keys(before), ...Object.keys(after)])) {
+        if (RUNTIME_KEYS.has(key) || key === 'id')
+            continue;
+        if (key === 'position' ? (before.position?.x !== after.position?.x || before.position?.y !== after.position?.y) : before[key] !== after[key])
+            changes[key] = after[key] ?? null;
+    }
+    return changes;
+}
+
+// The same cumulative diff as diffElements, as typed events carrying only what changed
+const diffEvents = (kind, acked, current, pendingSnapshots) => {
+    const {upserted, removed} = diffElements(acked, current, pendingSnapshots);
+    const events = removed.map(id => ({type: `${kind}_deleted`, id}));
+    for (const el of upserted) {
+        const before = acked.get(el.id);
+        if (!before) {
+            events.push({type: `${kind}_created`, [kind]: el});
+            continue;
+        }
+        const changes = changedFields(before, el);
+        const keys = Object.keys(changes);
+        if (kind === 'node' && keys.length === 1 && keys[0] === 'position')
+            events.push({type: 'node_moved', id: el.id, position: changes.position});
+        else
+            events.push({type: `${kind}_updated`, id: el.id, changes});
+    }
+    return events;
+}
+
+// Elements sent by Python that are unchanged keep the object on the canvas, and so does the array when nothing changed
+const applyElementPatch = (current, upserted, removed) => {
+    const removedIds = new Set(removed);
+    const upsertedById = indexById(upserted);
+
+    const next = [];
+    for (const el of current) {
+        if (removedIds.has(el.id))
+            continue;
+        if (upsertedById.has(el.id)) {
+            const incoming = upsertedById.get(el.id);
+            next.push(sameContent(el, incoming) ? el : incoming);
+            upsertedById.delete(el.id);
+        }
+        else
+            next.push(el);
+    }
+    next.push(...upsertedById.values());
+    return unchangedArray(current, next) ? current : next;
+}
+
+// The same for a patch carrying the whole graph
+const reconcileElements = (current, incoming) => {
+    const held = indexById(current);
+    const next = incoming.map(el => held.has(el.id) && sameContent(held.get(el.id), el) ? held.get(el.id) : el);
+    return unchangedArray(current, next) ? current : next;
+}
+
+const unchangedArray = (current, next) => next.length === current.length && next.every((el, i) => el === current[i]);
+
+// Boolean attributes of nodes, one bit each of the flags column, in the order of streamlit_flow/store.py
+const NODE_FLAGS = ['hidden', 'selected', 'dragging', 'draggable', 'selectable', 'connectable', 'resizing', 'deletable', 'focusable'];
+
+// Nodes sent as an Arrow table of typed columns (wire_format='columnar', see streamlit_flow/wire.py), back into
+// the objects asdict() would have sent. Numeric columns are read as typed arrays, without a value per row.
+const decodeNodes = (arrowTable) => {
+    const table = arrowTable.table;
+    const column = (name) => table.getChild(name);
+    const ids = column('id'), types = column('type'), contents = column('content'), rest = column('rest');
+    const sourcePositions = column('sourcePosition'), targetPositions = column('targetPosition');
+    const widths = column('width'), heights = column('height'), zIndexes = column('zIndex');
+    const x = column('x').toArray(), y = column('y').toArray(), flags = column('flags').toArray();
+    const zIndex = zIndexes ? zIndexes.toArray() : null;
+
+    const nodes = new Array(table.numRows);
+    for (let i = 0; i < table.numRows; i++) {
+        const restJson = rest.get(i);
+        const {data, style, ...attributes} = restJson ? JSON.parse(restJson) : {};
+        const content = contents.get(i);
+        const node = {
+            id: ids.get(i),
+            position: {x: x[i], y: y[i]},
+            data: {...data, ...(content != null ? {content} : {}), columns: data?.columns ?? []},
+            type: types.get(i),
+            sourcePosition: sourcePositions.get(i),
+            targetPosition: targetPositions.get(i),
+            zIndex: zIndex ? zIndex[i] : 0,
+            style: {width: widths?.get(i) ?? 'auto', height: heights?.get(i) ?? 'auto', ...style},
+            ...attributes
+        };
+        NODE_FLAGS.forEach((flag, bit) => { node[flag] = (flags[i] & (1 << bit)) !== 0; });
+        nodes[i] = node;
+    }
+    return nodes;
+}
+
+// The patch from Python, with its nodes decoded when they came as columns
+const decodePatch = (patch, nodeTable) => {
+    if (!patch?.nodeColumns)
+        return patch;
+    return {...patch, nodes: nodeTable ? decodeNodes(nodeTable) : []};
+}
+
+export { indexById, sameValue, diffElements, diffEvents, applyElementPatch, reconcileElements, decodePatch };
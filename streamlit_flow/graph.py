@@ -0,0 +1,279 @@
+"""
+Graph analytics on the nodes and edges of a StreamlitFlowState: lineage (upstream and downstream closures),
+topological order, cycles, shortest paths and connected components.
+
+Queries run on a compressed sparse row (CSR) adjacency of the state, built once in a few vectorized passes and
+cached on the state. Any change to the nodes or edges of the state invalidates it, and the next query rebuilds it.
+"""
+
+from collections import deque
+from typing import Dict, List, Literal, Optional
+
+import numpy as np
+
+from .state import StreamlitFlowState
+
+
+class Adjacency:
+
+    """
+    CSR adjacency of a state. Nodes are numbered in the order of state.nodes; the successors of node i are
+    out_targets[out_offsets[i]:out_offsets[i + 1]], and its predecessors in_sources[in_offsets[i]:in_offsets[i + 1]].
+    Edges whose source or target is not a node of the state are left out. Parallel edges are kept.
+
+    Use Adjacency.of(state) to get the cached adjacency of a state.
+    """
+
+    def __init__(self, state:StreamlitFlowState) -> None:
+        self.version = state._topology_version
+        self.ids = [node.id for node in state.nodes]
+        self.positions = {node_id: i for i, node_id in enumerate(self.ids)}
+
+        n = len(self.ids)
+        positions = self.positions
+        sources = np.fromiter((positions.get(edge.source, -1) for edge in state.edges), dtype=np.int64, count=len(state.edges))
+        targets = np.fromiter((positions.get(edge.target, -1) for edge in state.edges), dtype=np.int64, count=len(state.edges))
+        valid = (sources >= 0) & (targets >= 0)
+        sources, targets = sources[valid], targets[valid]
+
+        self.out_offsets, self.out_targets = _csr(sources, targets, n)
+        self.in_offsets, self.in_sources = _csr(targets, sources, n)
+
+        # Python lists, which are faster than arrays to read one item at a time in traversals
+        self._out = (self.out_offsets.tolist(), self.out_targets.tolist())
+        self._in = (self.in_offsets.tolist(), self.in_sources.tolist())
+
+    @classmethod
+    def of(cls, state:StreamlitFlowState) -> 'Adjacency':
+        """
+        The adjacency of a state, built on first use and kept until nodes or edges are added, removed or reordered,
+        or edges get other endpoints. Moving or editing elements keeps it.
+        """
+        adjacency = getattr(state, '_adjacency', None)
+        if adjacency is None or adjacency.version != state._topology_version:
+            adjacency = cls(state)
+            object.__setattr__(state, '_adjacency', adjacency)
+        return adjacency
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def position(self, node_id:str) -> int:
+        assert node_id in self.positions, f"No node with the id {node_id}"
+        return self.positions[node_id]
+
+    def out_degrees(self) -> np.ndarray:
+        return np.diff(self.out_offsets)
+
+    def in_degrees(self) -> np.ndarray:
+        return np.diff(self.in_offsets)
+
+    def _lists(self, direction:str) -> List[tuple]:
+        if direction == 'out':
+            return [self._out]
+        if direction == 'in':
+            return [self._in]
+        return [self._out, self._in]
+
+    def bfs(self, starts:List[int], direction:Literal['in', 'out', 'both'], max_depth:Optional[int]=None) -> Dict[int, int]:
+        """
+        Breadth-first search from some nodes. Returns the depth of every node reached, by position, starts included.
+        """
+        lists = self._lists(direction)
+        depths = {start: 0 for start in starts}
+        queue = deque(starts)
+        while queue:
+            i = queue.popleft()
+            depth = depths[i] + 1
+            if max_depth is not None and depth > max_depth:
+                continue
+            for offsets, neighbors in lists:
+                for j in neighbors[offsets[i]:offsets[i + 1]]:
+                    if j not in depths:
+                        depths[j] = depth
+                        queue.append(j)
+        return depths
+
+
+def _csr(rows:np.ndarray, columns:np.ndarray, n:int):
+    order = np.argsort(rows, kind='stable')
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=n), out=offsets[1:])
+    return offsets, columns[order]
+
+
+def _closure(state:StreamlitFlowState, node_ids, direction:str, max_depth:Optional[int]) -> List[str]:
+    adjacency = Adjacency.of(state)
+    if isinstance(node_ids, str):
+        node_ids = [node_ids]
+    starts = [adjacency.position(node_id) for node_id in node_ids]
+    depths = adjacency.bfs(starts, direction, max_depth)
+    start_set = set(starts)
+    return [adjacency.ids[i] for i in depths if i not in start_set]
+
+
+def downstream(state:StreamlitFlowState, node_ids, max_depth:Optional[int]=None) -> List[str]:
+    """
+    The ids of the nodes reachable from some nodes along the edges, nearest first.
+
+    Arguments
+    - **state** : StreamlitFlowState : The state.
+    - **node_ids** : str or List[str] : The id of the node, or the ids of several nodes, to start from. They are not part of the result.
+    - **max_depth** : int? : How many edges to follow at most. All the way if None.
+    """
+    return _closure(state, node_ids, 'out', max_depth)
+
+
+def upstream(state:StreamlitFlowState, node_ids, max_depth:Optional[int]=None) -> List[str]:
+    """
+    The ids of the nodes some nodes can be reached from, nearest first. See downstream.
+    """
+    return _closure(state, node_ids, 'in', max_depth)
+
+
+def lineage(state:StreamlitFlowState, node_id:str, max_depth:Optional[int]=None) -> Dict[str, List[str]]:
+    """
+    The upstream and downstream nodes of a node, as {'upstream': [...], 'downstream': [...]}.
+    """
+    return {'upstream': upstream(state, node_id, max_depth), 'downstream': downstream(state, node_id, max_depth)}
+
+
+def topological_sort(state:StreamlitFlowState) -> List[str]:
+    """
+    The ids of all the nodes, every node before the nodes it has an edge to. Among nodes free to come next,
+    the order of state.nodes is kept. The graph must not have cycles, see cyclic_components.
+    """
+    adjacency = Adjacency.of(state)
+    offsets, targets = adjacency._out
+    in_degrees = adjacency.in_degrees().tolist()
+
+    queue = deque(i for i, degree in enumerate(in_degrees) if degree == 0)
+    order = []
+    while queue:
+        i = queue.popleft()
+        order.append(i)
+        for j in targets[offsets[i]:offsets[i + 1]]:
+            in_degrees[j] -= 1
+            if in_degrees[j] == 0:
+                queue.append(j)
+
+    assert len(order) == len(adjacency), "The graph has cycles, see cyclic_components"
+    return [adjacency.ids[i] for i in order]
+
+
+def cyclic_components(state:StreamlitFlowState) -> List[List[str]]:
+    """
+    The groups of nodes that lie on a common cycle (the strongly connected components with more than one
+    node, or with an edge from a node to itself), as lists of node ids. Empty when the graph has no cycles.
+    """
+    adjacency = Adjacency.of(state)
+    offsets, targets = adjacency._out
+    n = len(adjacency)
+
+    # Iterative Tarjan
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack = []
+    components = []
+    counter = 0
+    for root in range(n):
+        if index[root] != -1:
+            continue
+        work = [(root, offsets[root])]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while work:
+            i, next_edge = work[-1]
+            if next_edge < offsets[i + 1]:
+                work[-1] = (i, next_edge + 1)
+                j = targets[next_edge]
+                if index[j] == -1:
+                    index[j] = low[j] = counter
+                    counter += 1
+                    stack.append(j)
+                    on_stack[j] = True
+                    work.append((j, offsets[j]))
+                elif on_stack[j]:
+                    low[i] = min(low[i], index[j])
+                continue
+
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[i])
+            if low[i] == index[i]:
+                component = []
+                while True:
+                    j = stack.pop()
+                    on_stack[j] = False
+                    component.append(j)
+                    if j == i:
+                        break
+                if len(component) > 1 or i in targets[offsets[i]:offsets[i + 1]]:
+                    components.append([adjacency.ids[j] for j in reversed(component)])
+    return components
+
+
+def has_cycle(state:StreamlitFlowState) -> bool:
+    """
+    Whether the edges of the graph form a cycle.
+    """
+    try:
+        topological_sort(state)
+    except AssertionError:
+        return True
+    return False
+
+
+def shortest_path(state:StreamlitFlowState, source:str, target:str, directed:bool=True) -> Optional[List[str]]:
+    """
+    The ids of the nodes on a path with the fewest edges from a node to another, both included. None if there is no such path.
+
+    Arguments
+    - **state** : StreamlitFlowState : The state.
+    - **source** : str : The id of the node to start from.
+    - **target** : str : The id of the node to reach.
+    - **directed** : bool : Whether to follow the edges in their direction only.
+    """
+    adjacency = Adjacency.of(state)
+    start, goal = adjacency.position(source), adjacency.position(target)
+    lists = adjacency._lists('out' if directed else 'both')
+
+    parents = {start: None}
+    queue = deque([start])
+    while queue and goal not in parents:
+        i = queue.popleft()
+        for offsets, neighbors in lists:
+            for j in neighbors[offsets[i]:offsets[i + 1]]:
+                if j not in parents:
+                    parents[j] = i
+                    queue.append(j)
+
+    if goal not in parents:
+        return None
+    path = []
+    i = goal
+    while i is not None:
+        path.append(adjacency.ids[i])
+        i = parents[i]
+    return path[::-1]
+
+
+def connected_components(state:StreamlitFlowState) -> List[List[str]]:
+    """
+    The groups of nodes connected by edges in either direction, as lists of node ids, largest first.
+    """
+    adjacency = Adjacency.of(state)
+    seen = set()
+    components = []
+    for start in range(len(adjacency)):
+        if start in seen:
+            continue
+        component = adjacency.bfs([start], 'both')
+        seen.update(component)
+        components.append([adjacency.ids[i] for i in component])
+    components.sort(key=len, reverse=True)
+    return components
@@ -0,0 +1,189 @@
+import json
+from typing import Dict, List, Set, Tuple
+
+from .elements import StreamlitFlowNode, StreamlitFlowEdge
+from .layout_engine import estimate_node_size
+from .layouts import Layout
+from .state import StreamlitFlowState
+
+# Summary edges only exist in the frontend, their ids tell them apart from the edges of the state
+SUMMARY_EDGE_PREFIX = 'st-flow-summary_'
+SUMMARY_EDGE_STYLE = {'strokeDasharray': '6 3'}
+
+# Room around the contents of an expanded group, and above them for its header
+GROUP_PADDING = 20
+GROUP_HEADER_HEIGHT = 50
+
+
+def is_summary_edge(edge_id:str) -> bool:
+    return edge_id.startswith(SUMMARY_EDGE_PREFIX)
+
+
+def pair_edge_id(prefix:str, source:str, target:str) -> str:
+    """
+    The id of an edge drawn in place of others between two nodes. The ids of the nodes are encoded as a JSON
+    array, as JSON.stringify does it in the frontend, so that the pair can be told apart whatever they hold (eg. '-').
+    """
+    return prefix + json.dumps([source, target], ensure_ascii=False, separators=(',', ':'))
+
+
+def summary_edge(source:str, target:str, edges:List[StreamlitFlowEdge]) -> StreamlitFlowEdge:
+    """
+    The edge drawn in place of edges between the contents of collapsed groups, labelled with their count.
+    """
+    return StreamlitFlowEdge(pair_edge_id(SUMMARY_EDGE_PREFIX, source, target),
+                             source,
+                             target,
+                             label=f"{len(edges)} edge{'s' if len(edges) > 1 else ''}",
+                             style=SUMMARY_EDGE_STYLE,
+                             data={'summary': True, 'count': len(edges)})
+
+
+class GroupTree:
+
+    """
+    The group tree of a state, kept on it. The parent of every node in a group ('parents') and the nodes directly
+    in every group ('children', by group id then node id). Only the nodes changed since it was last used are
+    checked again, and it is rebuilt when one of them was added to, removed from or moved to another group.
+
+    Use GroupTree.of(state) to get the group tree of a state.
+    """
+
+    def __init__(self, nodes:List[StreamlitFlowNode]) -> None:
+        self.parents = {}
+        self.children = {}
+        for node in nodes:
+            parent_id = node.parent_node
+            if parent_id is not None:
+                self.parents[node.id] = parent_id
+                self.children.setdefault(parent_id, {})[node.id] = node
+        # Ids of the nodes changed since, filled in by the state
+        self.stale = set()
+
+    @classmethod
+    def of(cls, state:StreamlitFlowState) -> 'GroupTree':
+        """
+        The group tree of a state, built on first use and kept until a node changes group.
+        """
+        tree = state._group_tree
+        if tree is None or not tree._refresh(state):
+            tree = cls(state.nodes)
+            object.__setattr__(state, '_group_tree', tree)
+        return tree
+
+    def _refresh(self, state:StreamlitFlowState) -> bool:
+        # Whether the changed nodes are still in the same groups, the nodes that replaced others taking their place
+        stale, self.stale = self.stale, set()
+        for node_id in stale:
+            node = state.get_node(node_id)
+            parent_id = self.parents.get(node_id)
+            if (None if node is None else node.parent_node) != parent_id:
+                return False
+            if parent_id is not None:
+                self.children[parent_id][node_id] = node
+        return True
+
+
+def visible_elements(state:StreamlitFlowState, nodes:List[StreamlitFlowNode], edges:List[StreamlitFlowEdge]) -> Tuple[list, list, Set[str]]:
+    """
+    The elements to draw among the given ones of a state, with collapsed groups drawn alone.
+
+    The contents of collapsed groups are left out, with their internal edges. Edges between the contents of a
+    collapsed group and the rest of the graph are replaced by one summary edge per pair of drawn endpoints.
+    Groups are completed with their ancestors and drawn contents, and come before their contents as React Flow
+    requires.
+
+    Returns the nodes, the edges and the ids of the collapsed groups that have contents.
+    """
+    tree = GroupTree.of(state)
+    parents, children = tree.parents, tree.children
+    if not parents:
+        return nodes, edges, set()
+
+    collapsed = set(group_id for group_id in children if state.get_node(group_id) is not None and state.get_node(group_id).collapsed)
+
+    def drawn_as(node_id:str) -> str:
+        # The outermost collapsed group containing the node, or the node itself
+        drawn = node_id
+        while node_id in parents:
+            node_id = parents[node_id]
+            if node_id in collapsed:
+                drawn = node_id
+        return drawn
+
+    included = {}
+
+    def include(node:StreamlitFlowNode) -> None:
+        if node.id in included:
+            return
+        included[node.id] = node
+        parent = state.get_node(parents[node.id]) if node.id in parents else None
+        if parent is not None:
+            include(parent)
+        if node.id not in collapsed:
+            for child in children.get(node.id, {}).values():
+                include(child)
+
+    for node in nodes:
+        if drawn_as(node.id) == node.id:
+            include(node)
+
+    visible_edges = []
+    summarized = {}
+    for edge in edges:
+        source, target = drawn_as(edge.source), drawn_as(edge.target)
+        if source == edge.source and target == edge.target:
+            visible_edges.append(edge)
+        elif source != target:
+            summarized.setdefault((source, target), []).append(edge)
+
+    for (source, target), group_edges in summarized.items():
+        for node_id in (source, target):
+            node = state.get_node(node_id)
+            if node is not None:
+                include(node)
+        visible_edges.append(summary_edge(source, target, group_edges))
+
+    def depth(node_id:str) -> int:
+        d = 0
+        while node_id in parents:
+            node_id = parents[node_id]
+            d += 1
+        return d
+
+    return sorted(included.values(), key=lambda node: depth(node.id)), visible_edges, collapsed
+
+
+def layout_group(state:StreamlitFlowState, group_id:str, layout:Layout) -> None:
+    """
+    Lay out the nodes directly in a group, in place, and size the group to fit them. Nested groups are laid out
+    as boxes of their current size. Only the contents of the group and the edges between them are involved.
+
+    Arguments
+    - **state** : StreamlitFlowState : The state holding the group.
+    - **group_id** : str : The id of the group.
+    - **layout** : Layout : A layout that can be computed in Python, see Layout.compute.
+    """
+    group = state.edit_node(group_id)
+    members = state.edit_nodes(list(GroupTree.of(state).children.get(group_id, ())))
+    if not members:
+        return
+    member_ids = set(node.id for node in members)
+    internal_edges = {}
+    for node in members:
+        for edge in state.edges_of(node.id, 'out'):
+            if edge.target in member_ids:
+                internal_edges[edge.id] = edge
+
+    # The layout writes the positions into the nodes, which the group state shares with the state
+    layout.compute(StreamlitFlowState(members, list(internal_edges.values())))
+
+    width = height = 0
+    for node in members:
+        node.position = {"x": node.position['x'] + GROUP_PADDING, "y": node.position['y'] + GROUP_HEADER_HEIGHT}
+        node_width, node_height = estimate_node_size(node)
+        width = max(width, node.position['x'] + node_width + GROUP_PADDING)
+        height = max(height, node.position['y'] + node_height + GROUP_PADDING)
+    group.data['groupSize'] = {'width': width, 'height': height}
+    state.reindex_positions([group_id] + list(member_ids))
+
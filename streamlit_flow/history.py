@@ -0,0 +1,206 @@
+import pickle
+from collections import deque
+from typing import Dict, Optional, Set, Tuple
+
+from .state import StreamlitFlowState
+
+# Interaction state of React Flow, which changes on every click or drag and is not worth an undo step
+_TRANSIENT_KEYS = ('selected', 'dragging', 'resizing')
+
+
+class FlowHistory:
+    """
+    Undo/redo history of a StreamlitFlowState, kept as diffs.
+
+    Every step holds the serialized nodes and edges that changed in it, before and after, and nothing else.
+    The history keeps one serialized copy of the current graph to diff against, so its memory is that copy plus
+    the size of the changes, whatever the depth. Elements are serialized with pickle into immutable bytes, shared
+    between the copy and the steps rather than duplicated. Only the elements the state reports as changed since
+    the last step (see StreamlitFlowState.changed_since) are serialized again. Elements modified in place without
+    edit_node / edit_edge are among them once streamlit_flow() has sent them, so they are recorded by its next call.
+
+    Pass it to streamlit_flow(history=...) to record a step whenever the graph changed since the previous call,
+    from the frontend or from the script, and to undo and redo with Ctrl+Z and Ctrl+Y (or Ctrl+Shift+Z) in the
+    canvas. Keep it in st.session_state along with the state. undo() and redo() can also be called from the script,
+    eg. from buttons, before streamlit_flow() is called.
+
+    Selection, dragging and resizing are not recorded; undone elements come back unselected.
+
+    Arguments
+    - **max_depth** : int : The number of steps that can be undone. The oldest steps are dropped beyond it.
+    - **max_bytes** : int? : The size in bytes the steps may take at most, undo and redo together. The oldest steps are dropped beyond it. No limit if None.
+    """
+
+    def __init__(self, max_depth:int=50, max_bytes:Optional[int]=None) -> None:
+        assert max_depth > 0, f"max_depth must be positive. Got {max_depth}"
+        assert max_bytes is None or max_bytes > 0, f"max_bytes must be positive. Got {max_bytes}"
+
+        self.max_depth = max_depth
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._snapshot = None
+        # The state the snapshot was taken from, by id, and its version then
+        self._recorded = None
+        self._undo = deque()
+        self._redo = []
+
+    @property
+    def can_undo(self) -> bool:
+        return len(self._undo) > 0
+
+    @property
+    def can_redo(self) -> bool:
+        return len(self._redo) > 0
+
+    def clear(self) -> None:
+        """
+        Forget all the steps. The next record() starts over from the state it is given.
+        """
+        self.size = 0
+        self._snapshot = None
+        self._recorded = None
+        self._undo.clear()
+        self._redo.clear()
+
+    def record(self, state:StreamlitFlowState) -> bool:
+        """
+        Record the changes of the state since the last call as one step. The first call only remembers the state.
+        A new step drops the steps that were undone.
+
+        Returns whether there was anything to record.
+        """
+        recorded, self._recorded = self._recorded, (id(state), state.version)
+        if self._snapshot is None:
+            self._snapshot = {'nodes': _serialize(state.nodes), 'edges': _serialize(state.edges)}
+            return False
+
+        if recorded[0] == id(state) and recorded[1] >= state._tracked_since:
+            # Only the elements changed since the last call
+            node_ids, edge_ids = state.changed_since(recorded[1])
+            step = {'nodes': _update(self._snapshot['nodes'], node_ids, state.get_node),
+                    'edges': _update(self._snapshot['edges'], edge_ids, state.get_edge)}
+        else:
+            # Another state, or its lists were replaced: which elements changed is not known
+            snapshot = {'nodes': _serialize(state.nodes), 'edges': _serialize(state.edges)}
+            step = {kind: _diff(self._snapshot[kind], snapshot[kind]) for kind in ('nodes', 'edges')}
+            self._snapshot = snapshot
+        if not (step['nodes'] or step['edges']):
+            return False
+
+        step['size'] = _step_size(step)
+        self.size += step['size'] - sum(undone['size'] for undone in self._redo)
+        self._redo.clear()
+        self._undo.append(step)
+        self._trim()
+        return True
+
+    def undo(self, state:StreamlitFlowState) -> bool:
+        """
+        Revert the state in place to before the last step. Changes not recorded yet become that step.
+
+        Returns whether there was a step to undo.
+        """
+        self.record(state)
+        if not self._undo:
+            return False
+        step = self._undo.pop()
+        self._apply(state, step, 0)
+        self._redo.append(step)
+        return True
+
+    def redo(self, state:StreamlitFlowState) -> bool:
+        """
+        Apply the last undone step to the state in place again. Changes made since the undo, recorded or not,
+        drop the undone steps.
+
+        Returns whether there was a step to redo.
+        """
+        self.record(state)
+        if not self._redo:
+            return False
+        step = self._redo.pop()
+        self._apply(state, step, 1)
+        self._undo.append(step)
+        return True
+
+    def _apply(self, state:StreamlitFlowState, step:Dict[str, any], side:int) -> None:
+
+        patch = {}
+        for kind, removed_key in (('nodes', 'removedNodes'), ('edges', 'removedEdges')):
+            snapshot = self._snapshot[kind]
+            patch[kind] = []
+            patch[removed_key] = []
+            for element_id, change in step[kind].items():
+                serialized = change[side]
+                if serialized is None:
+                    patch[removed_key].append(element_id)
+                    snapshot.pop(element_id, None)
+                else:
+                    patch[kind].append(pickle.loads(serialized))
+                    snapshot[element_id] = serialized
+        state.apply_patch(patch)
+
+    def _trim(self) -> None:
+
+        while len(self._undo) > self.max_depth or (self.max_bytes is not None and self.size > self.max_bytes and self._undo):
+            self.size -= self._undo.popleft()['size']
+
+
+def _serialize_element(element:any) -> bytes:
+
+    element_dict = element.asdict()
+    for key in _TRANSIENT_KEYS:
+        element_dict.pop(key, None)
+    return pickle.dumps(element_dict, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _serialize(elements:list) -> Dict[str, bytes]:
+    return {element.id: _serialize_element(element) for element in elements}
+
+
+def _update(snapshot:Dict[str, bytes], element_ids:Set[str], get) -> Dict[str, Tuple[Optional[bytes], Optional[bytes]]]:
+    # Serialize the given elements again into the snapshot, and return how they changed
+
+    changes = {}
+    for element_id in element_ids:
+        element = get(element_id)
+        serialized = None if element is None else _serialize_element(element)
+        previous = snapshot.get(element_id)
+        if _same(previous, serialized):
+            continue
+        changes[element_id] = (previous, serialized)
+        if serialized is None:
+            del snapshot[element_id]
+        else:
+            snapshot[element_id] = serialized
+    return changes
+
+
+def _diff(before:Dict[str, bytes], after:Dict[str, bytes]) -> Dict[str, Tuple[Optional[bytes], Optional[bytes]]]:
+
+    changes = {}
+    for element_id, serialized in after.items():
+        previous = before.get(element_id)
+        if not _same(previous, serialized):
+            changes[element_id] = (previous, serialized)
+    for element_id, previous in before.items():
+        if element_id not in after:
+            changes[element_id] = (previous, None)
+    return changes
+
+
+def _same(previous:Optional[bytes], serialized:Optional[bytes]) -> bool:
+    # Equal elements may pickle differently, as pickle refers back to a string it already wrote when it is the
+    # same object (eg. an id reused as the content), so differing bytes are compared by value
+    if previous == serialized:
+        return True
+    return previous is not None and serialized is not None and pickle.loads(previous) == pickle.loads(serialized)
+
+
+def _step_size(step:Dict[str, any]) -> int:
+
+    size = 0
+    for kind in ('nodes', 'edges'):
+        for element_id, (previous, serialized) in step[kind].items():
+            size += len(element_id) + len(previous or b'') + len(serialized or b'')
+    return size
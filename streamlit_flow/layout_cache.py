@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from .state import StreamlitFlowState
+
+
+class LayoutCache:
+    """
+    Cache of the layouts computed by the frontend, so that opening the same graph again costs no layout time.
+
+    Entries are looked up by the topology of the graph (node ids, edges) and the layout options. Each entry
+    also holds a fingerprint of what the frontend laid out, measured node sizes included, which the frontend
+    checks before using the cached positions. The cache has an in-memory LRU tier, shared by every session
+    of the server, and an optional on-disk tier of one JSON file per entry that survives restarts.
+
+    Arguments
+    - **max_entries** : int : The number of layouts kept in memory.
+    - **directory** : str? : The directory of the on-disk tier. Created if needed. No on-disk tier if None.
+    """
+
+    def __init__(self, max_entries:int=64, directory:Optional[str]=None) -> None:
+        assert max_entries > 0, f"max_entries must be positive. Got {max_entries}"
+
+        self.max_entries = max_entries
+        self.directory = directory
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(state:StreamlitFlowState, layout_options:Dict[str, any]) -> str:
+        """
+        The cache key of a graph laid out with some options.
+
+        Arguments
+        - **state** : StreamlitFlowState : The graph.
+        - **layout_options** : Dict[str, any] : The layout options, as returned by Layout.__to_dict__.
+        """
+        key_hash = hashlib.blake2b(digest_size=16)
+        key_hash.update(json.dumps(layout_options, sort_keys=True, default=str).encode())
+        for node_id in sorted(node.id for node in state.nodes):
+            key_hash.update(b'\0n' + node_id.encode())
+        for source, target in sorted((edge.source, edge.target) for edge in state.edges):
+            key_hash.update(b'\0e' + source.encode() + b'\0' + target.encode())
+        return key_hash.hexdigest()
+
+    def get(self, key:str) -> Optional[Dict[str, any]]:
+        """
+        Get the entry stored for a key, from memory or else from disk. Returns None if there is none.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+
+        entry = self._read(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def put(self, key:str, entry:Dict[str, any]) -> None:
+        """
+        Store an entry, with the keys 'fingerprint', 'positions' and 'durationMs' (the time the frontend took to
+        compute the layout, None if it did not), in memory and on disk.
+        """
+        self._remember(key, entry)
+        self._write(key, entry)
+
+    def clear(self) -> None:
+        """
+        Drop every entry, in memory and on disk.
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.directory is not None:
+            for file_name in os.listdir(self.directory):
+                if file_name.endswith('.json'):
+                    os.remove(os.path.join(self.directory, file_name))
+
+    def _remember(self, key:str, entry:Dict[str, any]) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, key:str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key:str) -> Optional[Dict[str, any]]:
+        if self.directory is None:
+            return None
+        try:
+            with open(self._path(key), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, key:str, entry:Dict[str, any]) -> None:
+        if self.directory is None:
+            return
+        # Write then rename, so that concurrent sessions never read a partial file
+        temp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f, separators=(',', ':'))
+        os.replace(temp_path, self._path(key))
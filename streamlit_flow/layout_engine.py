@@ -0,0 +1,941 @@
+import math
+import random
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+# Default size of a node in the canvas, matching .markdown-node in the frontend stylesheet
+DEFAULT_NODE_WIDTH = 250
+DEFAULT_NODE_HEIGHT = 60
+COLUMN_ROW_HEIGHT = 36
+# Columns shown at once by a table node before its list scrolls, under a search box (see MarkdownNode.jsx)
+DEFAULT_COLUMN_BUDGET = 20
+COLUMN_SEARCH_HEIGHT = 36
+
+Size = Tuple[float, float]
+Point = Tuple[float, float]
+
+
+def estimate_node_size(node:any) -> Size:
+    """
+    Estimate the rendered size of a node without a browser. Uses the width and height of its style
+    when they are given in pixels, the size of expanded groups, and otherwise the default node width
+    and one row per column shown (see StreamlitFlowNode.column_budget).
+    """
+    width = _parse_px(node.style.get('width')) if node.style else None
+    height = _parse_px(node.style.get('height')) if node.style else None
+    group_size = node.data.get('groupSize')
+    if group_size and not node.data.get('collapsed', False):
+        width = width if width is not None else group_size['width']
+        height = height if height is not None else group_size['height']
+    if width is None:
+        width = DEFAULT_NODE_WIDTH
+    if height is None:
+        columns = len(node.data.get('columns') or [])
+        budget = node.data.get('columnBudget') or DEFAULT_COLUMN_BUDGET
+        height = DEFAULT_NODE_HEIGHT + COLUMN_ROW_HEIGHT * min(columns, budget) + (COLUMN_SEARCH_HEIGHT if columns > budget else 0)
+    return width, height
+
+
+def _parse_px(value:any) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str) and value.endswith('px'):
+        try:
+            return float(value[:-2])
+        except ValueError:
+            return None
+    return None
+
+
+def graph_from_state(state:any) -> Tuple[List[str], List[Size], List[Tuple[int, int]]]:
+    """
+    Extract the node ids, estimated sizes and edges (as pairs of node indexes) of a state.
+    Self loops and edges to unknown nodes are dropped.
+    """
+    ids = [node.id for node in state.nodes]
+    sizes = [estimate_node_size(node) for node in state.nodes]
+    positions = {node_id: i for i, node_id in enumerate(ids)}
+    edges = []
+    for edge in state.edges:
+        source = positions.get(edge.source)
+        target = positions.get(edge.target)
+        if source is not None and target is not None and source != target:
+            edges.append((source, target))
+    return ids, sizes, edges
+
+
+def _orient(breadth:List[float], depth:List[float], sizes:List[Size], direction:str) -> List[Point]:
+    # breadth and depth are the coordinates of the node centers along and across the layers
+    points = []
+    for b, d, (width, height) in zip(breadth, depth, sizes):
+        if direction == 'down':
+            points.append((b - width / 2, d - height / 2))
+        elif direction == 'up':
+            points.append((b - width / 2, -d - height / 2))
+        elif direction == 'right':
+            points.append((d - width / 2, b - height / 2))
+        else:
+            points.append((-d - width / 2, b - height / 2))
+    return _normalize(points)
+
+
+def _normalize(points:List[Point]) -> List[Point]:
+    if not points:
+        return points
+    min_x = min(x for x, _ in points)
+    min_y = min(y for _, y in points)
+    return [(x - min_x, y - min_y) for x, y in points]
+
+
+def _axis_sizes(sizes:List[Size], direction:str) -> Tuple[List[float], List[float]]:
+    if direction in ('down', 'up'):
+        return [w for w, _ in sizes], [h for _, h in sizes]
+    return [h for _, h in sizes], [w for w, _ in sizes]
+
+
+def _layer_depths(layers:List[List[int]], depth_sizes:List[float], layer_spacing:float) -> List[float]:
+    # Center of each layer along the depth axis
+    centers = []
+    offset = 0.0
+    for layer in layers:
+        extent = max((depth_sizes[v] for v in layer), default=0.0)
+        centers.append(offset + extent / 2)
+        offset += extent + layer_spacing
+    return centers
+
+
+def _pack(order:List[int], desired:List[float], extents:List[float], spacing:float) -> None:
+    # Move the nodes of a layer as close as possible to their desired centers without overlaps.
+    # The left-to-right and right-to-left greedy placements both respect the minimum separations,
+    # and so does their average.
+    if not order:
+        return
+    forward = []
+    for i, v in enumerate(order):
+        x = desired[v]
+        if i:
+            u = order[i - 1]
+            x = max(x, forward[-1] + extents[u] / 2 + spacing + extents[v] / 2)
+        forward.append(x)
+    backward = [0.0] * len(order)
+    for i in range(len(order) - 1, -1, -1):
+        v = order[i]
+        x = desired[v]
+        if i < len(order) - 1:
+            w = order[i + 1]
+            x = min(x, backward[i + 1] - extents[w] / 2 - spacing - extents[v] / 2)
+        backward[i] = x
+    for i, v in enumerate(order):
+        desired[v] = (forward[i] + backward[i]) / 2
+
+
+def layered_layout(sizes:List[Size], edges:List[Tuple[int, int]], direction:str='down', node_spacing:float=75,
+                   layer_spacing:float=75, sweeps:int=8) -> List[Point]:
+    """
+    Layered (Sugiyama) layout: cycles are broken by reversing DFS back edges, nodes are assigned to
+    layers by longest path, long edges are split with dummy nodes, crossings are reduced with
+    barycenter sweeps, and the nodes of each layer are centered over their neighbours.
+
+    Returns the top-left corner of each node.
+    """
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    dag = _break_cycles(n, edges)
+
+    # Longest path layering
+    successors = [[] for _ in range(n)]
+    indegree = [0] * n
+    for u, v in dag:
+        successors[u].append(v)
+        indegree[v] += 1
+    layer = [0] * n
+    queue = deque(v for v in range(n) if indegree[v] == 0)
+    while queue:
+        u = queue.popleft()
+        for v in successors[u]:
+            layer[v] = max(layer[v], layer[u] + 1)
+            indegree[v] -= 1
+            if indegree[v] == 0:
+                queue.append(v)
+
+    breadth_sizes, depth_sizes = _axis_sizes(sizes, direction)
+
+    # Split long edges with dummy nodes, which take a little room in their layer
+    dummy_extent = min(node_spacing, 20)
+    up = [[] for _ in range(n)]
+    down = [[] for _ in range(n)]
+    for u, v in dag:
+        prev = u
+        for l in range(layer[u] + 1, layer[v]):
+            dummy = len(layer)
+            layer.append(l)
+            breadth_sizes.append(dummy_extent)
+            depth_sizes.append(0.0)
+            up.append([prev])
+            down.append([])
+            down[prev].append(dummy)
+            prev = dummy
+        down[prev].append(v)
+        up[v].append(prev)
+
+    layers = [[] for _ in range(max(layer) + 1)]
+    for v, l in enumerate(layer):
+        layers[l].append(v)
+
+    # Crossing reduction
+    rank = [0.0] * len(layer)
+    for nodes in layers:
+        for i, v in enumerate(nodes):
+            rank[v] = i
+    for sweep in range(sweeps):
+        downward = sweep % 2 == 0
+        sequence = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+        for l in sequence:
+            neighbours = up if downward else down
+            nodes = layers[l]
+            keys = {}
+            for v in nodes:
+                adjacent = neighbours[v]
+                keys[v] = sum(rank[u] for u in adjacent) / len(adjacent) if adjacent else rank[v]
+            nodes.sort(key=lambda v: keys[v])
+            for i, v in enumerate(nodes):
+                rank[v] = i
+
+    # Coordinate assignment
+    center = [0.0] * len(layer)
+    for nodes in layers:
+        offset = 0.0
+        for v in nodes:
+            center[v] = offset + breadth_sizes[v] / 2
+            offset += breadth_sizes[v] + node_spacing
+    for sweep in range(4):
+        downward = sweep % 2 == 0
+        sequence = range(1, len(layers)) if downward else range(len(layers) - 2, -1, -1)
+        neighbours = up if downward else down
+        for l in sequence:
+            for v in layers[l]:
+                adjacent = neighbours[v]
+                if adjacent:
+                    center[v] = sum(center[u] for u in adjacent) / len(adjacent)
+            _pack(layers[l], center, breadth_sizes, node_spacing)
+
+    layer_centers = _layer_depths(layers, depth_sizes, layer_spacing)
+    depth = [layer_centers[layer[v]] for v in range(n)]
+    return _orient(center[:n], depth, sizes, direction)
+
+
+def _break_cycles(n:int, edges:List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    # Iterative DFS in model order, reversing the edges that point back to a node on the stack
+    adjacency = [[] for _ in range(n)]
+    for i, (u, v) in enumerate(edges):
+        adjacency[u].append((v, i))
+
+    state = [0] * n  # 0 unvisited, 1 on stack, 2 done
+    reversed_edges = set()
+    for root in range(n):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, iter(adjacency[root]))]
+        while stack:
+            u, children = stack[-1]
+            for v, i in children:
+                if state[v] == 1:
+                    reversed_edges.add(i)
+                elif state[v] == 0:
+                    state[v] = 1
+                    stack.append((v, iter(adjacency[v])))
+                    break
+            else:
+                state[u] = 2
+                stack.pop()
+
+    seen = set()
+    dag = []
+    for i, (u, v) in enumerate(edges):
+        edge = (v, u) if i in reversed_edges else (u, v)
+        if edge not in seen:
+            seen.add(edge)
+            dag.append(edge)
+    return dag
+
+
+def _spanning_forest(n:int, edges:List[Tuple[int, int]]) -> Tuple[List[int], List[List[int]], List[int]]:
+    # BFS from the nodes without incoming edges (then from any unvisited node), in model order
+    successors = [[] for _ in range(n)]
+    has_parent = [False] * n
+    for u, v in edges:
+        successors[u].append(v)
+        has_parent[v] = True
+
+    children = [[] for _ in range(n)]
+    level = [-1] * n
+    roots = []
+    candidates = [v for v in range(n) if not has_parent[v]] + list(range(n))
+    for root in candidates:
+        if level[root] != -1:
+            continue
+        roots.append(root)
+        level[root] = 0
+        queue = deque([root])
+        while queue:
+            u = queue.popleft()
+            for v in successors[u]:
+                if level[v] == -1:
+                    level[v] = level[u] + 1
+                    children[u].append(v)
+                    queue.append(v)
+    return roots, children, level
+
+
+def _postorder(roots:List[int], children:List[List[int]]) -> List[int]:
+    order = []
+    stack = list(reversed(roots))
+    while stack:
+        v = stack.pop()
+        order.append(v)
+        stack.extend(reversed(children[v]))
+    return order[::-1]
+
+
+def tree_layout(sizes:List[Size], edges:List[Tuple[int, int]], direction:str='down', node_spacing:float=75) -> List[Point]:
+    """
+    Tree layout: a BFS spanning forest is extracted, every subtree gets a band as wide as its
+    children side by side, and each parent is centered over its children.
+
+    Returns the top-left corner of each node.
+    """
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    roots, children, level = _spanning_forest(n, edges)
+    breadth_sizes, depth_sizes = _axis_sizes(sizes, direction)
+
+    extent = [0.0] * n
+    for v in _postorder(roots, children):
+        spread = sum(extent[c] for c in children[v]) + node_spacing * (len(children[v]) - 1)
+        extent[v] = max(breadth_sizes[v], spread)
+
+    center = [0.0] * n
+    offset = 0.0
+    stack = []
+    for root in roots:
+        center[root] = offset + extent[root] / 2
+        offset += extent[root] + node_spacing
+        stack.append(root)
+    while stack:
+        v = stack.pop()
+        spread = sum(extent[c] for c in children[v]) + node_spacing * (len(children[v]) - 1)
+        start = center[v] - spread / 2
+        for c in children[v]:
+            center[c] = start + extent[c] / 2
+            start += extent[c] + node_spacing
+            stack.append(c)
+
+    levels = [[] for _ in range(max(level) + 1)]
+    for v in range(n):
+        levels[level[v]].append(v)
+    level_centers = _layer_depths(levels, depth_sizes, node_spacing)
+    return _orient(center, [level_centers[level[v]] for v in range(n)], sizes, direction)
+
+
+def radial_layout(sizes:List[Size], edges:List[Tuple[int, int]], node_spacing:float=75) -> List[Point]:
+    """
+    Radial layout: nodes are placed on concentric rings by BFS depth, and every subtree gets an
+    angular wedge proportional to its number of leaves. Each ring is at least one node and spacing
+    further out than the previous one, and wide enough that its narrowest wedge holds a node, so that
+    nodes of a crowded ring do not overlap.
+
+    Returns the top-left corner of each node.
+    """
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    roots, children, level = _spanning_forest(n, edges)
+    leaves = [1] * n
+    for v in _postorder(roots, children):
+        if children[v]:
+            leaves[v] = sum(leaves[c] for c in children[v])
+
+    ring = max(max(w, h) for w, h in sizes) + node_spacing
+    # Several roots hang from a virtual center, a single root sits at it
+    offset = 1 if len(roots) > 1 else 0
+    total = sum(leaves[r] for r in roots)
+
+    wedges = [(0.0, 0.0)] * n
+    narrowest = [2 * math.pi] * (max(level) + 1)
+    stack = []
+    start = 0.0
+    for root in roots:
+        wedge = 2 * math.pi * leaves[root] / total
+        stack.append((root, start, wedge))
+        start += wedge
+    while stack:
+        v, start, wedge = stack.pop()
+        wedges[v] = (start, wedge)
+        narrowest[level[v]] = min(narrowest[level[v]], wedge)
+        child_start = start
+        for c in children[v]:
+            child_wedge = wedge * leaves[c] / leaves[v]
+            stack.append((c, child_start, child_wedge))
+            child_start += child_wedge
+
+    # Neighbours on a ring are at least the narrowest wedge apart, whose chord must span a node and the spacing
+    radii = []
+    radius = 0.0
+    for depth, wedge in enumerate(narrowest):
+        if depth + offset > 0:
+            radius = max(radius + ring, ring / (2 * math.sin(min(wedge, math.pi) / 2)))
+        radii.append(radius)
+
+    centers = []
+    for v, (start, wedge) in enumerate(wedges):
+        angle = start + wedge / 2
+        centers.append((radii[level[v]] * math.cos(angle), radii[level[v]] * math.sin(angle)))
+
+    return _normalize([(x - w / 2, y - h / 2) for (x, y), (w, h) in zip(centers, sizes)])
+
+
+def random_layout(sizes:List[Size], node_spacing:float=75, seed:Optional[int]=None) -> List[Point]:
+    """
+    Random layout in a square sized so that the nodes would fit side by side.
+
+    Returns the top-left corner of each node.
+    """
+    n = len(sizes)
+    if n == 0:
+        return []
+    rng = random.Random(seed)
+    cell = max(max(w, h) for w, h in sizes) + node_spacing
+    side = math.ceil(math.sqrt(n)) * cell
+    return [(rng.uniform(0, side - w), rng.uniform(0, side - h)) for w, h in sizes]
+
+
+def force_layout(sizes:List[Size], edges:List[Tuple[int, int]], initial:Optional[List[Point]]=None, node_spacing:float=75,
+                 iterations:int=100, seed:Optional[int]=None) -> List[Point]:
+    """
+    Force directed (Fruchterman-Reingold) layout with NumPy. Repulsion is approximated on a pyramid
+    of grids (Barnes-Hut like): exact between nodes of neighbouring cells of the finest grid, whose
+    cells are about one node and spacing wide, and from the centroids of coarser cells farther away.
+    An iteration costs O(n log n) time and O(n) memory, instead of O(n²) for all pairs. Nodes still
+    overlapping at the end are then moved apart.
+
+    Returns the top-left corner of each node.
+    """
+    import numpy as np
+
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    size = np.asarray(sizes, dtype=float)
+    k = float(size.max(axis=1).mean()) + node_spacing
+    pos = _initial_positions(np, n, initial, k, seed)
+    pairs = np.asarray(edges, dtype=np.intp).reshape(-1, 2)
+
+    temperature = k * math.sqrt(n)
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        displacement = _grid_repulsion(np, pos, k)
+        if len(pairs):
+            delta = pos[pairs[:, 0]] - pos[pairs[:, 1]]
+            distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-2)
+            pull = delta * (distance / k)[:, None]
+            np.subtract.at(displacement, pairs[:, 0], pull)
+            np.add.at(displacement, pairs[:, 1], pull)
+        length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+        pos += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    pos = _remove_overlaps(np, pos, size, node_spacing)
+    return _normalize([(x - w / 2, y - h / 2) for (x, y), (w, h) in zip(pos.tolist(), sizes)])
+
+
+# Pivots of stress_layout
+_STRESS_PIVOTS = 100
+# Levels of the grid pyramid of force_layout
+_MAX_GRID_DEPTH = 16
+# Pairs handled at once, which bounds the memory of the layouts
+_BLOCK = 4_000_000
+
+
+def _far_cells(parity_x:int, parity_y:int) -> List[Tuple[int, int]]:
+    # Offsets of the children of the cells around the parent of a cell that are not around the cell itself
+    return [(dx, dy) for dx in range(-2 - parity_x, 4 - parity_x) for dy in range(-2 - parity_y, 4 - parity_y)
+            if abs(dx) > 1 or abs(dy) > 1]
+
+
+_FAR_CELLS = {(parity_x, parity_y): _far_cells(parity_x, parity_y) for parity_x in (0, 1) for parity_y in (0, 1)}
+_NEAR_CELLS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)]
+
+
+def _grid_repulsion(np:any, pos:any, k:float) -> any:
+    # Repulsion k² / d on every node. On the grid of each level, a node is repelled by the centroids (weighted by
+    # their number of nodes) of the cells that are not its neighbours but are children of the neighbours of its
+    # parent cell. Its neighbours on the finest grid repel it node by node. Every other node is counted once.
+    n = len(pos)
+    k2 = k * k
+    low = pos.min(axis=0)
+    extent = max(float((pos.max(axis=0) - low).max()), 1e-9)
+    depth = min(max(math.ceil(math.log2(extent / k)), 1), _MAX_GRID_DEPTH)
+    x, y = pos[:, 0], pos[:, 1]
+    fx = np.zeros(n)
+    fy = np.zeros(n)
+
+    def cells(side:int):
+        # Cells are keyed with a margin of 3 cells around the grid, so that neighbours outside it match no key
+        cell_x = np.minimum(((x - low[0]) * (side / extent)).astype(np.intp), side - 1)
+        cell_y = np.minimum(((y - low[1]) * (side / extent)).astype(np.intp), side - 1)
+        keys, cell_of = np.unique((cell_x + 3) * (side + 6) + cell_y + 3, return_inverse=True)
+        cell_of = cell_of.reshape(-1)
+        return cell_x, cell_y, keys, cell_of, np.bincount(cell_of)
+
+    def lookup(keys, wanted_keys):
+        slots = np.minimum(np.searchsorted(keys, wanted_keys), len(keys) - 1)
+        return slots, keys[slots] == wanted_keys
+
+    for level in range(2, depth + 1):
+        side = 1 << level
+        cell_x, cell_y, keys, cell_of, counts = cells(side)
+        centroid_x = np.bincount(cell_of, weights=x) / counts
+        centroid_y = np.bincount(cell_of, weights=y) / counts
+        parity = (cell_x & 1) * 2 + (cell_y & 1)
+        for (parity_x, parity_y), far in _FAR_CELLS.items():
+            nodes = np.flatnonzero(parity == parity_x * 2 + parity_y)
+            shift = np.asarray(far, dtype=np.intp)
+            step = _BLOCK // len(far)
+            for first in range(0, len(nodes), step):
+                block = nodes[first:first + step]
+                node_keys = (cell_x[block] + 3) * (side + 6) + cell_y[block] + 3
+                slots, found = lookup(keys, node_keys[:, None] + shift[:, 0] * (side + 6) + shift[:, 1])
+                dx = x[block, None] - centroid_x[slots]
+                dy = y[block, None] - centroid_y[slots]
+                strength = found * counts[slots] * k2 / np.maximum(dx * dx + dy * dy, 1e-4)
+                fx[block] += (dx * strength).sum(axis=1)
+                fy[block] += (dy * strength).sum(axis=1)
+
+    cell_x, cell_y, _, _, _ = cells(1 << depth)
+    for i, j in _neighbour_pairs(np, cell_x, cell_y):
+        dx = x[i] - x[j]
+        dy = y[i] - y[j]
+        strength = k2 / np.maximum(dx * dx + dy * dy, 1e-4)
+        fx += np.bincount(i, weights=dx * strength, minlength=n)
+        fy += np.bincount(i, weights=dy * strength, minlength=n)
+    return np.stack([fx, fy], axis=1)
+
+
+def _neighbour_pairs(np:any, cell_x:any, cell_y:any):
+    # Pairs (i, j) of nodes in the same or neighbouring cells of a grid (of non-negative cells), both ways and with
+    # i == j, in blocks of about _BLOCK pairs. Cells are keyed with a margin of one cell, so that neighbours outside
+    # the grid match no key.
+    height = int(cell_y.max()) + 3
+    node_keys = (cell_x + 1) * height + cell_y + 1
+    keys, cell_of = np.unique(node_keys, return_inverse=True)
+    cell_of = cell_of.reshape(-1)
+    counts = np.bincount(cell_of)
+    order = np.argsort(cell_of, kind='stable')
+    starts = np.cumsum(counts) - counts
+    for shift_x, shift_y in _NEAR_CELLS:
+        wanted = node_keys + shift_x * height + shift_y
+        slots = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+        nodes = np.flatnonzero(keys[slots] == wanted)
+        lengths = counts[slots[nodes]]
+        step = max(1, _BLOCK // int(lengths.max(initial=1)))
+        for first in range(0, len(nodes), step):
+            block_lengths = lengths[first:first + step]
+            i = np.repeat(nodes[first:first + step], block_lengths)
+            within = np.arange(len(i)) - np.repeat(np.cumsum(block_lengths) - block_lengths, block_lengths)
+            yield i, order[np.repeat(starts[slots[nodes[first:first + step]]], block_lengths) + within]
+
+
+def _remove_overlaps(np:any, pos:any, size:any, node_spacing:float, rounds:int=20, rings:int=8) -> any:
+    # Moves the nodes (centered at pos) apart until no two boxes overlap. Overlapping pairs are first pushed apart
+    # along the axis they overlap the least on, half each, which keeps the shape of the drawing. The nodes still
+    # overlapping after the rounds then move, nearest to the center first, to the nearest free room within a few
+    # rings of half node steps around them. When some find none (eg. in the crowded core of a stress layout), the
+    # nodes are instead put in rows of equal counts by rank of y, as many as make the drawing about square, and
+    # packed by x in each row like the layers of layered_layout.
+    n = len(pos)
+    gap = node_spacing / 2
+    half = size / 2 + gap / 2
+    x, y = pos[:, 0].copy(), pos[:, 1].copy()
+    # Boxes that overlap are in neighbouring cells
+    cell_width, cell_height = 2 * half.max(axis=0)
+
+    for push in range(rounds + 1):
+        cell_x = ((x - x.min()) / cell_width).astype(np.intp)
+        cell_y = ((y - y.min()) / cell_height).astype(np.intp)
+        push_x = np.zeros(n)
+        push_y = np.zeros(n)
+        stuck = np.zeros(n, dtype=bool)
+        for i, j in _neighbour_pairs(np, cell_x, cell_y):
+            keep = i < j
+            i, j = i[keep], j[keep]
+            dx = x[i] - x[j]
+            dy = y[i] - y[j]
+            overlap_x = half[i, 0] + half[j, 0] - np.abs(dx)
+            overlap_y = half[i, 1] + half[j, 1] - np.abs(dy)
+            hit = (overlap_x > 0) & (overlap_y > 0)
+            i, j, dx, dy, overlap_x, overlap_y = i[hit], j[hit], dx[hit], dy[hit], overlap_x[hit], overlap_y[hit]
+            stuck[i] = stuck[j] = True
+            along_x = overlap_x <= overlap_y
+            shift_x = np.where(along_x, np.where(dx >= 0, 1, -1) * overlap_x / 2, 0)
+            shift_y = np.where(along_x, 0, np.where(dy >= 0, 1, -1) * overlap_y / 2)
+            push_x += np.bincount(i, weights=shift_x, minlength=n) - np.bincount(j, weights=shift_x, minlength=n)
+            push_y += np.bincount(i, weights=shift_y, minlength=n) - np.bincount(j, weights=shift_y, minlength=n)
+        if not stuck.any():
+            return np.stack([x, y], axis=1)
+        if push < rounds:
+            x += push_x
+            y += push_y
+
+    grid = _BoxGrid(max(cell_width, cell_height))
+    boxes = np.stack([x - size[:, 0] / 2, y - size[:, 1] / 2, size[:, 0], size[:, 1]], axis=1).tolist()
+    for v in np.flatnonzero(~stuck).tolist():
+        grid.add(*boxes[v])
+    stuck = np.flatnonzero(stuck)
+    moved = {}
+    for v in stuck[np.argsort((x[stuck] - x.mean()) ** 2 + (y[stuck] - y.mean()) ** 2, kind='stable')].tolist():
+        left, top, width, height = boxes[v]
+        step_x, step_y = (width + gap) / 2, (height + gap) / 2
+        spot = None
+        for ring in range(rings + 1):
+            offsets = sorted(((a, b) for a in range(-ring, ring + 1) for b in range(-ring, ring + 1) if max(abs(a), abs(b)) == ring),
+                             key=lambda offset: (offset[0] * step_x) ** 2 + (offset[1] * step_y) ** 2)
+            spot = next(((left + a * step_x, top + b * step_y) for a, b in offsets
+                         if grid.is_free(left + a * step_x, top + b * step_y, width, height, gap / 2)), None)
+            if spot is not None:
+                break
+        if spot is None:
+            break
+        moved[v] = spot
+        grid.add(*spot, width, height)
+    else:
+        for v, (left, top) in moved.items():
+            x[v], y[v] = left + size[v, 0] / 2, top + size[v, 1] / 2
+        return np.stack([x, y], axis=1)
+
+    pitch = float(size[:, 1].max()) + gap
+    rows = min(n, max(round(math.sqrt(float((size[:, 0] + gap).sum()) / pitch)), math.ceil(np.ptp(y) / pitch), 1))
+    row_of = np.empty(n, dtype=np.intp)
+    row_of[np.argsort(y, kind='stable')] = np.arange(n) * rows // n
+    desired = x.tolist()
+    widths = size[:, 0].tolist()
+    for row in range(rows):
+        members = np.flatnonzero(row_of == row)
+        _pack(members[np.argsort(x[members], kind='stable')].tolist(), desired, widths, gap)
+    return np.stack([np.asarray(desired), (row_of + 0.5) * pitch], axis=1)
+
+
+def stress_layout(sizes:List[Size], edges:List[Tuple[int, int]], initial:Optional[List[Point]]=None, node_spacing:float=75,
+                  iterations:int=100, seed:Optional[int]=None) -> List[Point]:
+    """
+    Sparse stress majorization layout with NumPy (Ortmann et al.): the distance between two nodes in
+    the canvas approximates their graph distance. Each node is pulled towards its neighbours and
+    _STRESS_PIVOTS pivots spread over the graph, each pivot standing for the nodes around it, rather
+    than towards every other node. Without a previous layout, it starts from the pivot MDS of the
+    graph. Memory and the cost of an iteration are O(n * pivots + edges); graphs with at most that
+    many nodes get the exact stress. Nodes that overlap at the end are then moved apart.
+
+    Returns the top-left corner of each node.
+    """
+    import numpy as np
+
+    n = len(sizes)
+    if n == 0:
+        return []
+
+    size = np.asarray(sizes, dtype=float)
+    k = float(size.max(axis=1).mean()) + node_spacing
+
+    neighbours = [set() for _ in range(n)]
+    for u, v in edges:
+        if u != v:
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+
+    # Pivots chosen farthest first, every component getting one before any gets a second
+    pivots = []
+    hops = []
+    nearest = np.full(n, np.inf)
+    for _ in range(min(n, _STRESS_PIVOTS)):
+        pivot = int(np.argmax(nearest)) if pivots else 0
+        row = _bfs_hops(np, neighbours, pivot)
+        pivots.append(pivot)
+        hops.append(row)
+        nearest = np.minimum(nearest, np.where(row < 0, np.inf, row))
+    hops = np.asarray(hops)
+    # Disconnected pairs are kept one hop further apart than the farthest connected pair
+    hops[hops < 0] = hops.max() + 1
+
+    # A pivot stands for the nodes of its region (the nodes it is the nearest pivot of) closer to it than half
+    # the distance to the node it pulls
+    region = np.argmin(hops, axis=0)
+    weight_of_pivot = np.empty_like(hops)
+    for p in range(len(pivots)):
+        members = np.sort(hops[p, region == p])
+        weight_of_pivot[p] = np.searchsorted(members, hops[p] / 2, side='right')
+
+    # Terms (node, pivot), and (node, neighbour) when not every node is a pivot
+    i = np.tile(np.arange(n), len(pivots))
+    j = np.repeat(pivots, n)
+    target = hops.reshape(-1)
+    scale = weight_of_pivot.reshape(-1)
+    keep = i != j
+    if len(pivots) < n:
+        # Neighbours pull through their edge rather than as pivots
+        keep &= target != 1
+        edge_pairs = np.asarray([(u, v) for u in range(n) for v in neighbours[u]], dtype=np.intp).reshape(-1, 2)
+        i = np.concatenate([i[keep], edge_pairs[:, 0]])
+        j = np.concatenate([j[keep], edge_pairs[:, 1]])
+        target = np.concatenate([target[keep], np.ones(len(edge_pairs))])
+        scale = np.concatenate([scale[keep], np.ones(len(edge_pairs))])
+    else:
+        i, j, target, scale = i[keep], j[keep], target[keep], scale[keep]
+    target = target * k
+    weight = scale / target ** 2
+    weight_sum = np.maximum(np.bincount(i, weights=weight, minlength=n), 1e-12)
+
+    if _is_laid_out(np, initial, k) or len(pivots) < 2:
+        pos = _initial_positions(np, n, initial, k, seed)
+    else:
+        # Starting from the pivot MDS of the graph distances avoids most of the folds of a random start
+        pos = _pivot_mds(np, hops * k, seed)
+        distance = np.maximum(np.sqrt(((pos[i] - pos[j]) ** 2).sum(axis=1)), 1e-9)
+        pos *= (weight * target * distance).sum() / max((weight * distance * distance).sum(), 1e-12)
+    for _ in range(iterations):
+        delta = pos[i] - pos[j]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-6)
+        contribution = weight[:, None] * pos[j] + (weight * target / distance)[:, None] * delta
+        pos = np.stack([np.bincount(i, weights=contribution[:, axis], minlength=n) for axis in (0, 1)], axis=1) / weight_sum[:, None]
+
+    pos = _remove_overlaps(np, pos, size, node_spacing)
+    return _normalize([(x - w / 2, y - h / 2) for (x, y), (w, h) in zip(pos.tolist(), sizes)])
+
+
+def _pivot_mds(np:any, distances:any, seed:Optional[int]) -> any:
+    # Classical scaling of the distances from the pivots to every node (Brandes and Pich), up to its scale
+    squared = distances ** 2
+    centered = -0.5 * (squared - squared.mean(axis=1, keepdims=True) - squared.mean(axis=0, keepdims=True) + squared.mean())
+    _, vectors = np.linalg.eigh(centered @ centered.T)
+    pos = centered.T @ vectors[:, -2:]
+    # Nodes at the same distance from every pivot are nudged apart
+    return pos + np.random.default_rng(seed).uniform(-1e-3, 1e-3, pos.shape) * max(float(np.abs(pos).max()), 1.0)
+
+
+def _bfs_hops(np:any, neighbours:List[set], source:int) -> any:
+    # Hops from a node to every other one on the undirected graph, -1 for the unreachable ones
+    row = np.full(len(neighbours), -1.0)
+    row[source] = 0
+    queue = deque([source])
+    while queue:
+        u = queue.popleft()
+        for v in neighbours[u]:
+            if row[v] < 0:
+                row[v] = row[u] + 1
+                queue.append(v)
+    return row
+
+
+def _is_laid_out(np:any, initial:Optional[List[Point]], scale:float) -> bool:
+    # Whether there are initial positions, and not everything is stacked (eg. freshly created nodes at the origin)
+    return initial is not None and np.ptp(np.asarray(initial, dtype=float), axis=0).max() >= scale
+
+
+def _initial_positions(np:any, n:int, initial:Optional[List[Point]], scale:float, seed:Optional[int]) -> any:
+    rng = np.random.default_rng(seed)
+    jitter = rng.uniform(-scale, scale, size=(n, 2))
+    if initial is None:
+        return jitter * math.sqrt(n)
+    pos = np.asarray(initial, dtype=float)
+    if not _is_laid_out(np, initial, scale):
+        return pos + jitter * math.sqrt(n)
+    # Start from the current positions, nudged so that no two nodes coincide
+    return pos + jitter * 0.1
+
+
+class _BoxGrid:
+
+    """
+    Uniform grid over node boxes, to find free room for a node without scanning the whole graph.
+    """
+
+    def __init__(self, cell_size:float=256) -> None:
+        self.cell_size = cell_size
+        self.cells = {}
+        self.bounds = None
+
+    def _cells(self, x:float, y:float, width:float, height:float):
+        c = self.cell_size
+        for i in range(math.floor(x / c), math.floor((x + width) / c) + 1):
+            for j in range(math.floor(y / c), math.floor((y + height) / c) + 1):
+                yield i, j
+
+    def add(self, x:float, y:float, width:float, height:float) -> None:
+        box = (x, y, width, height)
+        for cell in self._cells(x, y, width, height):
+            self.cells.setdefault(cell, []).append(box)
+        if self.bounds is None:
+            self.bounds = [x, y, x + width, y + height]
+        else:
+            self.bounds = [min(self.bounds[0], x), min(self.bounds[1], y), max(self.bounds[2], x + width), max(self.bounds[3], y + height)]
+
+    def is_free(self, x:float, y:float, width:float, height:float, margin:float) -> bool:
+        x, y, width, height = x - margin, y - margin, width + 2 * margin, height + 2 * margin
+        for cell in self._cells(x, y, width, height):
+            for bx, by, bw, bh in self.cells.get(cell, ()):
+                if x < bx + bw and bx < x + width and y < by + bh and by < y + height:
+                    return False
+        return True
+
+
+class _Room:
+
+    """
+    The room taken around nodes being placed: the other nodes of the state, found with its spatial index, and
+    the nodes placed so far. Bounds are the ones of the spatial index, grown with the placed nodes.
+    """
+
+    def __init__(self, state:any, movable:Dict[str, any]) -> None:
+        self.index = state._get_spatial_index()
+        self.movable = movable
+        self.placed = _BoxGrid()
+        self.bounds = None if self.index.bounds is None else list(self.index.bounds)
+
+    def add(self, x:float, y:float, width:float, height:float) -> None:
+        self.placed.add(x, y, width, height)
+        if self.bounds is None:
+            self.bounds = [x, y, x + width, y + height]
+        else:
+            self.bounds = [min(self.bounds[0], x), min(self.bounds[1], y), max(self.bounds[2], x + width), max(self.bounds[3], y + height)]
+
+    def is_free(self, x:float, y:float, width:float, height:float, margin:float) -> bool:
+        if not self.placed.is_free(x, y, width, height, margin):
+            return False
+        x, y, width, height = x - margin, y - margin, width + 2 * margin, height + 2 * margin
+        for node in self.index.query(x, y, x + width, y + height):
+            if node.id in self.movable:
+                continue
+            # Up to date, as the query indexes again the nodes it finds moved
+            bx0, by0, bx1, by1 = self.index.boxes[node.id][0]
+            if x < bx1 and bx0 < x + width and y < by1 and by0 < y + height:
+                return False
+        return True
+
+
+def place_nodes(state:any, node_ids:List[str], direction:Optional[str]=None, node_spacing:float=75,
+                layer_spacing:float=75, max_steps:int=64) -> None:
+    """
+    Incremental layout: give positions to some nodes of a state, in place, leaving every other node where it is.
+
+    Nodes are placed in breadth-first order from the ones already in place. A node goes after its placed
+    predecessors (or before its placed successors) along the direction, centered on them across it, and
+    without a direction next to the centroid of its placed neighbours. It then slides to the nearest spot
+    that overlaps nothing. Nodes without placed neighbours start beside the drawing. The work per placed
+    node only involves its neighbours and the nearby cells of the spatial index of the state, whatever the
+    size of the graph.
+    """
+    movable = {node_id: state.get_node(node_id) for node_id in node_ids if state.get_node(node_id) is not None}
+    sizes = {node_id: estimate_node_size(node) for node_id, node in movable.items()}
+    margin = min(node_spacing, layer_spacing) / 2
+
+    room = _Room(state, movable)
+
+    placed = {}
+
+    def box_of(node_id:str):
+        if node_id in placed:
+            return placed[node_id]
+        if node_id in movable:
+            return None
+        node = state.get_node(node_id)
+        if node is None:
+            return None
+        return (node.position['x'], node.position['y'], *estimate_node_size(node))
+
+    def place(node_id:str) -> None:
+        width, height = sizes[node_id]
+        preds = [box for box in (box_of(edge.source) for edge in state.edges_of(node_id, 'in') if edge.source != node_id) if box]
+        succs = [box for box in (box_of(edge.target) for edge in state.edges_of(node_id, 'out') if edge.target != node_id) if box]
+        x, y, slide_axis, both_ways, step_back = _initial_spot(preds, succs, width, height, room.bounds, direction, node_spacing, layer_spacing)
+        x, y = _free_spot(room, x, y, width, height, margin, slide_axis, both_ways, step_back, node_spacing, max_steps)
+        placed[node_id] = (x, y, width, height)
+        room.add(x, y, width, height)
+
+    queue = deque(node_id for node_id in movable if any(box_of(n.id) for n in state.neighbors(node_id)))
+    seen = set(queue)
+    pending = iter(list(movable))
+    while True:
+        if not queue:
+            node_id = next((node_id for node_id in pending if node_id not in seen), None)
+            if node_id is None:
+                break
+            seen.add(node_id)
+            queue.append(node_id)
+        node_id = queue.popleft()
+        place(node_id)
+        for neighbor in state.neighbors(node_id):
+            if neighbor.id in movable and neighbor.id not in seen:
+                seen.add(neighbor.id)
+                queue.append(neighbor.id)
+
+    for node, (x, y, _, _) in zip(state.edit_nodes(list(placed)), placed.values()):
+        node.position = {"x": x, "y": y}
+    state.reindex_positions(list(placed))
+
+
+def _initial_spot(preds, succs, width, height, bounds, direction, node_spacing, layer_spacing):
+    # Returns the first position to try, the axis to slide along (0 for x, 1 for y), whether to slide both
+    # ways and how to move across layers when the slide finds nothing
+    axis = 1 if direction in ('down', 'up') else 0
+    sign = -1 if direction in ('up', 'left') else 1
+    size = (width, height)
+    neighbors = preds + succs
+
+    if not neighbors:
+        if bounds is None:
+            return 0.0, 0.0, 1 - axis, False, (0.0, 0.0)
+        # Beside the drawing, across the direction, sliding further away from it
+        if direction is None or axis == 1:
+            return bounds[2] + node_spacing, bounds[1], 0, False, (0.0, height + layer_spacing)
+        return bounds[0], bounds[3] + node_spacing, 1, False, (width + layer_spacing, 0.0)
+
+    centers = [(bx + bw / 2, by + bh / 2) for bx, by, bw, bh in neighbors]
+    center = [sum(c[0] for c in centers) / len(centers), sum(c[1] for c in centers) / len(centers)]
+
+    if direction is None:
+        # Next to the centroid, on the right of the widest neighbour
+        reach = max(bw for _, _, bw, _ in neighbors) / 2 + node_spacing
+        return center[0] + reach, center[1] - height / 2, 1, True, (width + node_spacing, 0.0)
+
+    spot = [center[0] - width / 2, center[1] - height / 2]
+    if preds:
+        ends = [box[axis] + box[axis + 2] for box in preds] if sign > 0 else [box[axis] for box in preds]
+        spot[axis] = max(ends) + layer_spacing if sign > 0 else min(ends) - layer_spacing - size[axis]
+    else:
+        starts = [box[axis] for box in succs] if sign > 0 else [box[axis] + box[axis + 2] for box in succs]
+        spot[axis] = min(starts) - layer_spacing - size[axis] if sign > 0 else max(starts) + layer_spacing
+        sign = -sign
+    step_back = [0.0, 0.0]
+    step_back[axis] = sign * (size[axis] + layer_spacing)
+    return spot[0], spot[1], 1 - axis, True, tuple(step_back)
+
+
+def _free_spot(room:_Room, x:float, y:float, width:float, height:float, margin:float, slide_axis:int,
+               both_ways:bool, step_back:Tuple[float, float], node_spacing:float, max_steps:int) -> Point:
+    step = ((width, height)[slide_axis] + node_spacing) / 2
+    for _ in range(max_steps):
+        for k in range(max_steps):
+            for offset in ((k * step, -k * step) if both_ways and k else (k * step,)):
+                cx = x + offset if slide_axis == 0 else x
+                cy = y + offset if slide_axis == 1 else y
+                if room.is_free(cx, cy, width, height, margin):
+                    return cx, cy
+        if step_back == (0.0, 0.0):
+            break
+        x, y = x + step_back[0], y + step_back[1]
+    return x, y
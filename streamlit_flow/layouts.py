@@ -1,5 +1,7 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Literal
+from typing import Dict, List, Literal, Optional, Tuple
+
+from . import layout_engine
 
 class Layout(ABC):
 
@@ -7,6 +9,41 @@ class Layout(ABC):
     def __to_dict__(self) -> Dict[str, any]:
         raise NotImplementedError("Subclasses must implement this method")
 
+    def compute(self, state:'StreamlitFlowState', node_ids:Optional[List[str]]=None) -> 'StreamlitFlowState':
+        """
+        Compute the layout in Python, without a browser, and write the positions into the nodes of the state.
+        Node sizes are estimated from their style and columns. Render the result with ManualLayout,
+        which tells the frontend to keep the positions as they are.
+
+        With node_ids, the layout is incremental: every other node is pinned where it is, and only the given
+        nodes (eg. the ones just added) are placed next to their neighbours, in the direction and with the
+        spacing of the layout, without overlapping anything. This keeps the rest of the drawing stable and
+        costs time in proportion to the nodes placed rather than to the whole graph.
+
+        Arguments
+        - **state** : StreamlitFlowState : The state to lay out, modified in place.
+        - **node_ids** : List[str]? : The ids of the nodes to place. Lays out the whole graph if None.
+
+        Returns the state.
+        """
+        if node_ids is not None:
+            self._place_nodes(state, node_ids)
+            return state
+
+        ids, sizes, edges = layout_engine.graph_from_state(state)
+        positions = self._compute_positions(state, sizes, edges)
+        for node, (x, y) in zip(state.edit_nodes(ids), positions):
+            node.position = {"x": x, "y": y}
+        state.reindex_positions()
+        return state
+
+    def _compute_positions(self, state:'StreamlitFlowState', sizes:List[Tuple[float, float]], edges:List[Tuple[int, int]]) -> List[Tuple[float, float]]:
+        raise NotImplementedError(f"{type(self).__name__} can only be computed in the browser")
+
+    def _place_nodes(self, state:'StreamlitFlowState', node_ids:List[str]) -> None:
+        spacing = getattr(self, 'node_node_spacing', 75)
+        layout_engine.place_nodes(state, node_ids, None, spacing, spacing)
+
 class ManualLayout(Layout):
     def __init__(self):
         pass
@@ -15,9 +52,16 @@ class ManualLayout(Layout):
         return {
             "elkOptions": {
                 'elk.algorithm': "org.eclipse.elk.fixed",
-            }
+            },
+            "fixed": True
         }
 
+    def compute(self, state:'StreamlitFlowState', node_ids:Optional[List[str]]=None) -> 'StreamlitFlowState':
+        # Positions are the user's, only nodes asked for are placed
+        if node_ids is not None:
+            self._place_nodes(state, node_ids)
+        return state
+
 class LayeredLayout(Layout):
     def __init__(self, direction:Literal['up', 'down', 'left', 'right'], node_node_spacing:float=75, node_layer_spacing:float=75) -> None:
 
@@ -39,6 +83,12 @@ class LayeredLayout(Layout):
                 }
         }
 
+    def _compute_positions(self, state, sizes, edges):
+        return layout_engine.layered_layout(sizes, edges, self.direction, self.node_node_spacing, self.node_layer_spacing)
+
+    def _place_nodes(self, state, node_ids):
+        layout_engine.place_nodes(state, node_ids, self.direction, self.node_node_spacing, self.node_layer_spacing)
+
 class TreeLayout(Layout):
 
     def __init__(self, direction:Literal['up', 'down', 'left', 'right'], node_node_spacing:float=75) -> None:
@@ -55,6 +105,12 @@ class TreeLayout(Layout):
                 }
         }
 
+    def _compute_positions(self, state, sizes, edges):
+        return layout_engine.tree_layout(sizes, edges, self.direction, self.node_node_spacing)
+
+    def _place_nodes(self, state, node_ids):
+        layout_engine.place_nodes(state, node_ids, self.direction, self.node_node_spacing, self.node_node_spacing)
+
 class RadialLayout(Layout):
 
     def __init__(self, node_node_spacing:float=75) -> None:
@@ -68,6 +124,9 @@ class RadialLayout(Layout):
                 }
         }
 
+    def _compute_positions(self, state, sizes, edges):
+        return layout_engine.radial_layout(sizes, edges, self.node_node_spacing)
+
 class ForceLayout(Layout):
 
     def __init__(self, node_node_spacing:float=75) -> None:
@@ -81,6 +140,10 @@ class ForceLayout(Layout):
                 }
         }
 
+    def _compute_positions(self, state, sizes, edges):
+        initial = [(node.position['x'], node.position['y']) for node in state.nodes]
+        return layout_engine.force_layout(sizes, edges, initial, self.node_node_spacing)
+
 
 class StressLayout(Layout):
 
@@ -95,6 +158,10 @@ class StressLayout(Layout):
                 }
         }
 
+    def _compute_positions(self, state, sizes, edges):
+        initial = [(node.position['x'], node.position['y']) for node in state.nodes]
+        return layout_engine.stress_layout(sizes, edges, initial, self.node_node_spacing)
+
 class RandomLayout(Layout):
 
     def __init__(self, node_node_spacing:float=75) -> None:
@@ -107,3 +174,6 @@ class RandomLayout(Layout):
                     'elk.spacing.nodeNode': self.node_node_spacing,
                 }
         }
+
+    def _compute_positions(self, state, sizes, edges):
+        return layout_engine.random_layout(sizes, self.node_node_spacing)
@@ -0,0 +1,41 @@
+from dataclasses import dataclass, field, asdict
+from typing import Dict, Optional
+
+
+@dataclass
+class FlowMetrics:
+    """
+    Timings of one streamlit_flow() call, recorded when it is called with profile=True.
+
+    Python side
+    - **run** : int : Number of profiled calls so far for this component.
+    - **receive_ms** : float : Time spent applying the frontend messages to the state (deserialization).
+    - **received_nodes** : int : Nodes added or replaced by the frontend message applied during the call.
+    - **received_edges** : int : Edges added or replaced by the frontend message applied during the call.
+    - **build_patch_ms** : float : Time spent diffing and serializing the state into the patch for the frontend.
+    - **patch_nodes** : int : Nodes in the patch sent.
+    - **patch_edges** : int : Edges in the patch sent.
+    - **patch_bytes** : int : Size of the patch sent, as JSON, plus the Arrow table of its nodes with wire_format='columnar'.
+    - **transport_ms** : float? : Time between the frontend sending the message applied during the call and Python applying it.
+    - **total_ms** : float : Time spent in streamlit_flow(), including the component call.
+
+    Frontend side, as reported with the message applied during the call (None when there was none)
+    - **frontend** : Dict[str, any]? : 'layoutMs' (last ELK layout, 0 when served from the layout cache), 'renderMs'
+      (from applying the last patch from Python to the end of the resulting React commit), 'receivedBytes' (size of the
+      last patch from Python) and 'sentBytes' (size of the message).
+    """
+
+    run: int = 0
+    receive_ms: float = 0.0
+    received_nodes: int = 0
+    received_edges: int = 0
+    build_patch_ms: float = 0.0
+    patch_nodes: int = 0
+    patch_edges: int = 0
+    patch_bytes: int = 0
+    transport_ms: Optional[float] = None
+    total_ms: float = 0.0
+    frontend: Optional[Dict[str, any]] = field(default=None)
+
+    def asdict(self) -> Dict[str, any]:
+        return asdict(self)
@@ -0,0 +1,314 @@
+import io
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from uuid import uuid4
+
+from .elements import StreamlitFlowNode, StreamlitFlowEdge
+from .layouts import Layout
+from .state import StreamlitFlowState
+
+SCHEMA_KEYS = frozenset(['tables', 'relationships'])
+TABLE_KEYS = frozenset(['table_name', 'columns'])
+COLUMN_KEYS = frozenset(['column_name', 'type', 'isPrimaryKey', 'isForeignKey', 'references', 'calculatedColumn', 'formula'])
+RELATIONSHIP_KEYS = frozenset(['from_table', 'from_column', 'to_table', 'to_column', 'relationship_type'])
+
+RELATIONSHIP_EDGE_STYLES = {
+    'OneToOne': {'label': '1:1', 'markerEnd': {'type': 'arrow'}, 'markerStart': {'type': 'arrow'}},
+    'OneToMany': {'label': '1:N', 'markerEnd': {'type': 'arrowclosed'}},
+    'ManyToOne': {'label': 'N:1', 'markerStart': {'type': 'arrowclosed'}},
+    'ManyToMany': {'label': 'N:N', 'markerEnd': {'type': 'arrowclosed'}, 'markerStart': {'type': 'arrowclosed'}},
+}
+
+SchemaSource = Union[Dict[str, any], str, bytes, io.IOBase, Iterable[str]]
+
+
+@dataclass
+class SchemaImport:
+    """
+    Result of a schema import.
+
+    Arguments
+    - **nodes** : List[StreamlitFlowNode] : The nodes created, one per table.
+    - **edges** : List[StreamlitFlowEdge] : The edges created, one per relationship whose tables were found.
+    - **errors** : List[str] : Why the schema is invalid. Nothing is added to the state when there are errors.
+    - **unresolved** : List[Dict[str, any]] : The relationships between tables that are not on the canvas.
+    - **timings** : Dict[str, float] : Seconds spent in each stage (parse, validate, build_nodes, bind_edges, layout) and in total.
+    """
+
+    nodes: List[StreamlitFlowNode] = field(default_factory=list)
+    edges: List[StreamlitFlowEdge] = field(default_factory=list)
+    errors: List[str] = field(default_factory=list)
+    unresolved: List[Dict[str, any]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.errors
+
+
+def relationship_edge_style(relationship_type:str) -> Dict[str, any]:
+    """
+    Label and markers of the edge drawn for a relationship type.
+    """
+    return dict(RELATIONSHIP_EDGE_STYLES.get(relationship_type, {}))
+
+
+def table_content(table_name:str) -> str:
+    """
+    Markdown content of the node of a table.
+    """
+    return f"**{table_name}**"
+
+
+def validate_table(table:any) -> Optional[str]:
+    """
+    Check a table of the schema. Returns why it is invalid, or None.
+    """
+    if not isinstance(table, dict) or set(table.keys()) != TABLE_KEYS:
+        return f"tables must have exactly the keys {sorted(TABLE_KEYS)}"
+    if not isinstance(table['columns'], list):
+        return f"columns of table {table['table_name']} must be a list"
+    for column in table['columns']:
+        if not isinstance(column, dict) or not set(column.keys()).issubset(COLUMN_KEYS):
+            return f"columns of table {table['table_name']} may only have the keys {sorted(COLUMN_KEYS)}"
+    return None
+
+
+def validate_relationship(relationship:any) -> Optional[str]:
+    """
+    Check a relationship of the schema. Returns why it is invalid, or None.
+    """
+    if not isinstance(relationship, dict) or set(relationship.keys()) != RELATIONSHIP_KEYS:
+        return f"relationships must have exactly the keys {sorted(RELATIONSHIP_KEYS)}"
+    return None
+
+
+def validate_schema(schema:any) -> List[str]:
+    """
+    Check a whole schema, as loaded from JSON. Returns why it is invalid, empty if it is valid.
+    """
+    if not isinstance(schema, dict) or set(schema.keys()) != SCHEMA_KEYS:
+        return [f"the schema must be an object with exactly the keys {sorted(SCHEMA_KEYS)}"]
+    errors = []
+    for key, validate in (('tables', validate_table), ('relationships', validate_relationship)):
+        if not isinstance(schema[key], list):
+            errors.append(f"{key} must be a list")
+            continue
+        for i, item in enumerate(schema[key]):
+            error = validate(item)
+            if error is not None:
+                errors.append(f"{key}[{i}]: {error}")
+    return errors
+
+
+def read_schema_records(source:SchemaSource) -> Iterator[Tuple[str, any]]:
+    """
+    Read the tables and relationships of a schema one at a time, as ('table', table) and
+    ('relationship', relationship) pairs. Problems with the shape of the schema are yielded as ('error', message).
+
+    Arguments
+    - **source** : dict, str, bytes, file or iterable of lines : A schema loaded from JSON, JSON text, or a stream.
+      Streams are read either as one JSON document, or as newline delimited JSON with one table or relationship
+      per line, which is never held in memory all at once.
+    """
+    if isinstance(source, (str, bytes)):
+        try:
+            source = json.loads(source)
+        except ValueError as e:
+            yield 'error', f"invalid JSON: {e}"
+            return
+
+    if isinstance(source, dict):
+        if set(source.keys()) != SCHEMA_KEYS:
+            yield 'error', f"the schema must be an object with exactly the keys {sorted(SCHEMA_KEYS)}"
+            return
+        for key, kind in (('tables', 'table'), ('relationships', 'relationship')):
+            if not isinstance(source[key], list):
+                yield 'error', f"{key} must be a list"
+                continue
+            for item in source[key]:
+                yield kind, item
+        return
+
+    yield from _read_stream(iter(source))
+
+
+def _read_stream(lines:Iterator[any]) -> Iterator[Tuple[str, any]]:
+
+    first = ''
+    line_number = 0
+    for line in lines:
+        line_number += 1
+        first = line.decode() if isinstance(line, bytes) else line
+        if first.strip():
+            break
+
+    try:
+        record = json.loads(first)
+    except ValueError:
+        record = None
+
+    if not (isinstance(record, dict) and ('table_name' in record or 'from_table' in record)):
+        # One JSON document spread over the lines
+        text = first + ''.join(line.decode() if isinstance(line, bytes) else line for line in lines)
+        yield from read_schema_records(text)
+        return
+
+    while True:
+        if record is not None:
+            if 'from_table' in record:
+                yield 'relationship', record
+            elif 'table_name' in record:
+                yield 'table', record
+            else:
+                yield 'error', f"line {line_number}: not a table nor a relationship"
+
+        line = next(lines, None)
+        if line is None:
+            return
+        line_number += 1
+        line = line.decode() if isinstance(line, bytes) else line
+        if not line.strip():
+            record = None
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield 'error', f"line {line_number}: invalid JSON: {e}"
+            record = None
+            continue
+        if not isinstance(record, dict):
+            yield 'error', f"line {line_number}: not a table nor a relationship"
+            record = None
+
+
+def create_table_node(table:Dict[str, any], position:Tuple[float, float]) -> StreamlitFlowNode:
+    """
+    Create the node of a table. The frontend gives its columns connection handles, see StreamlitFlowNode.column_budget.
+    """
+    node_id = f"st-flow-node_{uuid4()}"
+    table_name = table['table_name']
+    columns = table['columns']
+    return StreamlitFlowNode(
+        node_id,
+        position,
+        {
+            'content': table_content(table_name),
+            'columns': columns,
+            'id': node_id
+        },
+        'default',
+        'right',
+        'left',
+        deletable=True
+    )
+
+
+def create_relationship_edge(relationship:Dict[str, any], from_node:StreamlitFlowNode, to_node:StreamlitFlowNode) -> StreamlitFlowEdge:
+    """
+    Create the edge of a relationship between the nodes of its two tables.
+    """
+    edge_style = relationship_edge_style(relationship['relationship_type'])
+    return StreamlitFlowEdge(
+        id=f"edge_{uuid4()}",
+        source=from_node.id,
+        target=to_node.id,
+        sourceHandle=f"{from_node.id}-{relationship['from_column']}-source",
+        targetHandle=f"{to_node.id}-{relationship['to_column']}-target",
+        data={
+            'label': edge_style.get('label', relationship['relationship_type']),
+            'relationship_type': relationship['relationship_type'],
+            'from_table': relationship['from_table'],
+            'from_column': relationship['from_column'],
+            'to_table': relationship['to_table'],
+            'to_column': relationship['to_column']
+        },
+        animated=False,
+        **edge_style
+    )
+
+
+def import_schema(source:SchemaSource, state:StreamlitFlowState, layout:Optional[Layout]=None) -> SchemaImport:
+    """
+    Add the tables and relationships of a schema to a state, in a single pass over the schema.
+
+    Tables are indexed by name as their nodes are built, together with the tables already on the canvas,
+    so every relationship is bound to its nodes in O(1). The state is only modified when the whole schema
+    is valid.
+
+    Arguments
+    - **source** : dict, str, bytes, file or iterable of lines : The schema, see read_schema_records.
+    - **state** : StreamlitFlowState : The state to add the nodes and edges to.
+    - **layout** : Layout? : Lays the new nodes out with this layout, next to the existing ones if any (see Layout.compute). Without it, tables are lined up after the existing nodes.
+
+    Returns a SchemaImport with the new elements, the errors and the time spent in each stage.
+    """
+    timings = {'parse': 0.0, 'validate': 0.0, 'build_nodes': 0.0, 'bind_edges': 0.0, 'layout': 0.0}
+    result = SchemaImport(timings=timings)
+    start = time.perf_counter()
+
+    # Existing tables win over imported ones with the same name, as they did before
+    tables = {}
+    for node in state.nodes:
+        tables.setdefault(node.data.get('content'), node)
+
+    relationships = []
+    records = read_schema_records(source)
+    while True:
+        stage_start = time.perf_counter()
+        kind, record = next(records, (None, None))
+        timings['parse'] += time.perf_counter() - stage_start
+        if kind is None:
+            break
+
+        if kind == 'error':
+            result.errors.append(record)
+            continue
+
+        stage_start = time.perf_counter()
+        error = validate_table(record) if kind == 'table' else validate_relationship(record)
+        timings['validate'] += time.perf_counter() - stage_start
+        if error is not None:
+            result.errors.append(error)
+            continue
+
+        if kind == 'relationship':
+            # Bound at the end, the tables may come after their relationships in a stream
+            relationships.append(record)
+        elif not result.errors:
+            stage_start = time.perf_counter()
+            node = create_table_node(record, ((len(state.nodes) + len(result.nodes)) * 200, 0))
+            result.nodes.append(node)
+            tables.setdefault(node.data['content'], node)
+            timings['build_nodes'] += time.perf_counter() - stage_start
+
+    if result.errors:
+        result.nodes = []
+        timings['total'] = time.perf_counter() - start
+        return result
+
+    stage_start = time.perf_counter()
+    for relationship in relationships:
+        from_node = tables.get(table_content(relationship['from_table']))
+        to_node = tables.get(table_content(relationship['to_table']))
+        if from_node and to_node:
+            result.edges.append(create_relationship_edge(relationship, from_node, to_node))
+        else:
+            result.unresolved.append(relationship)
+    state.nodes.extend(result.nodes)
+    state.edges.extend(result.edges)
+    timings['bind_edges'] += time.perf_counter() - stage_start
+
+    if layout is not None and result.nodes:
+        stage_start = time.perf_counter()
+        if len(result.nodes) == len(state.nodes):
+            # Nothing to keep in place, lay the whole model out
+            layout.compute(state)
+        else:
+            layout.compute(state, node_ids=[node.id for node in result.nodes])
+        timings['layout'] += time.perf_counter() - stage_start
+
+    timings['total'] = time.perf_counter() - start
+    return result
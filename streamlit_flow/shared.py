@@ -0,0 +1,68 @@
+import copy
+from typing import List
+
+from .elements import StreamlitFlowNode, StreamlitFlowEdge
+from .state import StreamlitFlowState, _Fingerprints, _GraphIndex, _SpatialIndex
+
+
+class SharedGraph:
+    """
+    A graph loaded once per process and shared by the states of many sessions, eg. a reference model every
+    session opens. Create it in a function cached with st.cache_resource, and give each session an overlay:
+
+        @st.cache_resource
+        def reference_model():
+            return SharedGraph.from_state(StreamlitFlowState.from_frames(tables_df, links_df))
+
+        if 'flow' not in st.session_state:
+            st.session_state.flow = reference_model().overlay()
+
+    An overlay is a StreamlitFlowState whose lists point to the nodes and edges of the graph instead of copies,
+    and whose id, adjacency and spatial indexes and content fingerprints are layered over the ones of the graph, built once. A session
+    costs two lists of references, plus the elements it changed and their index entries. Elements are copied
+    into the session on their first change (copy-on-write): by updates from the frontend, layouts, groups, and
+    StreamlitFlowState.edit_node / edit_edge. Adding, removing and replacing elements only changes the lists of
+    the session.
+
+    The shared elements must not be modified in place, they would change in every session: get them with
+    edit_node or edit_edge before setting their attributes or changing their data.
+
+    Arguments
+    - **nodes** : List[StreamlitFlowNode] : The nodes of the graph.
+    - **edges** : List[StreamlitFlowEdge] : The edges of the graph.
+    """
+
+    def __init__(self, nodes:List[StreamlitFlowNode], edges:List[StreamlitFlowEdge]) -> None:
+        self.nodes = tuple(nodes)
+        self.edges = tuple(edges)
+        # Identities rather than ids, a session may hold its own element under the id of a shared one
+        self._members = set(map(id, self.nodes)) | set(map(id, self.edges))
+        # Built now rather than on first use, as sessions may read them from several threads
+        self._index = _GraphIndex(self.nodes, self.edges)
+        self._spatial_index = _SpatialIndex(self.nodes)
+        self._fingerprints = _Fingerprints.of(self.nodes, self.edges)
+
+    @classmethod
+    def from_state(cls, state:StreamlitFlowState) -> 'SharedGraph':
+        return cls(state.nodes, state.edges)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def overlay(self, selected_id:str=None) -> StreamlitFlowState:
+        """
+        A new state showing the graph, for one session.
+        """
+        state = StreamlitFlowState(list(self.nodes), list(self.edges), selected_id=selected_id)
+        state._base = self
+        return state
+
+    def is_shared(self, element:any) -> bool:
+        return id(element) in self._members
+
+    def private_copy(self, kind:str, element:any) -> any:
+        """
+        A copy of a shared node or edge that can be modified without affecting the other sessions.
+        """
+        element_class = StreamlitFlowNode if kind == 'nodes' else StreamlitFlowEdge
+        return element_class.from_dict(copy.deepcopy(element.asdict()))
@@ -1,23 +1,378 @@
+import itertools
+import math
 from dataclasses import dataclass
-from .elements import StreamlitFlowNode, StreamlitFlowEdge
-from typing import List
+from .elements import StreamlitFlowNode, StreamlitFlowEdge, fingerprint
+from .layout_engine import estimate_node_size
+from .metrics import FlowMetrics
+from typing import Dict, List, Literal, Optional, Set, Tuple
+
+# Versions are drawn from one counter, so that a version of a state is never a version of another one
+_versions = itertools.count(1)
 
 @dataclass
 class StreamlitFlowState:
     """
     Container to maintain the state of the flowchart component.
 
+    The state keeps id indexes and adjacency maps of its nodes and edges, which stay correct as the
+    lists are modified (append, remove, item assignment, reassignment...). Edges are indexed by the
+    source and target they had when added, so replace an edge rather than mutating its endpoints.
+    Nodes are also indexed on a grid by position and estimated size for nodes_in_rect; after moving
+    nodes in place, call reindex_positions (layouts and updates from the frontend do it already).
+
+    A state created by SharedGraph.overlay shares its elements with other sessions. Get the elements to modify
+    in place with edit_node and edit_edge, which replace shared ones by private copies first.
+
+    Every change of the nodes and edges increases `version`: changes of the lists, updates from the frontend,
+    layouts, groups, and the elements got with edit_node / edit_edge. changed_since tells which elements changed
+    after a version, and fingerprint() hashes the content of the graph, rehashing only the elements that changed
+    since it was last called. Elements modified in place without edit_node / edit_edge (eg. node.data['content'] = ...)
+    are noticed when streamlit_flow() next hashes the graph to build its patch, and count as changed from then on.
+
     Arguments
     - **nodes** : List[StreamlitFlowNode] : The list of nodes in the flowchart.
     - **edges** : List[StreamlitFlowEdge] : The list of edges in the flowchart.
     - **selected_id** : str? : The id of the selected node.
     - **timestamp** : float? : The timestamp of the state.
+    - **metrics** : FlowMetrics? : Timings of the last streamlit_flow() call made with profile=True.
+    - **viewport** : Dict[str, float]? : The last viewport reported by a streamlit_flow() call made with lazy_loading=True: the pan ('x', 'y'), the 'zoom', and the 'width' and 'height' of the canvas in pixels.
     """
 
     nodes: List[StreamlitFlowNode]
     edges: List[StreamlitFlowEdge]
     selected_id: str = None
     timestamp: float = 0.0
+    metrics: Optional[FlowMetrics] = None
+    viewport: Optional[Dict[str, float]] = None
+
+    # The SharedGraph this state is an overlay of, see shared.py
+    _base = None
+    _fingerprints = None
+    # The groups of the nodes, see groups.py
+    _group_tree = None
+
+    def __setattr__(self, name:str, value:any) -> None:
+        if name in ('nodes', 'edges'):
+            value = _ElementList(self, name, value)
+            object.__setattr__(self, name, value)
+            self._invalidate_index()
+        else:
+            object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> Dict[str, any]:
+        state = dict(self.__dict__)
+        # Pickled states hold their own copy of everything, including what they shared
+        for name in ('_index', '_spatial_index', '_adjacency', '_version', '_topology_version', '_base', '_fingerprints', '_changes', '_tracked_since', '_group_tree'):
+            state.pop(name, None)
+        return state
+
+    def __setstate__(self, state:Dict[str, any]) -> None:
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def _invalidate_index(self) -> None:
+        object.__setattr__(self, '_index', None)
+        object.__setattr__(self, '_spatial_index', None)
+        self._changed()
+        self._topology_changed()
+        # The lists were replaced: which elements changed is only known from now on
+        object.__setattr__(self, '_fingerprints', None)
+        object.__setattr__(self, '_group_tree', None)
+        object.__setattr__(self, '_changes', {'nodes': {}, 'edges': {}})
+        object.__setattr__(self, '_tracked_since', self._version)
+
+    def _changed(self) -> None:
+        # Caches built from the content of the nodes and edges are valid for one version
+        object.__setattr__(self, '_version', next(_versions))
+
+    def _topology_changed(self) -> None:
+        # Caches of the structure of the graph only (eg. the adjacency of graph.py) are valid until nodes or edges are
+        # added, removed or reordered, or edges get other endpoints, whatever else changes
+        object.__setattr__(self, '_topology_version', next(_versions))
+
+    def _content_changed(self, kind:str, element_ids) -> None:
+        changes = self._changes[kind]
+        for element_id in element_ids:
+            changes[element_id] = self._version
+        if self._fingerprints is not None:
+            self._fingerprints.invalidate(kind, element_ids)
+        if kind == 'nodes' and self._group_tree is not None:
+            self._group_tree.stale.update(element_ids)
+
+    def _get_index(self) -> '_GraphIndex':
+        if self._index is None:
+            if self._base is None:
+                index = _GraphIndex(self.nodes, self.edges)
+            else:
+                # Layered over the index of the shared graph, holding only the differences of this state
+                index = _GraphIndex([], [], self._base._index)
+                for kind in ('nodes', 'edges'):
+                    removed, added = self._base_changes(kind)
+                    for element in removed:
+                        index.remove(kind, element)
+                    for element in added:
+                        index.add(kind, element)
+            object.__setattr__(self, '_index', index)
+        return self._index
+
+    def _get_spatial_index(self) -> '_SpatialIndex':
+        if self._spatial_index is None:
+            if self._base is None:
+                index = _SpatialIndex(self.nodes)
+            else:
+                index = _SpatialIndex([], base=self._base._spatial_index)
+                removed, added = self._base_changes('nodes')
+                for node in removed:
+                    index.remove(node)
+                for node in added:
+                    index.add(node)
+            object.__setattr__(self, '_spatial_index', index)
+        return self._spatial_index
+
+    def _base_changes(self, kind:str) -> Tuple[list, list]:
+        # The shared elements this state does not hold, and the elements it holds that are not shared
+        base = self._base
+        held = set()
+        added = []
+        for element in getattr(self, kind):
+            if base.is_shared(element):
+                held.add(id(element))
+            else:
+                added.append(element)
+        removed = [element for element in getattr(base, kind) if id(element) not in held]
+        return removed, added
+
+    def _element_added(self, kind:str, element:any) -> None:
+        self._changed()
+        self._content_changed(kind, (element.id,))
+        if self._index is not None:
+            self._index.add(kind, element)
+        if kind == 'nodes' and self._spatial_index is not None:
+            self._spatial_index.add(element)
+
+    def _element_removed(self, kind:str, element:any) -> None:
+        self._changed()
+        self._content_changed(kind, (element.id,))
+        if self._index is not None:
+            self._index.remove(kind, element)
+        if kind == 'nodes' and self._spatial_index is not None:
+            self._spatial_index.remove(element)
+
+    def get_node(self, node_id:str) -> Optional[StreamlitFlowNode]:
+        """
+        Get a node by its id in O(1). Returns None if there is no such node.
+        """
+        return self._get_index().nodes.get(node_id)
+
+    def get_edge(self, edge_id:str) -> Optional[StreamlitFlowEdge]:
+        """
+        Get an edge by its id in O(1). Returns None if there is no such edge.
+        """
+        return self._get_index().edges.get(edge_id)
+
+    def edges_of(self, node_id:str, direction:Literal['in', 'out', 'both']='both') -> List[StreamlitFlowEdge]:
+        """
+        Get the edges connected to a node.
+
+        Arguments
+        - **node_id** : str : The id of the node.
+        - **direction** : str : 'out' for the edges leaving the node, 'in' for the edges entering it, 'both' for all of them.
+        """
+        assert direction in ['in', 'out', 'both'], f"direction must be one of ['in', 'out', 'both']. Got {direction}"
+        index = self._get_index()
+        edges = []
+        if direction in ('out', 'both'):
+            edges.extend(index.outgoing.get(node_id, {}).values())
+        if direction in ('in', 'both'):
+            edges.extend(edge for edge in index.incoming.get(node_id, {}).values() if direction == 'in' or edge.source != node_id)
+        return edges
+
+    def neighbors(self, node_id:str, direction:Literal['in', 'out', 'both']='both') -> List[StreamlitFlowNode]:
+        """
+        Get the nodes connected to a node, each one once.
+
+        Arguments
+        - **node_id** : str : The id of the node.
+        - **direction** : str : 'out' for successors, 'in' for predecessors, 'both' for all of them.
+        """
+        index = self._get_index()
+        neighbor_ids = {}
+        for edge in self.edges_of(node_id, direction):
+            source, target = index.edge_ends[edge.id]
+            neighbor_ids[target if source == node_id else source] = None
+        return [index.nodes[neighbor_id] for neighbor_id in neighbor_ids if neighbor_id in index.nodes]
+
+    def edit_node(self, node_id:str) -> StreamlitFlowNode:
+        """
+        Get a node to modify in place. A node shared with other sessions (see SharedGraph) is first replaced by a private copy.
+        """
+        return self.edit_nodes([node_id])[0]
+
+    def edit_nodes(self, node_ids:List[str]) -> List[StreamlitFlowNode]:
+        """
+        Get nodes to modify in place, in the order of the ids. See edit_node.
+        """
+        nodes = [self.get_node(node_id) for node_id in node_ids]
+        for node_id, node in zip(node_ids, nodes):
+            assert node is not None, f"No node with the id {node_id}"
+        return self._writable('nodes', nodes)
+
+    def edit_edge(self, edge_id:str) -> StreamlitFlowEdge:
+        """
+        Get an edge to modify in place. An edge shared with other sessions (see SharedGraph) is first replaced by a private copy.
+        """
+        edge = self.get_edge(edge_id)
+        assert edge is not None, f"No edge with the id {edge_id}"
+        return self._writable('edges', [edge])[0]
+
+    def _writable(self, kind:str, elements:list) -> list:
+
+        # Handed out to be modified, so their content changes from now on as far as the state knows
+        self._changed()
+        self._content_changed(kind, [element.id for element in elements])
+
+        base = self._base
+        if base is None:
+            return elements
+        shared = [element for element in elements if base.is_shared(element)]
+        if not shared:
+            return elements
+
+        copies = {}
+        element_list = self.nodes if kind == 'nodes' else self.edges
+        if len(shared) == 1:
+            positions = [element_list.index(shared[0])]
+        else:
+            shared_ids = set(map(id, shared))
+            positions = [i for i, element in enumerate(element_list) if id(element) in shared_ids]
+        for i in positions:
+            element = element_list[i]
+            copies[id(element)] = element_list[i] = base.private_copy(kind, element)
+        return [copies.get(id(element), element) for element in elements]
+
+    def nodes_in_rect(self, x0:float, y0:float, x1:float, y1:float) -> List[StreamlitFlowNode]:
+        """
+        Get the nodes whose box (position and estimated size) intersects a rectangle of the canvas. Only the
+        cells of the spatial grid under the rectangle are visited, so the cost depends on the area, not the graph.
+
+        Arguments
+        - **x0**, **y0** : float : The top left corner of the rectangle, in canvas coordinates.
+        - **x1**, **y1** : float : The bottom right corner of the rectangle.
+        """
+        return self._get_spatial_index().query(x0, y0, x1, y1)
+
+    def reindex_positions(self, node_ids:Optional[List[str]]=None) -> None:
+        """
+        Update the spatial index after nodes were moved or resized in place, and count them as changed (see changed_since).
+
+        Arguments
+        - **node_ids** : List[str]? : The ids of the nodes that changed. All of them if None.
+        """
+        self._changed()
+        self._content_changed('nodes', [node.id for node in self.nodes] if node_ids is None else node_ids)
+        if self._spatial_index is None:
+            return
+        if node_ids is None:
+            object.__setattr__(self, '_spatial_index', None)
+            return
+        for node_id in node_ids:
+            node = self.get_node(node_id)
+            if node is not None:
+                self._spatial_index.add(node)
+
+    @property
+    def version(self) -> int:
+        """
+        A number that increases with every change of the nodes and edges. Read it after using the state, and pass
+        it to changed_since on the next run.
+        """
+        return self._version
+
+    def changed_since(self, version:int) -> Tuple[Set[str], Set[str]]:
+        """
+        The ids of the nodes and edges added, changed or removed after a version of the state, eg. to update
+        derived data for the new edges only:
+
+            new_edge_ids = state.changed_since(st.session_state.seen_version)[1]
+            ...
+            st.session_state.seen_version = state.version
+
+        The cost depends on the number of elements changed, not on the size of the graph. If the lists were
+        replaced after the version (the state was created or unpickled since, eg. a new import), all the current
+        ids are returned.
+
+        Arguments
+        - **version** : int : A previous value of `version`.
+
+        Returns the ids of the nodes, and the ids of the edges.
+        """
+        if version < self._tracked_since or version > self._version:
+            return {node.id for node in self.nodes}, {edge.id for edge in self.edges}
+        return tuple({element_id for element_id, changed in self._changes[kind].items() if changed > version}
+                     for kind in ('nodes', 'edges'))
+
+    def fingerprint(self) -> str:
+        """
+        Stable hash of the content of the nodes and edges, whatever their order. Equal graphs have equal
+        fingerprints, across sessions and processes. The fingerprints of the elements are kept, so only the ones
+        that changed since the last call are hashed again. Use it as the key of computations derived from the graph:
+
+            @st.cache_data
+            def lineage_report(graph_fingerprint, _state):
+                ...
+
+            lineage_report(state.fingerprint(), state)
+        """
+        return self._get_fingerprints().digest()
+
+    def _get_fingerprints(self) -> '_Fingerprints':
+        # Up to date fingerprints of the elements, eg. for the patches of sync.py
+        if self._fingerprints is None:
+            if self._base is None:
+                fingerprints = _Fingerprints.of(self.nodes, self.edges)
+            else:
+                # Layered over the fingerprints of the shared graph, like the indexes
+                fingerprints = _Fingerprints(self._base._fingerprints)
+                for kind in ('nodes', 'edges'):
+                    removed, added = self._base_changes(kind)
+                    fingerprints.invalidate(kind, [element.id for element in removed + added])
+            object.__setattr__(self, '_fingerprints', fingerprints)
+        self._fingerprints.refresh(self)
+        return self._fingerprints
+
+    def _notice_changes(self, kind:str, fingerprints:Dict[str, str]) -> None:
+        # Elements hashed afresh (eg. for the patches of sync.py) whose fingerprint is not the one kept were modified
+        # in place without edit_node / edit_edge: count them as changed from now on
+        kept = self._get_fingerprints().fingerprints[kind]
+        changed = [element_id for element_id, element_fingerprint in fingerprints.items()
+                   if kept.get(element_id, element_fingerprint) != element_fingerprint]
+        if changed:
+            self._changed()
+            self._content_changed(kind, changed)
+
+    def collapse(self, group_id:str) -> None:
+        """
+        Collapse a group: only the group is drawn, with summary edges in place of the edges of its contents.
+        """
+        group = self.edit_node(group_id)
+        group.collapsed = True
+        self.reindex_positions([group_id])
+
+    def expand(self, group_id:str, layout:'Layout'=None) -> None:
+        """
+        Expand a collapsed group, so that its contents are sent to the frontend on the next streamlit_flow() call.
+
+        Arguments
+        - **group_id** : str : The id of the group.
+        - **layout** : Layout? : Lays out the nodes directly in the group with this layout and sizes the group to fit them. Keeps their positions if None.
+        """
+        from .groups import layout_group
+
+        group = self.edit_node(group_id)
+        group.collapsed = False
+        if layout is not None:
+            layout_group(self, group_id, layout)
+        self.reindex_positions([group_id])
 
     def asdict(self):
         return {
@@ -25,4 +380,523 @@ class StreamlitFlowState:
             'edges': [edge.asdict() for edge in self.edges],
             'selected_id': self.selected_id,
             'timestamp': self.timestamp
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def from_frames(cls, nodes_df:'pd.DataFrame', edges_df:'pd.DataFrame'=None, column_map:Dict[str, Dict[str, str]]=None) -> 'StreamlitFlowState':
+        """
+        Build a state from frames with one node or edge per row, without creating one element object per row:
+        each column is validated at once, and stored in a NodeStore and an EdgeStore.
+
+        Arguments
+        - **nodes_df** : pd.DataFrame : The nodes. Requires an 'id' column; 'x', 'y', 'type', 'source_position', 'target_position',
+          the boolean attributes of StreamlitFlowNode, 'z_index', 'style', 'data' and 'kwargs' (dicts) are optional and take the
+          defaults of StreamlitFlowNode. Any other column is added to the data of the nodes, eg. 'content'.
+        - **edges_df** : pd.DataFrame? : The edges. Requires 'source' and 'target' columns with node ids; the other attributes of
+          StreamlitFlowEdge are optional, including 'id'. Any other column is added to the data of the edges.
+        - **column_map** : Dict[str, Dict[str, str]]? : Column names that differ from the attribute names, per frame.
+          Eg: {'nodes': {'id': 'table_name'}, 'edges': {'source': 'upstream', 'target': 'downstream'}}
+
+        Anything a DataFrame can be built from is accepted as well, eg. a dict of NumPy arrays.
+        Raises an AssertionError naming the first invalid rows of a column.
+        """
+        from .frames import stores_from_frames
+
+        node_store, edge_store = stores_from_frames(nodes_df, edges_df, column_map)
+        return cls(node_store.views(), edge_store.views())
+
+    def to_frames(self) -> Tuple['pd.DataFrame', 'pd.DataFrame']:
+        """
+        The nodes and edges as frames, with one column per attribute as read by from_frames. Data, styles and
+        kwargs stay dicts, in 'data', 'style' and 'kwargs' columns. States built by from_frames are read column-wise.
+        """
+        from .frames import nodes_to_frame, edges_to_frame
+
+        return nodes_to_frame(self.nodes), edges_to_frame(self.edges)
+
+    def apply_patch(self, patch:Dict[str, any]) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge]]:
+        """
+        Apply a patch sent by the frontend to the state in place.
+
+        Arguments
+        - **patch** : Dict[str, any] : The patch, with the keys 'nodes' and 'edges' (element dicts to add or replace), 'removedNodes' and 'removedEdges' (ids to remove) and 'full' (whether the patch replaces the whole graph).
+
+        Returns the nodes and edges that were added or replaced.
+        """
+
+        new_nodes = [StreamlitFlowNode.from_dict(node) for node in patch.get('nodes', [])]
+        new_edges = [StreamlitFlowEdge.from_dict(edge) for edge in patch.get('edges', [])]
+
+        if patch.get('full', False):
+            self.nodes[:] = new_nodes
+            self.edges[:] = new_edges
+        else:
+            _apply_element_patch(self.nodes, new_nodes, patch.get('removedNodes', []))
+            _apply_element_patch(self.edges, new_edges, patch.get('removedEdges', []))
+
+        return new_nodes, new_edges
+
+    def apply_events(self, events:List[Dict[str, any]]) -> Tuple[List[StreamlitFlowNode], List[StreamlitFlowEdge], List[str], List[str]]:
+        """
+        Apply typed events sent by the frontend to the state in place. Existing elements are updated rather than rebuilt.
+
+        Arguments
+        - **events** : List[Dict[str, any]] : The events, each with a 'type' among node_moved ('id', 'position'),
+          node_created ('node'), node_updated ('id', 'changes'), node_deleted ('id') and the same for edges
+          (edge_created, edge_updated, edge_deleted). Selection events (node_selected, edge_selected,
+          selection_cleared) leave the graph as is.
+
+        Returns the nodes and edges that were added or changed, and the ids of the nodes and edges removed.
+        """
+
+        changed_nodes = {}
+        changed_edges = {}
+        created = {'node': [], 'edge': []}
+        removed = {'node': [], 'edge': []}
+
+        for event in events:
+            kind, _, action = event['type'].partition('_')
+            if kind not in ('node', 'edge') or action not in ('moved', 'created', 'updated', 'deleted'):
+                continue
+            changed = changed_nodes if kind == 'node' else changed_edges
+
+            if action == 'created':
+                element_class = StreamlitFlowNode if kind == 'node' else StreamlitFlowEdge
+                element = element_class.from_dict(event[kind])
+                created[kind].append(element)
+                changed[element.id] = element
+            elif action == 'deleted':
+                removed[kind].append(event['id'])
+                changed.pop(event['id'], None)
+            else:
+                element = self.get_node(event['id']) if kind == 'node' else self.get_edge(event['id'])
+                if element is None:
+                    continue
+                element = self._writable(kind + 's', [element])[0]
+                changes = {'position': event['position']} if action == 'moved' else event['changes']
+                if kind == 'node' or 'source' in changes or 'target' in changes:
+                    # Nodes are indexed by their box, edges by their endpoints
+                    self._element_removed(kind + 's', element)
+                    element.update_from_dict(changes)
+                    self._element_added(kind + 's', element)
+                    if kind == 'edge':
+                        self._topology_changed()
+                else:
+                    element.update_from_dict(changes)
+                changed[element.id] = element
+
+        _apply_element_patch(self.nodes, created['node'], removed['node'])
+        _apply_element_patch(self.edges, created['edge'], removed['edge'])
+
+        return list(changed_nodes.values()), list(changed_edges.values()), removed['node'], removed['edge']
+
+
+def _apply_element_patch(elements:list, upserted:list, removed_ids:List[str]) -> None:
+
+    if removed_ids:
+        removed_ids = set(removed_ids)
+        elements[:] = [element for element in elements if element.id not in removed_ids]
+
+    if upserted:
+        positions = {element.id: i for i, element in enumerate(elements)}
+        for element in upserted:
+            if element.id in positions:
+                elements[positions[element.id]] = element
+            else:
+                positions[element.id] = len(elements)
+                elements.append(element)
+
+
+_MISSING = object()
+
+
+class _Fingerprints:
+
+    """
+    The fingerprints of the elements of a state, and their sum per kind, which is its digest whatever the order
+    of the elements. Invalidated elements are hashed again, and their sum updated, on the next digest.
+    """
+
+    __slots__ = ('fingerprints', 'sums', 'stale')
+
+    def __init__(self, base:'_Fingerprints'=None) -> None:
+        if base is None:
+            self.fingerprints = {'nodes': {}, 'edges': {}}
+            self.sums = {'nodes': 0, 'edges': 0}
+        else:
+            self.fingerprints = {kind: _LayeredMap(base.fingerprints[kind]) for kind in ('nodes', 'edges')}
+            self.sums = dict(base.sums)
+        self.stale = {'nodes': set(), 'edges': set()}
+
+    @classmethod
+    def of(cls, nodes:List[StreamlitFlowNode], edges:List[StreamlitFlowEdge]) -> '_Fingerprints':
+        fingerprints = cls()
+        for kind, elements in (('nodes', nodes), ('edges', edges)):
+            for element in elements:
+                fingerprints._add(kind, element)
+        return fingerprints
+
+    def invalidate(self, kind:str, element_ids) -> None:
+        fingerprints = self.fingerprints[kind]
+        stale = self.stale[kind]
+        for element_id in element_ids:
+            previous = fingerprints.pop(element_id, None)
+            if previous is not None:
+                self.sums[kind] = (self.sums[kind] - int(previous, 16)) % _FINGERPRINT_MODULO
+            stale.add(element_id)
+
+    def _add(self, kind:str, element:any) -> None:
+        element_fingerprint = element.fingerprint()
+        self.fingerprints[kind][element.id] = element_fingerprint
+        self.sums[kind] = (self.sums[kind] + int(element_fingerprint, 16)) % _FINGERPRINT_MODULO
+
+    def refresh(self, state:StreamlitFlowState) -> None:
+        for kind, get in (('nodes', state.get_node), ('edges', state.get_edge)):
+            fingerprints = self.fingerprints[kind]
+            for element_id in self.stale[kind]:
+                element = get(element_id)
+                if element is not None and element_id not in fingerprints:
+                    self._add(kind, element)
+            self.stale[kind].clear()
+
+    def digest(self) -> str:
+        return f"{self.sums['nodes']:016x}{self.sums['edges']:016x}"
+
+
+# Element fingerprints are 64 bit
+_FINGERPRINT_MODULO = 1 << 64
+
+
+class _GraphIndex:
+
+    """
+    Id indexes and adjacency maps of a state. Adjacency maps go from a node id to the edges
+    touching it, keyed by edge id so that removals are O(1).
+
+    An index built over a base index (the one of a SharedGraph) reads through to it and keeps its own
+    changes only, leaving the base as is.
+    """
+
+    def __init__(self, nodes:List[StreamlitFlowNode], edges:List[StreamlitFlowEdge], base:'_GraphIndex'=None) -> None:
+        if base is None:
+            self.nodes = {}
+            self.edges = {}
+            self.edge_ends = {}
+            self.outgoing = {}
+            self.incoming = {}
+        else:
+            self.nodes = _LayeredMap(base.nodes)
+            self.edges = _LayeredMap(base.edges)
+            self.edge_ends = _LayeredMap(base.edge_ends)
+            self.outgoing = _LayeredMap(base.outgoing)
+            self.incoming = _LayeredMap(base.incoming)
+
+        for node in nodes:
+            self.nodes[node.id] = node
+        for edge in edges:
+            self.add('edges', edge)
+
+    def add(self, kind:str, element:any) -> None:
+        if kind == 'nodes':
+            self.nodes[element.id] = element
+            return
+
+        if element.id in self.edges:
+            self.remove('edges', self.edges[element.id])
+        self.edges[element.id] = element
+        self.edge_ends[element.id] = (element.source, element.target)
+        _entry(self.outgoing, element.source)[element.id] = element
+        _entry(self.incoming, element.target)[element.id] = element
+
+    def remove(self, kind:str, element:any) -> None:
+        if kind == 'nodes':
+            if self.nodes.get(element.id) is element:
+                del self.nodes[element.id]
+            return
+
+        if self.edges.get(element.id) is not element:
+            return
+        del self.edges[element.id]
+        source, target = self.edge_ends.pop(element.id)
+        _discard(self.outgoing, source, element.id)
+        _discard(self.incoming, target, element.id)
+
+
+def _entry(mapping:Dict[any, dict], key:any) -> dict:
+    # The inner dict of a key, to modify. Those of a base index are copied first.
+    inner = mapping.get(key)
+    if inner is None:
+        inner = mapping[key] = {}
+    elif isinstance(mapping, _LayeredMap) and not mapping.owns(key):
+        inner = mapping[key] = dict(inner)
+    return inner
+
+
+def _discard(mapping:Dict[any, dict], key:any, inner_key:any) -> None:
+    inner = mapping.get(key)
+    if inner is not None and inner_key in inner:
+        inner = _entry(mapping, key)
+        del inner[inner_key]
+        if not inner:
+            del mapping[key]
+
+
+class _LayeredMap:
+
+    """
+    Dict over a base dict that is never modified: writes and deletions are kept apart, reads go through to the base.
+    """
+
+    __slots__ = ('base', 'local', 'hidden')
+
+    def __init__(self, base:dict) -> None:
+        self.base = base
+        self.local = {}
+        self.hidden = set()
+
+    def owns(self, key:any) -> bool:
+        return key in self.local
+
+    def get(self, key:any, default:any=None) -> any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if key in self.hidden:
+            return default
+        return self.base.get(key, default)
+
+    def __getitem__(self, key:any) -> any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key:any) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key:any, value:any) -> None:
+        self.local[key] = value
+
+    def __delitem__(self, key:any) -> None:
+        if key not in self:
+            raise KeyError(key)
+        self.local.pop(key, None)
+        if key in self.base:
+            self.hidden.add(key)
+
+    def pop(self, key:any, default:any=_MISSING) -> any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            if default is _MISSING:
+                raise KeyError(key)
+            return default
+        del self[key]
+        return value
+
+    def __iter__(self):
+        for key in self.local:
+            yield key
+        for key in self.base:
+            if key not in self.local and key not in self.hidden:
+                yield key
+
+    def __len__(self) -> int:
+        local_only = sum(1 for key in self.local if key not in self.base)
+        return len(self.base) + local_only - sum(1 for key in self.hidden if key not in self.local)
+
+
+class _SpatialIndex:
+
+    """
+    Uniform grid over the boxes of the nodes, from their position and estimated size. Each cell maps the ids
+    of the nodes overlapping it to the nodes. Queries check the current position of the nodes they find, and
+    move the ones that changed since they were indexed. Like _GraphIndex, it can be built over a base index.
+
+    The bounds (x0, y0, x1, y1) of the boxes only grow: after nodes are removed or moved, they may be wider
+    than the drawing.
+    """
+
+    def __init__(self, nodes:List[StreamlitFlowNode], cell_size:float=512, base:'_SpatialIndex'=None) -> None:
+        self.cell_size = cell_size if base is None else base.cell_size
+        self.cells = {} if base is None else _LayeredMap(base.cells)
+        self.boxes = {} if base is None else _LayeredMap(base.boxes)
+        self.bounds = None if base is None or base.bounds is None else list(base.bounds)
+
+        for node in nodes:
+            self.add(node)
+
+    def _cell_range(self, x0:float, y0:float, x1:float, y1:float) -> Tuple[int, int, int, int]:
+        c = self.cell_size
+        return math.floor(x0 / c), math.floor(y0 / c), math.floor(x1 / c), math.floor(y1 / c)
+
+    def _cells(self, x0:float, y0:float, x1:float, y1:float):
+        i0, j0, i1, j1 = self._cell_range(x0, y0, x1, y1)
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                yield i, j
+
+    def add(self, node:StreamlitFlowNode) -> None:
+        if node.id in self.boxes:
+            self.remove(self.boxes[node.id][1])
+        width, height = estimate_node_size(node)
+        x, y = node.position['x'], node.position['y']
+        box = (x, y, x + width, y + height)
+        self.boxes[node.id] = (box, node)
+        for cell in self._cells(*box):
+            _entry(self.cells, cell)[node.id] = node
+        if self.bounds is None:
+            self.bounds = list(box)
+        else:
+            self.bounds = [min(self.bounds[0], box[0]), min(self.bounds[1], box[1]), max(self.bounds[2], box[2]), max(self.bounds[3], box[3])]
+
+    def remove(self, node:StreamlitFlowNode) -> None:
+        entry = self.boxes.get(node.id)
+        if entry is None or entry[1] is not node:
+            return
+        del self.boxes[node.id]
+        for cell in self._cells(*entry[0]):
+            _discard(self.cells, cell, node.id)
+
+    def query(self, x0:float, y0:float, x1:float, y1:float) -> List[StreamlitFlowNode]:
+        i0, j0, i1, j1 = self._cell_range(x0, y0, x1, y1)
+        if (i1 - i0 + 1) * (j1 - j0 + 1) > len(self.cells):
+            # Zoomed out past the drawing, the occupied cells are fewer than the ones under the rectangle
+            cells = [cell for cell in self.cells if i0 <= cell[0] <= i1 and j0 <= cell[1] <= j1]
+        else:
+            cells = self._cells(x0, y0, x1, y1)
+
+        found = {}
+        moved = []
+        for cell in cells:
+            for node_id, node in self.cells.get(cell, {}).items():
+                if node_id in found:
+                    continue
+                (bx0, by0, bx1, by1), _ = self.boxes[node_id]
+                x, y = node.position['x'], node.position['y']
+                if x != bx0 or y != by0:
+                    moved.append(node)
+                    bx0, by0, bx1, by1 = x, y, x + bx1 - bx0, y + by1 - by0
+                if bx0 <= x1 and x0 <= bx1 and by0 <= y1 and y0 <= by1:
+                    found[node_id] = node
+
+        for node in moved:
+            self.add(node)
+        return list(found.values())
+
+
+class _ElementList(list):
+
+    """
+    List of nodes or edges that keeps the indexes of its state up to date. Additions and removals,
+    slices included, update the indexes incrementally, anything else drops them for a lazy rebuild.
+    """
+
+    __slots__ = ('_state', '_kind')
+
+    def __init__(self, state:StreamlitFlowState, kind:str, elements) -> None:
+        super().__init__(elements)
+        self._state = state
+        self._kind = kind
+
+    def __reduce_ex__(self, protocol):
+        # Pickle and copy as a plain list, the state wraps it again on assignment
+        return (list, (list(self),))
+
+    def _added(self, element) -> None:
+        self._state._element_added(self._kind, element)
+        self._state._topology_changed()
+
+    def _removed(self, element) -> None:
+        self._state._element_removed(self._kind, element)
+        self._state._topology_changed()
+
+    def _invalidate(self) -> None:
+        self._state._invalidate_index()
+
+    def _replaced(self, old:list, new:list) -> None:
+        # Elements are told apart by identity, those kept (even if moved in the list) are left as is
+        self._state._topology_changed()
+        kept = {id(element) for element in new}
+        for element in old:
+            if id(element) not in kept:
+                self._removed(element)
+        previous = {id(element) for element in old}
+        for element in new:
+            if id(element) not in previous:
+                self._added(element)
+
+    def append(self, element) -> None:
+        super().append(element)
+        self._added(element)
+
+    def extend(self, elements) -> None:
+        elements = list(elements)
+        super().extend(elements)
+        for element in elements:
+            self._added(element)
+
+    def __iadd__(self, elements):
+        self.extend(elements)
+        return self
+
+    def insert(self, i:int, element) -> None:
+        super().insert(i, element)
+        self._added(element)
+
+    def pop(self, i:int=-1):
+        element = super().pop(i)
+        self._removed(element)
+        return element
+
+    def remove(self, element) -> None:
+        super().remove(element)
+        self._removed(element)
+
+    def clear(self) -> None:
+        old = list(self)
+        super().clear()
+        self._replaced(old, [])
+
+    def __setitem__(self, i, value) -> None:
+        if isinstance(i, slice):
+            old = self[i]
+            value = list(value)
+            super().__setitem__(i, value)
+            self._replaced(old, value)
+            return
+        old = self[i]
+        super().__setitem__(i, value)
+        self._state._element_removed(self._kind, old)
+        self._state._element_added(self._kind, value)
+        if _structure(self._kind, old) != _structure(self._kind, value):
+            self._state._topology_changed()
+
+    def __delitem__(self, i) -> None:
+        if isinstance(i, slice):
+            old = self[i]
+            super().__delitem__(i)
+            self._replaced(old, [])
+            return
+        element = self[i]
+        super().__delitem__(i)
+        self._removed(element)
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._state._topology_changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._state._topology_changed()
+
+    def __imul__(self, n:int):
+        super().__imul__(n)
+        self._invalidate()
+        return self
+
+
+def _structure(kind:str, element:any) -> tuple:
+    # What the structure of the graph depends on: the id of a node, the id and ends of an edge
+    if kind == 'nodes':
+        return (element.id,)
+    return (element.id, element.source, element.target)
@@ -0,0 +1,284 @@
+import hashlib
+import json
+from typing import Dict, List, Optional, Set, Tuple
+
+from .bundles import bundle_edges, is_bundle_edge
+from .changes import FlowChanges, MessageDiff
+from .elements import fingerprint
+from .groups import visible_elements, is_summary_edge
+from .state import StreamlitFlowState
+
+
+class SyncRecord:
+    """
+    Python-side bookkeeping of the delta sync protocol for one streamlit_flow component.
+
+    The frontend versions every message it sends. Python remembers the version of the last message
+    it applied, and the fingerprint of every element the frontend is known to hold. Each rerun only
+    the elements whose fingerprint differs are sent, as a patch based on that version. Patches are
+    identified by a hash of their content, so resending an unchanged patch on a rerun is a no-op. Every element is
+    hashed again on each rerun, so elements modified in place (eg. node.data['content'] = ...) are sent as well.
+
+    In the events return mode, the frontend describes its changes as typed events (node_moved, edge_created...)
+    instead of whole elements. Like patches, the events of a message cover everything Python has not confirmed yet.
+
+    With lazy loading, the frontend only holds the elements in a window around its viewport. Patches then diff
+    that window, and the elements that left it are evicted from the frontend without being removed from the state.
+
+    The contents of collapsed groups are never sent, and the summary edges drawn in their place are ignored when
+    the frontend sends them back (see groups.py). So are the bundle edges drawn in place of parallel edges when
+    they are aggregated (see bundles.py).
+
+    Attributes
+    - **frontend_version** : int? : Version of the last frontend message applied.
+    - **acked_nodes** : Dict[str, str] : Fingerprints of the nodes the frontend holds, by id.
+    - **acked_edges** : Dict[str, str] : Fingerprints of the edges the frontend holds, by id.
+    - **pending** : dict? : The last patch sent and not yet acknowledged.
+    - **full** : bool : Whether the next patch must carry the whole graph.
+    - **request_full** : bool : Whether Python needs the frontend to send its whole graph.
+    - **window** : Tuple[float, float, float, float]? : The region of the canvas the last patch was built for, with lazy loading.
+    - **collapsed_groups** : Set[str] : The groups that were collapsed when the last patch was built.
+    - **expanded_bundles** : Set[str] : The ids of the bundles of parallel edges the frontend expanded.
+    - **bundled** : bool : Whether the last patch drew parallel edges as bundles.
+    - **changes** : FlowChanges : What the last message applied changed in the state, see changes.py.
+    """
+
+    def __init__(self) -> None:
+        self.frontend_version = None
+        self.acked_nodes = {}
+        self.acked_edges = {}
+        self.pending = None
+        self.full = True
+        self.request_full = False
+        self.window = None
+        self.collapsed_groups = set()
+        self.expanded_bundles = set()
+        self.bundled = False
+        self.changes = FlowChanges()
+
+    def reset(self) -> None:
+        self.acked_nodes = {}
+        self.acked_edges = {}
+        self.pending = None
+        self.full = True
+
+    def receive(self, state:StreamlitFlowState, message:Optional[Dict[str, any]]) -> bool:
+        """
+        Apply a message from the frontend to the state in place.
+
+        Arguments
+        - **state** : StreamlitFlowState : The state to update.
+        - **message** : dict? : The component value returned by the frontend.
+
+        Returns whether the message was new and applied. What it changed is then set as `changes`.
+        """
+
+        self.changes = FlowChanges()
+        if message is None or 'version' not in message:
+            return False
+
+        if self.frontend_version is not None and message['version'] <= self.frontend_version:
+            return False
+
+        if message.get('resync', False):
+            self.reset()
+            self.frontend_version = message['version']
+            return True
+
+        if not message.get('full', False) and not _is_applied(message.get('baseVersion'), self.frontend_version):
+            # The frontend diffs against a version we never applied (e.g. the session was reset), so ask for everything
+            self.request_full = True
+            self.frontend_version = message['version']
+            return False
+
+        self._acknowledge(message.get('ack'))
+        message = _without_view_edges(message)
+
+        if 'viewport' in message:
+            state.viewport = message['viewport']
+        if 'expandedBundles' in message:
+            self.expanded_bundles = set(message['expandedBundles'])
+
+        # The frontend only holds a window of the graph, its expanded groups or bundles, which do not replace the rest of it
+        upsert = 'viewport' in message or bool(self.collapsed_groups) or self.bundled
+        diff = MessageDiff(state, message, replace=message.get('full', False) and not upsert and 'events' not in message)
+
+        if 'events' in message:
+            new_nodes, new_edges, removed_nodes, removed_edges = state.apply_events(message['events'])
+        elif message.get('full', False) and upsert:
+            new_nodes, new_edges = state.apply_patch({'nodes': message.get('nodes', []), 'edges': message.get('edges', [])})
+            removed_nodes, removed_edges = [], []
+        else:
+            new_nodes, new_edges = state.apply_patch(message)
+            removed_nodes, removed_edges = message.get('removedNodes', []), message.get('removedEdges', [])
+        if message.get('full', False):
+            self.acked_nodes = {}
+            self.acked_edges = {}
+            self.pending = None
+            self.full = False
+            self.request_full = False
+        for node_id in removed_nodes:
+            self.acked_nodes.pop(node_id, None)
+        for edge_id in removed_edges:
+            self.acked_edges.pop(edge_id, None)
+        for node in new_nodes:
+            self.acked_nodes[node.id] = fingerprint(node.asdict())
+        for edge in new_edges:
+            self.acked_edges[edge.id] = fingerprint(edge.asdict())
+
+        state.selected_id = message.get('selectedId')
+        state.timestamp = message.get('timestamp', state.timestamp)
+        self.frontend_version = message['version']
+        self.changes = diff.changes(state)
+        return True
+
+    def _acknowledge(self, patch_id:Optional[str]) -> None:
+
+        if self.pending is None or patch_id != self.pending['id']:
+            return
+
+        if self.pending['full']:
+            self.acked_nodes = dict(self.pending['nodes'])
+            self.acked_edges = dict(self.pending['edges'])
+            self.full = False
+        else:
+            self.acked_nodes.update(self.pending['nodes'])
+            self.acked_edges.update(self.pending['edges'])
+            for node_id in self.pending['removedNodes'] + self.pending['evictedNodes']:
+                self.acked_nodes.pop(node_id, None)
+            for edge_id in self.pending['removedEdges'] + self.pending['evictedEdges']:
+                self.acked_edges.pop(edge_id, None)
+        self.pending = None
+
+    def build_patch(self, state:StreamlitFlowState, window:Optional[Tuple[float, float, float, float]]=None, aggregate_edges:bool=False) -> Optional[Dict[str, any]]:
+        """
+        Compute the patch that brings the frontend up to date with the state.
+
+        Arguments
+        - **state** : StreamlitFlowState : The state to send.
+        - **window** : Tuple[float, float, float, float]? : With lazy loading, the region of the canvas (x0, y0, x1, y1) the frontend
+          should hold. Only the nodes in it, the edges touching them and the nodes at the other end of those edges are sent.
+        - **aggregate_edges** : bool : Whether to send parallel edges as one bundle edge, see bundles.py.
+
+        Returns the patch, or None when the frontend already holds the state.
+        """
+
+        self.window = window
+        if self.request_full:
+            # Wait for the frontend to send its graph before pushing anything
+            self.pending = None
+            return None
+
+        nodes, edges = (state.nodes, state.edges) if window is None else _window_elements(state, window)
+        nodes, edges, self.collapsed_groups = visible_elements(state, nodes, edges)
+        self.bundled = False
+        if aggregate_edges:
+            edges, bundles = bundle_edges(edges, self.expanded_bundles)
+            self.bundled = bundles > 0
+        node_dicts, node_fps, removed_nodes = _diff_elements(state, 'nodes', nodes, self.acked_nodes, self.full)
+        edge_dicts, edge_fps, removed_edges = _diff_elements(state, 'edges', edges, self.acked_edges, self.full)
+
+        evicted_nodes, evicted_edges = [], []
+        if window is not None:
+            # Elements outside the window are still in the state
+            evicted_nodes = [node_id for node_id in removed_nodes if state.get_node(node_id) is not None]
+            evicted_edges = [edge_id for edge_id in removed_edges if state.get_edge(edge_id) is not None]
+            removed_nodes = [node_id for node_id in removed_nodes if state.get_node(node_id) is None]
+            removed_edges = [edge_id for edge_id in removed_edges if state.get_edge(edge_id) is None]
+
+        if not (self.full or node_dicts or edge_dicts or removed_nodes or removed_edges or evicted_nodes or evicted_edges):
+            self.pending = None
+            return None
+
+        patch_hash = hashlib.blake2b(digest_size=8)
+        patch_hash.update(json.dumps([self.frontend_version, self.full, node_fps, edge_fps, removed_nodes, removed_edges,
+                                      evicted_nodes, evicted_edges], sort_keys=True).encode())
+
+        self.pending = {
+            'id': patch_hash.hexdigest(),
+            'full': self.full,
+            'nodes': node_fps,
+            'edges': edge_fps,
+            'removedNodes': removed_nodes,
+            'removedEdges': removed_edges,
+            'evictedNodes': evicted_nodes,
+            'evictedEdges': evicted_edges,
+        }
+
+        return {
+            'id': self.pending['id'],
+            'baseVersion': self.frontend_version,
+            'full': self.full,
+            'nodes': node_dicts,
+            'edges': edge_dicts,
+            'removedNodes': removed_nodes,
+            'removedEdges': removed_edges,
+            'evictedNodes': evicted_nodes,
+            'evictedEdges': evicted_edges,
+        }
+
+
+def _is_view_edge(edge_id:str) -> bool:
+    # Edges drawn by the frontend in place of edges of the state
+    return is_summary_edge(edge_id) or is_bundle_edge(edge_id)
+
+
+def _without_view_edges(message:Dict[str, any]) -> Dict[str, any]:
+
+    if not any(_is_view_edge(edge['id']) for edge in message.get('edges', [])) and \
+       not any(_is_view_edge(edge_id) for edge_id in message.get('removedEdges', [])):
+        return message
+    return {**message,
+            'edges': [edge for edge in message['edges'] if not _is_view_edge(edge['id'])],
+            'removedEdges': [edge_id for edge_id in message.get('removedEdges', []) if not _is_view_edge(edge_id)]}
+
+
+def _window_elements(state:StreamlitFlowState, window:Tuple[float, float, float, float]) -> Tuple[List[any], List[any]]:
+
+    nodes = {node.id: node for node in state.nodes_in_rect(*window)}
+    edges = {}
+    for node_id in list(nodes):
+        for edge in state.edges_of(node_id):
+            edges[edge.id] = edge
+
+    # Edges leaving the window are drawn up to the node at their other end
+    for edge in edges.values():
+        for node_id in (edge.source, edge.target):
+            if node_id not in nodes:
+                node = state.get_node(node_id)
+                if node is not None:
+                    nodes[node_id] = node
+    return list(nodes.values()), list(edges.values())
+
+
+def _is_applied(base_version:Optional[int], applied_version:Optional[int]) -> bool:
+    # Frontend messages are cumulative diffs, so they apply on top of any version at least as recent as their base
+    if base_version is None:
+        return True
+    return applied_version is not None and base_version <= applied_version
+
+
+def _diff_elements(state:StreamlitFlowState, kind:str, elements:list, acked:Dict[str, str], full:bool):
+
+    dicts = []
+    fps = {}
+    # Every element is hashed, so that elements modified in place are sent too. The state is told about those
+    # it did not know changed (see StreamlitFlowState.changed_since), elements drawn in place of others aside.
+    get = state.get_node if kind == 'nodes' else state.get_edge
+    state_fps = {}
+    for element in elements:
+        element_dict = element.asdict()
+        fp = fingerprint(element_dict)
+        if get(element.id) is element:
+            state_fps[element.id] = fp
+        if full or acked.get(element.id) != fp:
+            dicts.append(element_dict)
+            fps[element.id] = fp
+    state._notice_changes(kind, state_fps)
+
+    if full:
+        return dicts, fps, []
+
+    current_ids = set(element.id for element in elements)
+    removed = [element_id for element_id in acked if element_id not in current_ids]
+    return dicts, fps, removed
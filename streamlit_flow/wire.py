@@ -0,0 +1,127 @@
+import json
+from typing import Dict, List, Tuple
+
+from .store import _NODE_FLAGS
+
+# Node keys sent as typed columns rather than in the JSON of the row
+_NODE_COLUMN_KEYS = frozenset(['id', 'position', 'type', 'sourcePosition', 'targetPosition', 'zIndex', 'style', *_NODE_FLAGS])
+
+
+def _size(value:any) -> float:
+    # Numeric sizes go in the width and height columns, NaN (null in Arrow) standing for 'auto'
+    if value == 'auto':
+        return float('nan')
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    return None
+
+
+def _content(value:any) -> str:
+    # The content column is a string column, which Arrow cannot build from values of mixed types
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def _numbers(np:any, values:'np.ndarray') -> 'np.ndarray':
+    # Integral values, as most positions are, take half the bytes as int32
+    if np.all(np.isfinite(values)) and np.all(values == np.round(values)) and np.all(np.abs(values) < 2 ** 31):
+        return values.astype(np.int32)
+    return values
+
+
+def encode_nodes(nodes:List[Dict[str, any]]) -> 'pd.DataFrame':
+    """
+    Encode serialized nodes (see StreamlitFlowNode.asdict) as a frame of typed columns, which Streamlit sends to
+    the frontend as an Arrow table instead of JSON, and which sync.js decodes into React Flow nodes.
+
+    Positions and z-indexes are number columns (int32 when integral), sizes float64 columns with null for 'auto',
+    types and handle positions dictionary-encoded strings, the boolean attributes one bit each of a 'flags' column
+    in the order of _NODE_FLAGS, and the content a string column (non-string contents as str). Everything else (the rest of the data and style,
+    extra attributes) is in 'rest', the JSON of the keys that have a value, '' if none. Empty column lists are left
+    out, as asdict always sets one. Columns holding only defaults (z-index 0, 'auto' sizes) are left out.
+    """
+    import numpy as np
+    import pandas as pd
+
+    count = len(nodes)
+    x = np.empty(count)
+    y = np.empty(count)
+    z_index = np.empty(count)
+    width = np.empty(count)
+    height = np.empty(count)
+    flags = np.zeros(count, dtype=np.uint16)
+    ids, types, source_positions, target_positions, contents, rest = [], [], [], [], [], []
+
+    for i, node in enumerate(nodes):
+        ids.append(node['id'])
+        x[i] = node['position']['x']
+        y[i] = node['position']['y']
+        z_index[i] = node.get('zIndex', 0)
+        types.append(node.get('type', 'default'))
+        source_positions.append(node.get('sourcePosition', 'bottom'))
+        target_positions.append(node.get('targetPosition', 'top'))
+
+        bits = 0
+        for bit, flag in enumerate(_NODE_FLAGS):
+            if node.get(flag):
+                bits |= 1 << bit
+        flags[i] = bits
+
+        extra = {key: value for key, value in node.items() if key not in _NODE_COLUMN_KEYS}
+        data = dict(extra.pop('data', None) or {})
+        contents.append(_content(data.pop('content', None)))
+        if data.get('columns') == []:
+            del data['columns']
+        if data:
+            extra['data'] = data
+
+        style = dict(node.get('style') or {})
+        for key, sizes in (('width', width), ('height', height)):
+            size = _size(style.get(key, 'auto'))
+            sizes[i] = np.nan if size is None else size
+            if size is not None:
+                style.pop(key, None)
+        if style:
+            extra['style'] = style
+        rest.append(json.dumps(extra, separators=(',', ':'), default=str) if extra else '')
+
+    columns = {
+        'id': pd.Series(ids, dtype=object),
+        'x': _numbers(np, x),
+        'y': _numbers(np, y),
+        'type': pd.Categorical(types),
+        'sourcePosition': pd.Categorical(source_positions),
+        'targetPosition': pd.Categorical(target_positions),
+        'flags': flags,
+        'content': pd.Series(contents, dtype=object),
+        'rest': pd.Series(rest, dtype=object),
+    }
+    if np.any(z_index != 0):
+        columns['zIndex'] = _numbers(np, z_index)
+    if not np.all(np.isnan(width)):
+        columns['width'] = width
+    if not np.all(np.isnan(height)):
+        columns['height'] = height
+    return pd.DataFrame(columns)
+
+
+def columnar_patch(patch:Dict[str, any]) -> Tuple[Dict[str, any], 'pd.DataFrame']:
+    """
+    Split a patch into its JSON part, whose nodes are left out and flagged as sent in columns ('nodeColumns'),
+    and the frame of its nodes.
+    """
+    return {**patch, 'nodes': [], 'nodeColumns': True}, encode_nodes(patch['nodes'])
+
+
+def frame_bytes(frame:'pd.DataFrame') -> int:
+    """
+    The size of a frame as an Arrow IPC stream, as sent to the frontend.
+    """
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().size
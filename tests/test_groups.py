@@ -0,0 +1,46 @@
+from streamlit_flow.elements import StreamlitFlowEdge, StreamlitFlowNode
+from streamlit_flow.groups import GroupTree, visible_elements
+from streamlit_flow.state import StreamlitFlowState
+
+
+def grouped_state():
+    nodes = [StreamlitFlowNode('g', (0, 0), {'content': 'G', 'collapsed': True}, node_type='group'),
+             StreamlitFlowNode('a', (10, 10), {'content': 'A'}, parentNode='g'),
+             StreamlitFlowNode('b', (10, 100), {'content': 'B'}, parentNode='g'),
+             StreamlitFlowNode('c', (500, 0), {'content': 'C'})]
+    edges = [StreamlitFlowEdge('a-c', 'a', 'c'), StreamlitFlowEdge('b-c', 'b', 'c')]
+    return StreamlitFlowState(nodes, edges)
+
+
+def visible_ids(state):
+    nodes, edges, _ = visible_elements(state, state.nodes, state.edges)
+    return sorted(node.id for node in nodes), sorted((edge.source, edge.target) for edge in edges)
+
+
+def test_group_tree_kept_until_a_node_changes_group():
+    state = grouped_state()
+    tree = GroupTree.of(state)
+    assert visible_ids(state) == (['c', 'g'], [('g', 'c')])
+
+    state.apply_events([{'type': 'node_moved', 'id': 'a', 'position': {'x': 20, 'y': 20}}])
+    state.edit_node('c').data['content'] = 'C2'
+    assert GroupTree.of(state) is tree
+    assert GroupTree.of(state).children['g']['a'] is state.get_node('a')
+
+    state.edit_node('b').parent_node = None
+    assert visible_ids(state) == (['b', 'c', 'g'], [('b', 'c'), ('g', 'c')])
+    assert GroupTree.of(state) is not tree
+
+    state.nodes.append(StreamlitFlowNode('d', (10, 200), {'content': 'D'}, parentNode='g'))
+    assert list(GroupTree.of(state).children['g']) == ['a', 'd']
+
+
+def test_pair_edge_ids_tell_dashed_ids_apart():
+    from streamlit_flow.bundles import bundle_edges, bundle_id
+
+    assert bundle_id('a-b', 'c') != bundle_id('a', 'b-c')
+
+    edges = [StreamlitFlowEdge(f"e{i}", source, target) for i, (source, target) in enumerate([('a-b', 'c'), ('a-b', 'c'), ('a', 'b-c'), ('a', 'b-c')])]
+    drawn, bundles = bundle_edges(edges, {bundle_id('a', 'b-c')})
+    assert bundles == 1
+    assert sorted(edge.id for edge in drawn) == sorted([bundle_id('a-b', 'c'), 'e2', 'e3'])
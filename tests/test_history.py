@@ -0,0 +1,40 @@
+from streamlit_flow import history
+from streamlit_flow.elements import StreamlitFlowEdge
+from streamlit_flow.history import FlowHistory
+
+from test_state import chain_state
+
+
+def test_record_serializes_changed_elements_only(monkeypatch):
+    state = chain_state(50)
+    flow_history = FlowHistory()
+    flow_history.record(state)
+
+    serialized = []
+    serialize_element = history._serialize_element
+    monkeypatch.setattr(history, '_serialize_element', lambda element: serialized.append(element.id) or serialize_element(element))
+
+    state.edit_node('3').data['content'] = 'three'
+    state.edges.append(StreamlitFlowEdge('49-0', '49', '0'))
+    del state.nodes[10]
+    assert flow_history.record(state)
+    assert sorted(serialized) == ['3', '49-0']
+    assert not flow_history.record(state)
+
+    flow_history.undo(state)
+    assert state.get_node('3').data['content'] == '3'
+    assert state.get_edge('49-0') is None and state.get_node('10') is not None
+    flow_history.redo(state)
+    assert state.get_node('3').data['content'] == 'three'
+    assert state.get_edge('49-0') is not None and state.get_node('10') is None
+
+
+def test_record_after_lists_are_replaced():
+    state = chain_state(5)
+    flow_history = FlowHistory()
+    flow_history.record(state)
+
+    state.nodes = state.nodes[:3]
+    assert flow_history.record(state)
+    flow_history.undo(state)
+    assert [node.id for node in state.nodes] == ['0', '1', '2', '3', '4']
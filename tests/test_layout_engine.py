@@ -0,0 +1,83 @@
+import math
+import random
+
+import numpy as np
+
+from streamlit_flow.layout_engine import _grid_repulsion, _remove_overlaps, force_layout, radial_layout, stress_layout
+
+
+def overlapping_pairs(positions, sizes):
+    boxes = [(x, y, x + w, y + h) for (x, y), (w, h) in zip(positions, sizes)]
+    return [(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))
+            if boxes[i][0] < boxes[j][2] and boxes[j][0] < boxes[i][2] and boxes[i][1] < boxes[j][3] and boxes[j][1] < boxes[i][3]]
+
+
+def random_tree(n, seed=0):
+    rng = random.Random(seed)
+    return [(rng.randrange(i), i) for i in range(1, n)]
+
+
+def test_radial_rings_do_not_overlap():
+    sizes = [(250, 60)] * 300
+    for edges in (random_tree(300), [(0, i) for i in range(1, 300)]):
+        assert overlapping_pairs(radial_layout(sizes, edges), sizes) == []
+
+
+def test_stress_and_force_layouts_do_not_overlap():
+    rng = random.Random(0)
+    edges = random_tree(400) + [(rng.randrange(400), rng.randrange(400)) for _ in range(200)]
+    sizes = [(250, 60 + 36 * (i % 13)) for i in range(400)]
+    for layout in (stress_layout, force_layout):
+        assert overlapping_pairs(layout(sizes, edges, seed=0), sizes) == []
+
+    # Stacked nodes have no room around them and go in rows
+    size = np.asarray(sizes[:200], dtype=float)
+    centers = _remove_overlaps(np, np.zeros((200, 2)), size, 75)
+    assert overlapping_pairs((centers - size / 2).tolist(), sizes[:200]) == []
+
+
+def test_grid_repulsion_approximates_all_pairs():
+    rng = np.random.default_rng(0)
+    pos = rng.uniform(0, 20000, (1500, 2))
+    pos[:400] *= 0.1
+    k = 325.0
+    delta = pos[:, None, :] - pos[None, :, :]
+    exact = (delta * (k * k / np.maximum((delta ** 2).sum(axis=2), 1e-4))[:, :, None]).sum(axis=1)
+
+    error = np.linalg.norm(_grid_repulsion(np, pos, k) - exact, axis=1) / np.linalg.norm(exact, axis=1)
+    assert np.percentile(error, 95) < 0.05
+
+
+def test_sparse_stress_keeps_graph_distances():
+    # More nodes than pivots, so that the stress is sparse
+    side = 20
+    edges = [(i * side + j, i * side + j + 1) for i in range(side) for j in range(side - 1)]
+    edges += [(i * side + j, (i + 1) * side + j) for i in range(side - 1) for j in range(side)]
+    positions = np.asarray(stress_layout([(250, 60)] * side * side, edges, seed=0))
+
+    lengths = np.linalg.norm(positions[[u for u, _ in edges]] - positions[[v for _, v in edges]], axis=1)
+    assert 0.8 < np.median(lengths) / (250 + 75) < 1.4
+    corners = np.linalg.norm(positions[side * side - 1] - positions[0])
+    assert corners > 0.8 * math.sqrt(2) * (side - 1) * (250 + 75)
+
+
+def test_place_nodes_only_looks_around_the_placed_nodes(monkeypatch):
+    from streamlit_flow import layout_engine
+    from streamlit_flow.elements import StreamlitFlowEdge, StreamlitFlowNode
+    from streamlit_flow.state import StreamlitFlowState
+
+    nodes = [StreamlitFlowNode(f"{i}-{j}", (i * 400, j * 150), {'content': ''}) for i in range(60) for j in range(60)]
+    state = StreamlitFlowState(nodes, [])
+    state.nodes_in_rect(0, 0, 1, 1)
+    for i in range(5):
+        state.nodes.append(StreamlitFlowNode(f"new-{i}", (0, 0), {'content': ''}))
+        state.edges.append(StreamlitFlowEdge(f"new-{i}", "30-30", f"new-{i}"))
+
+    sized = []
+    estimate_node_size = layout_engine.estimate_node_size
+    monkeypatch.setattr(layout_engine, 'estimate_node_size', lambda node: sized.append(node.id) or estimate_node_size(node))
+    layout_engine.place_nodes(state, [f"new-{i}" for i in range(5)], 'right')
+
+    assert len(sized) < len(nodes) / 4
+    sizes = [estimate_node_size(node) for node in state.nodes]
+    assert overlapping_pairs([(node.position['x'], node.position['y']) for node in state.nodes], sizes) == []
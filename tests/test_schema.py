@@ -0,0 +1,18 @@
+from pathlib import Path
+
+from streamlit_flow.schema import import_schema
+from streamlit_flow.state import StreamlitFlowState
+
+EXAMPLE_SCHEMA = Path(__file__).parent.parent / 'example_json_structure.json'
+
+
+def test_relationship_edges_connect_column_handles():
+    state = StreamlitFlowState([], [])
+    result = import_schema(EXAMPLE_SCHEMA.read_text(), state)
+
+    assert not result.errors and state.edges
+    for edge in state.edges:
+        edge_dict = edge.asdict()
+        assert edge_dict['sourceHandle'] == f"{edge.source}-{edge.data['from_column']}-source"
+        assert edge_dict['targetHandle'] == f"{edge.target}-{edge.data['to_column']}-target"
+        assert 'source_handle' not in edge_dict
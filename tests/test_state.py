@@ -0,0 +1,43 @@
+from streamlit_flow.elements import StreamlitFlowNode, StreamlitFlowEdge
+from streamlit_flow.state import StreamlitFlowState
+
+
+def chain_state(count=5):
+    nodes = [StreamlitFlowNode(str(i), (i * 100, 0), {'content': str(i)}) for i in range(count)]
+    edges = [StreamlitFlowEdge(f"{i}-{i + 1}", str(i), str(i + 1)) for i in range(count - 1)]
+    return StreamlitFlowState(nodes, edges)
+
+
+def test_removals_keep_change_tracking():
+    state = chain_state()
+    state.fingerprint()
+    version = state.version
+
+    state.apply_patch({'nodes': [], 'edges': [], 'removedNodes': ['4'], 'removedEdges': ['3-4']})
+
+    assert state.changed_since(version) == ({'4'}, {'3-4'})
+    assert state.fingerprint() == chain_state(4).fingerprint()
+
+    version = state.version
+    del state.nodes[1:3]
+    assert state.changed_since(version) == ({'1', '2'}, set())
+    assert state.get_node('1') is None and state.get_node('3') is not None
+
+
+def test_adjacency_kept_until_topology_changes():
+    from streamlit_flow.graph import Adjacency
+
+    state = chain_state()
+    adjacency = Adjacency.of(state)
+
+    state.apply_events([{'type': 'node_moved', 'id': '1', 'position': {'x': 0, 'y': 500}}])
+    state.edit_node('2').data['content'] = 'two'
+    state.reindex_positions()
+    assert Adjacency.of(state) is adjacency
+
+    state.apply_events([{'type': 'edge_updated', 'id': '0-1', 'changes': {'target': '4'}}])
+    adjacency = Adjacency.of(state)
+    assert adjacency.ids[adjacency.out_targets[0]] == '4'
+
+    state.edges.append(StreamlitFlowEdge('4-0', '4', '0'))
+    assert Adjacency.of(state) is not adjacency
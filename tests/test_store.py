@@ -0,0 +1,72 @@
+import pandas as pd
+
+from streamlit_flow.state import StreamlitFlowState
+from streamlit_flow.store import NodeStore, EdgeStore
+
+
+def frames_state():
+    nodes = pd.DataFrame({'id': ['a', 'b', 'c'], 'x': [0.0, 100.0, 200.0], 'y': [0.0, 0.0, 0.0], 'content': ['A', 'B', 'C']})
+    edges = pd.DataFrame({'id': ['a-b', 'b-c'], 'source': ['a', 'b'], 'target': ['b', 'c']})
+    return StreamlitFlowState.from_frames(nodes, edges)
+
+
+def test_apply_events_on_frames_state():
+    state = frames_state()
+
+    state.apply_events([
+        {'type': 'node_moved', 'id': 'b', 'position': {'x': 1500, 'y': 1000}},
+        {'type': 'node_updated', 'id': 'c', 'changes': {'hidden': True, 'data': {'content': 'C2'}}},
+        {'type': 'edge_updated', 'id': 'a-b', 'changes': {'label': '1:N', 'animated': True}},
+        {'type': 'edge_updated', 'id': 'b-c', 'changes': {'target': 'a'}},
+    ])
+
+    assert state.get_node('b').position == {'x': 1500, 'y': 1000}
+    assert state.get_node('c').hidden and state.get_node('c').data['content'] == 'C2'
+    assert state.get_edge('a-b').label == '1:N' and state.get_edge('a-b').animated
+    assert [edge.id for edge in state.edges_of('a', 'in')] == ['b-c']
+    assert [node.id for node in state.nodes_in_rect(1490, 990, 1510, 1010)] == ['b']
+
+
+def test_fingerprint_of_frames_state():
+    state = frames_state()
+    version = state.version
+    digest = state.fingerprint()
+
+    state.apply_events([{'type': 'node_moved', 'id': 'b', 'position': {'x': 1500, 'y': 1000}}])
+
+    assert state.changed_since(version) == ({'b'}, set())
+    assert state.fingerprint() != digest
+
+
+def test_rows_do_not_share_dicts():
+    nodes = NodeStore()
+    a = nodes.add('a', (0, 0), {'content': 'A'})
+    b = nodes.add('b', (0, 0), {'content': 'B'})
+    a.style['width'] = 300
+    a.kwargs['parentNode'] = 'g'
+    assert a.style == {'width': 300, 'height': 'auto'} and a.parent_node == 'g'
+    assert b.style == {'width': 'auto', 'height': 'auto'} and b.kwargs == {} and b.parent_node is None
+
+    edges = EdgeStore()
+    x = edges.add('x', 'a', 'b')
+    y = edges.add('y', 'b', 'a')
+    style = x.style
+    style['stroke'] = 'red'
+    style['strokeWidth'] = 2
+    assert x.style == {'stroke': 'red', 'strokeWidth': 2}
+    assert y.style == {} and y.label_style == {} and EdgeStore().add('z', 'a', 'b').style == {}
+
+
+def test_frames_rows_do_not_share_dicts():
+    styled = {'background': 'red'}
+    nodes = pd.DataFrame({'id': ['a', 'b', 'c'], 'style': [styled, None, None]})
+    edges = pd.DataFrame({'source': ['a', 'b'], 'target': ['b', 'c']})
+    state = StreamlitFlowState.from_frames(nodes, edges)
+
+    assert styled == {'background': 'red'}
+    state.get_node('a').style['width'] = 300
+    state.get_node('b').style['width'] = 200
+    state.edges[0].style['stroke'] = 'red'
+    assert styled == {'background': 'red'}
+    assert state.get_node('c').style == {'width': 'auto', 'height': 'auto'}
+    assert state.edges[1].style == {} and state.edges[1].label_style == {} and state.edges[0].marker_end == {}
@@ -0,0 +1,33 @@
+from streamlit_flow.sync import SyncRecord
+
+from test_state import chain_state
+
+
+def acked_record(state):
+    record = SyncRecord()
+    patch = record.build_patch(state)
+    record.receive(state, {'version': 1, 'ack': patch['id']})
+    return record
+
+
+def test_patch_holds_changed_elements_only():
+    state = chain_state()
+    record = acked_record(state)
+    assert record.build_patch(state) is None
+
+    state.edit_node('2').data['content'] = 'two'
+    patch = record.build_patch(state)
+    assert [node['id'] for node in patch['nodes']] == ['2'] and patch['edges'] == []
+
+
+def test_patch_holds_elements_modified_in_place():
+    state = chain_state()
+    record = acked_record(state)
+    version = state.version
+
+    state.nodes[0].data['content'] = 'changed'
+    state.edges[0].label = 'x'
+    patch = record.build_patch(state)
+    assert [node['data']['content'] for node in patch['nodes']] == ['changed']
+    assert [edge['label'] for edge in patch['edges']] == ['x']
+    assert state.changed_since(version) == ({state.nodes[0].id}, {state.edges[0].id})
@@ -0,0 +1,20 @@
+import subprocess
+import sys
+
+from streamlit_flow.elements import StreamlitFlowNode
+from streamlit_flow.wire import encode_nodes, frame_bytes
+
+
+def test_mixed_contents_encode_to_arrow():
+    nodes = [StreamlitFlowNode('a', (0, 0), {'content': 'A'}), StreamlitFlowNode('b', (10, 0), {'content': 2}),
+             StreamlitFlowNode('c', (20, 0), {'content': None})]
+    frame = encode_nodes([node.asdict() for node in nodes])
+
+    assert frame['content'].tolist() == ['A', '2', None]
+    assert frame_bytes(frame) > 0
+
+
+def test_import_does_not_load_pandas():
+    code = "import sys, streamlit_flow; print('pandas' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout
+    assert output.strip() == 'False'